@@ -212,6 +212,79 @@ function Scrape {
     }
 }
 
+# Streamed scrape: items are printed (or written to a file) as they arrive
+function Scrape-Stream {
+    param(
+        [string]$Url,
+        [string]$DataType = "text",
+        [string]$OutFile
+    )
+    
+    if (-not $Url) {
+        Write-Host "Error: URL is required" -ForegroundColor Red
+        return
+    }
+    
+    $body = @{
+        url = $Url
+        data_type = $DataType
+        ai_mode = $false
+    } | ConvertTo-Json
+    
+    $client = [System.Net.Http.HttpClient]::new()
+    $client.Timeout = [System.Threading.Timeout]::InfiniteTimeSpan
+    $request = [System.Net.Http.HttpRequestMessage]::new([System.Net.Http.HttpMethod]::Post, "$API_BASE_URL/scrape/stream")
+    $request.Content = [System.Net.Http.StringContent]::new($body, [System.Text.Encoding]::UTF8, "application/json")
+    $token = Get-Token
+    if ($token) {
+        $request.Headers.Authorization = [System.Net.Http.Headers.AuthenticationHeaderValue]::new("Bearer", $token)
+    }
+    
+    $writer = $null
+    try {
+        # ResponseHeadersRead hands us the body while it is still arriving
+        $response = $client.SendAsync($request, [System.Net.Http.HttpCompletionOption]::ResponseHeadersRead).GetAwaiter().GetResult()
+        if (-not $response.IsSuccessStatusCode) {
+            $errorBody = $response.Content.ReadAsStringAsync().GetAwaiter().GetResult()
+            Write-Host "✗ Scraping failed: $($response.StatusCode) $errorBody" -ForegroundColor Red
+            return
+        }
+        
+        if ($OutFile) {
+            $writer = [System.IO.StreamWriter]::new($OutFile, $false, [System.Text.UTF8Encoding]::new($false))
+        }
+        $reader = [System.IO.StreamReader]::new($response.Content.ReadAsStreamAsync().GetAwaiter().GetResult())
+        while ($null -ne ($line = $reader.ReadLine())) {
+            if (-not $line) { continue }
+            $message = $line | ConvertFrom-Json
+            switch ($message.type) {
+                "start" { Write-Host "Streaming $($message.url)..." -ForegroundColor Yellow }
+                "item" {
+                    if ($writer) {
+                        $writer.WriteLine(($message.data | ConvertTo-Json -Compress -Depth 10))
+                    }
+                    else {
+                        Write-Host "  - $($message.data | ConvertTo-Json -Compress -Depth 10)"
+                    }
+                }
+                "done" {
+                    Write-Host "✓ Scraping successful!" -ForegroundColor Green
+                    Write-Host "  Items found: $($message.count)"
+                    Write-Host "  Processing time: $($message.processing_time_seconds)s"
+                    if ($OutFile) { Write-Host "  Written to: $OutFile" }
+                }
+            }
+        }
+    }
+    catch {
+        Write-Host "✗ Scraping failed: $($_.Exception.Message)" -ForegroundColor Red
+    }
+    finally {
+        if ($writer) { $writer.Dispose() }
+        $client.Dispose()
+    }
+}
+
 # Get quota status
 function QuotaStatus {
     $result = Invoke-DataZenAPI -Endpoint "/billing/quota-status"
@@ -267,8 +340,9 @@ function Show-Help {
     Write-Host "  me"
     Write-Host "    Show current user information"
     Write-Host ""
-    Write-Host "  scrape -Url <url> [-DataType <type>]"
+    Write-Host "  scrape -Url <url> [-DataType <type>] [-Stream `$true] [-OutFile <file>]"
     Write-Host "    Scrape a website (text, images, links, emails)"
+    Write-Host "    -Stream prints items as they arrive; -OutFile writes them as JSON lines"
     Write-Host ""
     Write-Host "  quota"
     Write-Host "    Show current quota status"
@@ -292,7 +366,12 @@ switch ($Command.ToLower()) {
         GetMe
     }
     "scrape" {
-        Scrape -Url $Arguments.Url -DataType $Arguments.DataType
+        if ($Arguments.Stream -or $Arguments.OutFile) {
+            Scrape-Stream -Url $Arguments.Url -DataType ($Arguments.DataType ?? "text") -OutFile $Arguments.OutFile
+        }
+        else {
+            Scrape -Url $Arguments.Url -DataType $Arguments.DataType
+        }
     }
     "quota" {
         QuotaStatus
@@ -0,0 +1,129 @@
+"""
+JSON response benchmark for DataZen backend
+Compares the old response path (validate into ScrapeResponse, FastAPI's
+default serialization) with FastJSONResponse on large link and text results
+"""
+
+import sys
+import os
+import time
+import logging
+from datetime import datetime
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from routes.scrape import ScrapeResponse
+from services.fast_json import FastJSONResponse, model_payload
+
+ROUNDS = int(os.getenv("BENCHMARK_ROUNDS", 20))
+
+# Per-request client logging would drown the results
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+def make_result(data_type: str, count: int) -> dict:
+    """Build a result shaped like the extractors' output"""
+    if data_type == "links":
+        data = [
+            {
+                "url": f"https://example.com/category/{i % 50}/item-{i}?ref=list",
+                "text": f"Item {i} — details and reviews",
+                "title": f"Item {i}",
+                "target": "_blank" if i % 3 else "",
+                "rel": "noopener" if i % 3 else "",
+                "type": "external"
+            }
+            for i in range(count)
+        ]
+    else:
+        sentence = "DataZen extracts structured data from web pages quickly and reliably. "
+        data = [
+            {"type": "paragraph", "tag": "p", "text": sentence * (1 + i % 8), "length": len(sentence) * (1 + i % 8)}
+            for i in range(count)
+        ]
+    return {
+        "success": True,
+        "data_type": data_type,
+        "count": len(data),
+        "data": data,
+        "timestamp": datetime.now().isoformat(),
+        "url": "https://example.com/",
+        "original_url": "https://example.com/",
+        "processing_time_seconds": 1.23
+    }
+
+def build_app(result: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before", response_model=ScrapeResponse)
+    async def before():
+        return ScrapeResponse(**dict(result))
+
+    @app.get("/after", response_model=ScrapeResponse, response_class=FastJSONResponse)
+    async def after():
+        return FastJSONResponse(model_payload(ScrapeResponse, result))
+
+    return app
+
+def time_endpoint(client: TestClient, path: str) -> float:
+    """Average milliseconds per request after one warm-up call"""
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        response = client.get(path)
+        assert response.status_code == 200
+    return (time.perf_counter() - start) * 1000 / ROUNDS
+
+def time_encoding(result: dict) -> tuple:
+    """
+    Average milliseconds to build the response body alone, (before, after)
+
+    "Before" is validation plus jsonable_encoder and json.dumps, the path our
+    streams and job results used and older FastAPI releases take for every
+    response. Recent FastAPI serializes response models in pydantic-core,
+    which the end-to-end numbers reflect.
+    """
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        JSONResponse(jsonable_encoder(ScrapeResponse(**dict(result))))
+    before_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        FastJSONResponse(model_payload(ScrapeResponse, result))
+    after_ms = (time.perf_counter() - start) * 1000 / ROUNDS
+    return before_ms, after_ms
+
+def run_benchmark():
+    """Benchmark both response paths on several result sizes"""
+    print("🧪 Benchmarking JSON responses...")
+    print(f"   {ROUNDS} requests per case\n")
+
+    for data_type, count in [("links", 1000), ("links", 10000), ("text", 1000), ("text", 10000)]:
+        result = make_result(data_type, count)
+        client = TestClient(build_app(result))
+
+        # Both paths must produce the same document
+        assert client.get("/before").json() == client.get("/after").json()
+
+        size_kb = len(client.get("/after").content) / 1024
+        print(f"   {data_type} x {count} ({size_kb:.0f} KB)")
+
+        before_ms, after_ms = time_encoding(result)
+        print(f"     encoder:    before {before_ms:8.1f} ms, after {after_ms:8.1f} ms, "
+              f"⚡ {before_ms / after_ms:4.1f}x faster")
+
+        before_ms = time_endpoint(client, "/before")
+        after_ms = time_endpoint(client, "/after")
+        print(f"     end-to-end: before {before_ms:8.1f} ms, after {after_ms:8.1f} ms, "
+              f"⚡ {before_ms / after_ms:4.1f}x faster")
+
+    print("\n✨ Benchmark completed!")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -46,6 +46,8 @@ def init_db():
     from models.usage_log import UsageLog
     from models.scheduled_job import ScheduledJob
     from models.webhook import Webhook
+    from models.domain_profile import DomainProfile
+    from models.scrape_job import ScrapeJob
 
     Base.metadata.create_all(bind=engine)
 
@@ -5,6 +5,7 @@ FastAPI application for web scraping with optional AI integration
 
 import asyncio
 import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -47,6 +48,62 @@ def run_migrations():
             except Exception as e:
                 print(f"Migration skipped (column may already exist): {e}")
 
+    usage_log_columns = [col['name'] for col in inspector.get_columns('usage_logs')]
+    ai_usage_columns = {
+        'ai_tokens_in': 'INTEGER',
+        'ai_tokens_out': 'INTEGER',
+        'ai_latency_ms': 'INTEGER',
+        'ai_cache_hit': 'BOOLEAN',
+        'ai_chunks': 'INTEGER',
+    }
+    missing = [name for name in ai_usage_columns if name not in usage_log_columns]
+    if missing:
+        print("Running migration: Adding AI usage columns to usage_logs...")
+        with engine.connect() as connection:
+            try:
+                if "sqlite" in str(engine.url) or "postgresql" in str(engine.url):
+                    for name in missing:
+                        connection.execute(text(
+                            f"ALTER TABLE usage_logs ADD COLUMN {name} {ai_usage_columns[name]} NULL"
+                        ))
+                connection.commit()
+                print("✅ Migration completed!")
+            except Exception as e:
+                print(f"Migration skipped (column may already exist): {e}")
+
+    scrape_job_columns = [col['name'] for col in inspector.get_columns('scrape_jobs')]
+    if 'sitemap' not in scrape_job_columns:
+        print("Running migration: Adding sitemap column to scrape_jobs...")
+        with engine.connect() as connection:
+            try:
+                if "sqlite" in str(engine.url) or "postgresql" in str(engine.url):
+                    connection.execute(text(
+                        "ALTER TABLE scrape_jobs ADD COLUMN sitemap JSON NULL"
+                    ))
+                connection.commit()
+                print("✅ Migration completed!")
+            except Exception as e:
+                print(f"Migration skipped (column may already exist): {e}")
+
+    job_owner_columns = {
+        'worker_id': 'VARCHAR(36)',
+        'heartbeat_at': 'TIMESTAMP',
+    }
+    missing = [name for name in job_owner_columns if name not in scrape_job_columns]
+    if missing:
+        print("Running migration: Adding worker heartbeat columns to scrape_jobs...")
+        with engine.connect() as connection:
+            try:
+                if "sqlite" in str(engine.url) or "postgresql" in str(engine.url):
+                    for name in missing:
+                        connection.execute(text(
+                            f"ALTER TABLE scrape_jobs ADD COLUMN {name} {job_owner_columns[name]} NULL"
+                        ))
+                connection.commit()
+                print("✅ Migration completed!")
+            except Exception as e:
+                print(f"Migration skipped (column may already exist): {e}")
+
 run_migrations()
 
 # Import routes
@@ -57,6 +114,15 @@ from routes.billing import router as billing_router
 from routes.webhooks import router as webhooks_router
 from routes.scheduling import router as scheduling_router
 from routes.user_webhooks import router as user_webhooks_router
+from routes.jobs import router as jobs_router, job_runner
+from routes.crawl import router as crawl_router
+from middleware.compression_middleware import CompressionMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background job workers, picking up jobs queued before a restart"""
+    job_runner.ensure_started()
+    yield
 
 # Create FastAPI app
 app = FastAPI(
@@ -64,7 +130,8 @@ app = FastAPI(
     description="Real-time web scraper with AI-powered data extraction",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -84,6 +151,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON, NDJSON and event streams for clients that accept gzip/brotli
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(scrape_router, prefix="/api", tags=["scraping"])
 app.include_router(auth_router, prefix="/api", tags=["authentication"])
@@ -92,6 +162,8 @@ app.include_router(billing_router, prefix="/api", tags=["billing"])
 app.include_router(webhooks_router, prefix="/api", tags=["webhooks"])
 app.include_router(scheduling_router, prefix="/api", tags=["scheduling"])
 app.include_router(user_webhooks_router, prefix="/api", tags=["user-webhooks"])
+app.include_router(jobs_router, prefix="/api", tags=["jobs"])
+app.include_router(crawl_router, prefix="/api", tags=["crawling"])
 
 @app.get("/")
 async def root():
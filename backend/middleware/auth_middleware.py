@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from config.database import get_db
 from services.auth_service import AuthService
+from services.user_cache import UserCache
 from models.user import User
 
 security = HTTPBearer()
@@ -31,9 +32,9 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    # Get user from database
+    # Get user from cache or database
     user_id = payload.get("user_id")
-    user = AuthService.get_user_by_id(db, user_id)
+    user = UserCache.get_user(db, user_id)
     
     if not user:
         raise HTTPException(
@@ -66,7 +67,7 @@ async def get_current_user_optional(
         return None
     
     user_id = payload.get("user_id")
-    user = AuthService.get_user_by_id(db, user_id)
+    user = UserCache.get_user(db, user_id)
     
     return user if user and user.is_active else None
 
@@ -0,0 +1,201 @@
+"""
+Response compression middleware for DataZen
+Negotiates brotli or gzip from Accept-Encoding. Whole responses are only
+compressed above a size threshold; streamed responses (NDJSON, SSE, exports)
+are compressed chunk by chunk and flushed, so records still arrive as they
+are produced
+"""
+
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Smaller bodies gain little and cost a round of CPU
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+# Brotli's default (11) is meant for static assets; 4-5 suits dynamic responses
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+# Media types worth compressing; images, archives and Parquet already are
+_COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+    "application/problem+json",
+)
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header into coding -> q-value
+
+    Args:
+        header (Optional[str]): Header value, e.g. "gzip, br;q=0.9"
+
+    Returns:
+        Dict[str, float]: Accepted codings (lowercase) and their weights
+    """
+    codings: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding.strip().lower()] = quality
+    return codings
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """
+    Pick the response coding for an Accept-Encoding header
+
+    Returns:
+        Optional[str]: "br", "gzip", or None for an uncompressed response
+    """
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    supported = (["br"] if BROTLI_AVAILABLE else []) + ["gzip"]
+    # Highest client weight wins; on ties the earlier (smaller) coding is preferred
+    best, best_quality = None, 0.0
+    for coding in supported:
+        quality = codings.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+class _Encoder:
+    """Incremental compressor for one response"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress data and flush it, so the client can decode it right away"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """Compress the last data and end the stream"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._gzip.compress(data) + self._gzip.flush()
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+def _without(headers: List[Tuple[bytes, bytes]], *names: bytes) -> List[Tuple[bytes, bytes]]:
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower() or vary.strip() == b"*":
+        return headers
+    return _without(headers, b"vary") + [(b"vary", vary + b", Accept-Encoding")]
+
+class CompressionMiddleware:
+    """ASGI middleware compressing compressible responses for clients that accept it"""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None or scope.get("method") == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingSend(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder)
+
+class _CompressingSend:
+    """Wraps send() for one request, deciding on compression once the body starts"""
+
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        # Response start, held until the first body message
+        self.start_message = None
+        self.encoder: Optional[_Encoder] = None
+        # Set once the response is known to go out uncompressed
+        self.passthrough = False
+
+    def _compressible(self, headers: List[Tuple[bytes, bytes]], status: int) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        if _header(headers, b"content-encoding") is not None:
+            return False
+        content_type = (_header(headers, b"content-type") or b"").decode("latin-1").lower()
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+    async def __call__(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = list(message.get("headers") or [])
+            if not self._compressible(headers, message["status"]):
+                self.passthrough = True
+                await self.send(message)
+                return
+            # Held back until the first body message shows whether it's a stream
+            self.start_message = {**message, "headers": _add_vary(headers)}
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(start)
+                await self.send(message)
+                self.passthrough = True
+                return
+
+            self.encoder = _Encoder(self.encoding)
+            headers = _without(start["headers"], b"content-length") + [(b"content-encoding", self.encoding.encode())]
+            if not more_body:
+                body = self.encoder.finish(body)
+                headers.append((b"content-length", str(len(body)).encode()))
+                await self.send({**start, "headers": headers})
+                await self.send({"type": "http.response.body", "body": body, "more_body": False})
+                return
+            await self.send({**start, "headers": headers})
+
+        if more_body:
+            compressed = self.encoder.chunk(body) if body else b""
+        else:
+            compressed = self.encoder.finish(body)
+        await self.send({"type": "http.response.body", "body": compressed, "more_body": more_body})
@@ -9,8 +9,8 @@ from sqlalchemy.orm import Session
 from config.database import get_db
 from models.user import User
 from models.subscription import Subscription, SubscriptionStatus
-from models.plan import Plan
 from services.usage_service import UsageService
+from services.plan_catalog import PlanCatalog
 
 async def check_quota(
     user: User,
@@ -84,7 +84,7 @@ async def check_feature_access(
             detail="No active plan"
         )
     
-    plan = db.query(Plan).filter(Plan.id == user.plan_id).first()
+    plan = PlanCatalog.get_by_id(user.plan_id)
     
     if not plan:
         raise HTTPException(
@@ -106,15 +106,7 @@ async def check_concurrent_jobs(
 ) -> int:
     """Get max concurrent jobs allowed for user's plan"""
     
-    if not user.plan_id:
-        return 1
-    
-    plan = db.query(Plan).filter(Plan.id == user.plan_id).first()
-    
-    if not plan:
-        return 1
-    
-    return plan.max_concurrent_jobs
+    return PlanCatalog.max_concurrent_jobs(user.plan_id)
 
 async def check_team_seats(
     user: User,
@@ -122,13 +114,5 @@ async def check_team_seats(
 ) -> int:
     """Get max team seats allowed for user's plan"""
     
-    if not user.plan_id:
-        return 1
-    
-    plan = db.query(Plan).filter(Plan.id == user.plan_id).first()
-    
-    if not plan:
-        return 1
-    
-    return plan.max_team_seats
+    return PlanCatalog.max_team_seats(user.plan_id)
 
@@ -0,0 +1,57 @@
+"""
+Domain profile model for learned per-domain fetch behaviour
+"""
+
+from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean
+from datetime import datetime
+import uuid
+from config.database import Base
+
+class DomainProfile(Base):
+    """What the fetch layer has learned about a domain"""
+
+    __tablename__ = "domain_profiles"
+
+    # Primary key
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+
+    # Domain (netloc, lowercased)
+    domain = Column(String(255), unique=True, nullable=False, index=True)
+
+    # Rendering
+    render_required = Column(Boolean, nullable=True)  # None until observed
+    wait_strategy = Column(String(20), nullable=True)  # domcontentloaded, networkidle
+
+    # Content
+    charset = Column(String(50), nullable=True)
+    website_type = Column(String(50), nullable=True)  # from EnhancedScraper.detect_website_type
+
+    # Performance (exponentially weighted moving averages)
+    avg_latency_ms = Column(Float, nullable=True)
+    block_rate = Column(Float, default=0.0)  # share of recent fetches answered with 403/429
+    fetch_count = Column(Integer, default=0)
+    last_status = Column(Integer, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DomainProfile {self.domain}>"
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            "id": self.id,
+            "domain": self.domain,
+            "render_required": self.render_required,
+            "wait_strategy": self.wait_strategy,
+            "charset": self.charset,
+            "website_type": self.website_type,
+            "avg_latency_ms": self.avg_latency_ms,
+            "block_rate": self.block_rate,
+            "fetch_count": self.fetch_count,
+            "last_status": self.last_status,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
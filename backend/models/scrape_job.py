@@ -0,0 +1,77 @@
+"""
+Scrape job model for asynchronous scraping
+"""
+
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, JSON
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+from config.database import Base
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+class ScrapeJob(Base):
+    """A submitted scrape that runs in the background; results live in the job store"""
+    
+    __tablename__ = "scrape_jobs"
+    
+    # Primary key
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    
+    # Foreign key
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Submitted items (ScrapeRequest fields)
+    items = Column(JSON, nullable=False)
+    
+    # Sitemap job request (SitemapJobRequest fields); its items are added as the worker finds them
+    sitemap = Column(JSON, nullable=True)
+    
+    # Status and progress
+    status = Column(String(20), default=JOB_QUEUED, index=True)
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    error_message = Column(Text, nullable=True)
+    
+    # Worker process running the job, and when it last showed it is alive
+    worker_id = Column(String(36), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    
+    # Results are deleted after this time
+    result_expires_at = Column(DateTime, nullable=True)
+    results_deleted = Column(Boolean, default=False)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="scrape_jobs")
+    
+    def __repr__(self):
+        return f"<ScrapeJob {self.id} - {self.status}>"
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": self.completed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "progress": round(self.completed / self.total, 3) if self.total else 0,
+            "error_message": self.error_message,
+            "result_expires_at": self.result_expires_at.isoformat() if self.result_expires_at else None,
+            "results_expired": bool(self.results_deleted),
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
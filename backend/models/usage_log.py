@@ -34,6 +34,13 @@ class UsageLog(Base):
     # Performance
     processing_time_seconds = Column(Integer, nullable=True)
     
+    # AI cost (null when the request didn't use AI)
+    ai_tokens_in = Column(Integer, nullable=True)
+    ai_tokens_out = Column(Integer, nullable=True)
+    ai_latency_ms = Column(Integer, nullable=True)
+    ai_cache_hit = Column(Boolean, nullable=True)
+    ai_chunks = Column(Integer, nullable=True)
+    
     # Timestamp
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
     
@@ -55,6 +62,11 @@ class UsageLog(Base):
             "success": self.success,
             "error_message": self.error_message,
             "processing_time_seconds": self.processing_time_seconds,
+            "ai_tokens_in": self.ai_tokens_in,
+            "ai_tokens_out": self.ai_tokens_out,
+            "ai_latency_ms": self.ai_latency_ms,
+            "ai_cache_hit": self.ai_cache_hit,
+            "ai_chunks": self.ai_chunks,
             "created_at": self.created_at.isoformat()
         }
 
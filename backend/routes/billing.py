@@ -4,10 +4,12 @@ Billing and usage routes for DataZen SaaS
 
 from fastapi import APIRouter, HTTPException, Depends, status, Query
 from pydantic import BaseModel
+from typing import Optional
 from sqlalchemy.orm import Session
 
 from config.database import get_db
 from services.usage_service import UsageService
+from services.fast_json import FastJSONResponse, model_payload
 from middleware.auth_middleware import get_current_user
 from models.user import User
 
@@ -28,6 +30,7 @@ class UsageStatsResponse(BaseModel):
     avg_processing_time_seconds: float
     source_breakdown: dict
     type_breakdown: dict
+    ai_usage: dict
     period_days: int
 
 class UsageLogResponse(BaseModel):
@@ -41,9 +44,14 @@ class UsageLogResponse(BaseModel):
     success: bool
     error_message: str
     processing_time_seconds: int
+    ai_tokens_in: Optional[int] = None
+    ai_tokens_out: Optional[int] = None
+    ai_latency_ms: Optional[int] = None
+    ai_cache_hit: Optional[bool] = None
+    ai_chunks: Optional[int] = None
     created_at: str
 
-@router.get("/usage/stats", response_model=UsageStatsResponse)
+@router.get("/usage/stats", response_model=UsageStatsResponse, response_class=FastJSONResponse)
 async def get_usage_stats(
     days: int = Query(30, ge=1, le=365),
     current_user: User = Depends(get_current_user),
@@ -59,9 +67,9 @@ async def get_usage_stats(
             detail="Usage statistics not found"
         )
     
-    return UsageStatsResponse(**stats)
+    return FastJSONResponse(model_payload(UsageStatsResponse, stats))
 
-@router.get("/usage/logs", response_model=list[UsageLogResponse])
+@router.get("/usage/logs", response_model=list[UsageLogResponse], response_class=FastJSONResponse)
 async def get_usage_logs(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
@@ -72,7 +80,7 @@ async def get_usage_logs(
     
     logs = UsageService.get_user_usage_logs(db, current_user.id, limit, offset)
     
-    return [UsageLogResponse(**log) for log in logs]
+    return FastJSONResponse([model_payload(UsageLogResponse, log) for log in logs])
 
 @router.get("/quota-status")
 async def get_quota_status(
@@ -0,0 +1,224 @@
+"""
+Site crawl routes for DataZen
+Crawls from a seed URL and streams each page's extraction as it finishes
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from pydantic import BaseModel, validator
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from datetime import datetime
+import asyncio
+import logging
+
+from config.database import get_db, SessionLocal
+from middleware.auth_middleware import get_current_user
+from models.user import User
+from routes.scrape import ScrapeRequest, fetch_scrape_result, shared_browser
+from services.crawler import SiteCrawler, CRAWL_MAX_PAGES, CRAWL_MAX_DEPTH, CRAWL_MAX_DOMAINS, CRAWL_HOST_DELAY_SECONDS
+from services.sitemap import SitemapReader, SITEMAP_MAX_URLS
+from services.usage_service import UsageService
+from services.utils import validate_url
+from services.streaming import ndjson_line, sse_event, accepts, ndjson_response, sse_response, SSE_MEDIA_TYPE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Request models
+class CrawlRequest(BaseModel):
+    """Request model for the crawl endpoint"""
+    url: str
+    data_type: Literal["text", "images", "links", "emails", "phone_numbers"]
+    max_depth: int = 2
+    max_pages: int = 50
+    same_domain: bool = True
+    allowed_domains: Optional[List[str]] = None
+    max_domains: int = 1
+    check_robots: bool = True
+    delay_seconds: float = CRAWL_HOST_DELAY_SECONDS
+    use_sitemap: bool = False
+    modified_since: Optional[datetime] = None
+
+    @validator('url')
+    def validate_url_format(cls, v):
+        if not validate_url(v):
+            raise ValueError('Invalid URL format')
+        return v
+
+    @validator('max_depth')
+    def validate_max_depth(cls, v):
+        if not 0 <= v <= CRAWL_MAX_DEPTH:
+            raise ValueError(f'max_depth must be between 0 and {CRAWL_MAX_DEPTH}')
+        return v
+
+    @validator('max_pages')
+    def validate_max_pages(cls, v):
+        if not 1 <= v <= CRAWL_MAX_PAGES:
+            raise ValueError(f'max_pages must be between 1 and {CRAWL_MAX_PAGES}')
+        return v
+
+    @validator('max_domains')
+    def validate_max_domains(cls, v):
+        if not 1 <= v <= CRAWL_MAX_DOMAINS:
+            raise ValueError(f'max_domains must be between 1 and {CRAWL_MAX_DOMAINS}')
+        return v
+
+    @validator('delay_seconds')
+    def validate_delay(cls, v):
+        # Callers may slow down, never below the server's politeness floor
+        return max(v, CRAWL_HOST_DELAY_SECONDS)
+
+class SitemapRequest(BaseModel):
+    """Request model for sitemap enumeration"""
+    url: str
+    modified_since: Optional[datetime] = None
+    max_urls: int = 10000
+
+    @validator('url')
+    def validate_url_format(cls, v):
+        if not validate_url(v):
+            raise ValueError('Invalid URL format')
+        return v
+
+    @validator('max_urls')
+    def validate_max_urls(cls, v):
+        if not 1 <= v <= SITEMAP_MAX_URLS:
+            raise ValueError(f'max_urls must be between 1 and {SITEMAP_MAX_URLS}')
+        return v
+
+@router.post("/crawl")
+async def crawl_site(
+    request: CrawlRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Crawl a site from a seed URL, running the data_type extractor on every page
+
+    With use_sitemap, pages listed in the site's sitemaps (changed since
+    modified_since, if given) are queued as start pages alongside the seed.
+
+    Results stream as NDJSON (or Server-Sent Events with Accept:
+    text/event-stream): one "page" record per visited page in completion
+    order, then a "done" record with the crawl counters. Each successful page
+    is charged one page of quota as it finishes; the crawl stops starting new
+    pages once the quota runs out.
+
+    Args:
+        request (CrawlRequest): Seed URL, data type and crawl limits
+        http_request (Request): Raw request, for content negotiation
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        StreamingResponse: application/x-ndjson or text/event-stream
+    """
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=1)
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+
+    user_id = current_user.id
+    use_sse = accepts(http_request.headers.get("accept"), SSE_MEDIA_TYPE)
+    logger.info(f"Starting crawl of {request.url} (depth {request.max_depth}, {request.max_pages} pages) for {user_id}")
+
+    async def records():
+        # The request's session is closed once streaming starts
+        stream_db = SessionLocal()
+        remaining_quota = UsageService.get_remaining_quota(stream_db, user_id)
+
+        async def fetch_page(url: str, browser) -> Tuple[Dict[str, Any], Optional[str]]:
+            # Robots rules are applied (and cached per host) by the crawler
+            item = ScrapeRequest(url=url, data_type=request.data_type, check_robots=False)
+            result = await fetch_scrape_result(item, stream_db, keep_document=True, browser=browser)
+            return result, result.pop('html_content', None)
+
+        def encode(record: Dict[str, Any]) -> bytes:
+            if use_sse:
+                return sse_event(record, event=record['type'])
+            return ndjson_line(record)
+
+        try:
+            async with shared_browser() as browser:
+                crawler = SiteCrawler(
+                    seed_url=request.url,
+                    fetch_page=lambda url: fetch_page(url, browser),
+                    max_depth=request.max_depth,
+                    max_pages=request.max_pages,
+                    same_domain=request.same_domain,
+                    allowed_domains=request.allowed_domains,
+                    max_domains=request.max_domains,
+                    check_robots=request.check_robots,
+                    host_delay=request.delay_seconds
+                )
+                if request.use_sitemap:
+                    # Listed pages are known up front, so fewer are discovered by following links
+                    reader = SitemapReader(modified_since=request.modified_since, max_urls=request.max_pages)
+                    sitemap_urls = await asyncio.to_thread(lambda: [entry.url for entry in reader.entries(request.url)])
+                    crawler.add_seeds(sitemap_urls)
+                # Pages in flight may all succeed, so count them against the quota too
+                has_room = lambda: crawler.pages_started - crawler.pages_failed < remaining_quota
+
+                async for record in crawler.crawl(should_continue=has_room):
+                    if record['type'] == 'page':
+                        try:
+                            UsageService.log_usage(
+                                db=stream_db,
+                                user_id=user_id,
+                                url=record['url'],
+                                data_type=request.data_type,
+                                pages_scraped=1,
+                                source="api",
+                                success=record['success'],
+                                error_message=record['error'],
+                                processing_time_seconds=int(record['processing_time_seconds'])
+                            )
+                        except Exception as e:
+                            logger.error(f"Failed to log usage for crawled page {record['url']}: {e}")
+                    yield encode(record)
+        except Exception as e:
+            logger.error(f"Crawl of {request.url} failed: {str(e)}")
+            yield encode({"type": "error", "error": str(e) or repr(e)})
+        finally:
+            stream_db.close()
+
+    return sse_response(records()) if use_sse else ndjson_response(records())
+
+@router.post("/crawl/sitemap")
+async def list_sitemap_urls(
+    request: SitemapRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    List a site's pages from its sitemaps and feeds without scraping them
+
+    Sitemaps are discovered from robots.txt (falling back to /sitemap.xml)
+    unless url points at a sitemap or RSS/Atom feed itself; indexes and
+    gzipped files are followed. Streams NDJSON: one "url" record (url, lastmod,
+    sitemap) per page as each file is parsed, then a "done" record with the
+    counters. No quota is charged.
+
+    Args:
+        request (SitemapRequest): Site or sitemap URL, and an optional lastmod cut-off
+        current_user (User): Authenticated user
+
+    Returns:
+        StreamingResponse: application/x-ndjson
+    """
+    reader = SitemapReader(modified_since=request.modified_since, max_urls=request.max_urls)
+
+    def records():
+        # Blocking reads; StreamingResponse iterates this in a worker thread
+        try:
+            for entry in reader.entries(request.url):
+                yield ndjson_line({"type": "url", **entry.__dict__})
+            yield ndjson_line({"type": "done", **reader.summary()})
+        except Exception as e:
+            logger.error(f"Sitemap listing for {request.url} failed: {str(e)}")
+            yield ndjson_line({"type": "error", "error": str(e) or repr(e)})
+
+    return ndjson_response(records())
@@ -0,0 +1,559 @@
+"""
+Asynchronous job routes for DataZen
+Long scrapes are submitted, run by background workers and polled for results
+"""
+
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, validator
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import itertools
+import logging
+import os
+
+from config.database import get_db, SessionLocal
+from middleware.auth_middleware import get_current_user
+from middleware.quota_middleware import check_feature_access
+from models.user import User
+from models.scrape_job import ScrapeJob, JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED
+from routes.scrape import ScrapeRequest, ScrapeBatchRequest, run_batch_items, SCRAPE_BATCH_MAX_ITEMS
+from services.usage_service import UsageService
+from services.plan_catalog import PlanCatalog
+from services.user_cache import UserCache
+from services.job_store import JobStore, JOB_RESULT_TTL_SECONDS
+from services.job_runner import JobRunner, WORKER_ID
+from services.sitemap import SitemapReader
+from services.utils import validate_url
+from services.result_export import ResultExporter, EXPORT_FORMATS, PARQUET_AVAILABLE
+from services.streaming import sse_event, sse_response, SSE_HEARTBEAT, SSE_HEARTBEAT_SECONDS, STREAM_HEADERS
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# How often the progress stream looks at the job
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_SECONDS", 1))
+# Sitemap pages read ahead while the previous ones are scraped
+SITEMAP_JOB_CHUNK = int(os.getenv("SITEMAP_JOB_CHUNK", 50))
+# How often a running job shows its worker is alive, and when another process may presume it dead
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 30))
+JOB_HEARTBEAT_STALE_SECONDS = float(os.getenv("JOB_HEARTBEAT_STALE_SECONDS", 120))
+
+# Request models
+class SitemapJobRequest(BaseModel):
+    """Scrape job over the pages of a site's sitemaps"""
+    url: str
+    data_type: Literal["text", "images", "links", "emails", "phone_numbers"]
+    modified_since: Optional[datetime] = None
+    max_urls: int = 100
+    check_robots: bool = True
+
+    @validator('url')
+    def validate_url_format(cls, v):
+        if not validate_url(v):
+            raise ValueError('Invalid URL format')
+        return v
+
+    @validator('max_urls')
+    def validate_max_urls(cls, v):
+        if not 1 <= v <= SCRAPE_BATCH_MAX_ITEMS:
+            raise ValueError(f'max_urls must be between 1 and {SCRAPE_BATCH_MAX_ITEMS}')
+        return v
+
+# Response models
+class JobStatusResponse(BaseModel):
+    """Job status, progress and (once finished) a page of results"""
+    id: str
+    status: str
+    total: int
+    completed: int
+    succeeded: int
+    failed: int
+    progress: float
+    error_message: Optional[str] = None
+    result_expires_at: Optional[str] = None
+    results_expired: bool = False
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    results: Optional[List[Dict[str, Any]]] = None
+
+def pending_job_pages(db: Session, user_id: str, statuses: Tuple[str, ...] = (JOB_QUEUED, JOB_RUNNING)) -> int:
+    """
+    Pages the user's unfinished jobs have yet to scrape
+
+    Jobs charge each page as it finishes, so only the pages not yet completed
+    are promised but not yet counted against the quota.
+
+    Args:
+        db (Session): Database session
+        user_id (str): User ID
+        statuses (Tuple[str, ...]): Job statuses to count
+
+    Returns:
+        int: Number of pages
+    """
+    pages = db.query(func.coalesce(func.sum(ScrapeJob.total - ScrapeJob.completed), 0)).filter(
+        ScrapeJob.user_id == user_id,
+        ScrapeJob.status.in_(statuses)
+    ).scalar()
+    return int(pages or 0)
+
+async def run_sitemap_items(job: ScrapeJob, db: Session, user_limit: int, on_done) -> List[Dict[str, Any]]:
+    """
+    Read a sitemap job's pages and scrape them as they are found
+
+    Pages are read SITEMAP_JOB_CHUNK at a time in a worker thread, the next
+    chunk while the previous one is scraped. Each chunk is added to the job's
+    items before it runs; once the sitemap is exhausted, the job's total
+    becomes the number of pages found.
+
+    Args:
+        job (ScrapeJob): Running job with a sitemap request
+        db (Session): Database session the job belongs to
+        user_limit (int): The user's plan concurrency
+        on_done (Callable[[Dict[str, Any]], None]): Called with each item outcome as it finishes
+
+    Returns:
+        List[Dict[str, Any]]: Item outcomes in sitemap order
+
+    Raises:
+        Exception: If the sitemap listed no pages because it couldn't be read
+    """
+    request = SitemapJobRequest(**job.sitemap)
+    reader = SitemapReader(modified_since=request.modified_since, max_urls=request.max_urls)
+    entries = reader.entries(request.url)
+
+    def read_chunk():
+        return list(itertools.islice(entries, SITEMAP_JOB_CHUNK))
+
+    outcomes: List[Dict[str, Any]] = []
+    chunk = await asyncio.to_thread(read_chunk)
+    while chunk:
+        items = [
+            ScrapeRequest(url=entry.url, data_type=request.data_type, check_robots=request.check_robots)
+            for entry in chunk
+            if validate_url(entry.url)
+        ]
+        # Reassigned so SQLAlchemy sees the JSON column change
+        job.items = job.items + [jsonable_encoder(item) for item in items]
+        db.commit()
+
+        following = asyncio.create_task(asyncio.to_thread(read_chunk))
+        try:
+            outcomes += await run_batch_items(items, db, job.user_id, user_limit, on_done, start=len(outcomes))
+        finally:
+            # The reader thread can't be interrupted; let it finish before the job moves on
+            chunk = await following
+
+    if not outcomes and reader.errors:
+        raise Exception(f"Could not read sitemap: {reader.errors[0]}")
+    logger.info(f"Sitemap of {request.url}: {len(outcomes)} pages scraped, {reader.skipped_unchanged} unchanged")
+    job.total = len(outcomes)
+    db.commit()
+    return outcomes
+
+async def beat_heartbeat(job_id: str) -> None:
+    """
+    Record every JOB_HEARTBEAT_SECONDS that this process is still running a job
+
+    Runs until cancelled, on its own session so it never commits the job's
+    pending changes. Items finishing also record the heartbeat; this covers
+    long items and sitemap reads.
+
+    Args:
+        job_id (str): ID of a job claimed by this process
+    """
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        db = SessionLocal()
+        try:
+            db.query(ScrapeJob).filter(
+                ScrapeJob.id == job_id,
+                ScrapeJob.worker_id == WORKER_ID
+            ).update({ScrapeJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Failed to record heartbeat of job {job_id}: {e}")
+        finally:
+            db.close()
+
+async def run_scrape_job(job_id: str) -> None:
+    """
+    Run one queued job through the batch scrape pipeline
+
+    Args:
+        job_id (str): Job ID
+    """
+    db = SessionLocal()
+    try:
+        # Claim the job in one statement so a job enqueued twice (or by two processes) runs once
+        claimed = db.query(ScrapeJob).filter(
+            ScrapeJob.id == job_id,
+            ScrapeJob.status == JOB_QUEUED
+        ).update(
+            {
+                ScrapeJob.status: JOB_RUNNING,
+                ScrapeJob.started_at: datetime.utcnow(),
+                ScrapeJob.worker_id: WORKER_ID,
+                ScrapeJob.heartbeat_at: datetime.utcnow()
+            },
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed != 1:
+            return
+        job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+
+        # Usage may have grown since the job was queued (e.g. by direct scrapes);
+        # the running jobs counted here include this one
+        pages = pending_job_pages(db, job.user_id, statuses=(JOB_RUNNING,))
+        has_quota, error_message = UsageService.check_quota(db, job.user_id, pages_to_scrape=pages)
+        if not has_quota:
+            logger.info(f"Job {job.id} not started: {error_message}")
+            job.status = JOB_FAILED
+            job.error_message = error_message or "Quota exceeded. Please upgrade your plan."
+            job.finished_at = datetime.utcnow()
+            job.result_expires_at = job.finished_at + timedelta(seconds=JOB_RESULT_TTL_SECONDS)
+            db.commit()
+            return
+
+        heartbeat = asyncio.create_task(beat_heartbeat(job.id))
+        try:
+            user = db.query(User).filter(User.id == job.user_id).first()
+            user_limit = PlanCatalog.max_concurrent_jobs(user.plan_id if user else None)
+
+            def on_done(outcome: Dict[str, Any]) -> None:
+                # Results and progress become visible item by item, and each item is
+                # charged in the same commit, so a job that fails or is interrupted
+                # has paid for exactly the pages it reports as completed
+                JobStore.append(job.id, {k: v for k, v in outcome.items() if k != 'usage'})
+                _, pages_charged = UsageService.stage_usage_batch(db, job.user_id, [outcome['usage']], source="api")
+                job.completed += 1
+                job.heartbeat_at = datetime.utcnow()
+                if outcome['success']:
+                    job.succeeded += 1
+                else:
+                    job.failed += 1
+                db.commit()
+                if pages_charged:
+                    UserCache.add_quota_used(job.user_id, pages_charged)
+
+            if job.sitemap:
+                await run_sitemap_items(job, db, user_limit, on_done)
+            else:
+                items = [ScrapeRequest(**item) for item in job.items]
+                await run_batch_items(items, db, job.user_id, user_limit, on_done)
+
+            JobStore.finalize(job.id)
+            job.status = JOB_COMPLETED
+            logger.info(f"Job {job.id} completed: {job.succeeded}/{job.total} succeeded")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            db.rollback()
+            job.status = JOB_FAILED
+            job.error_message = str(e) or repr(e)
+        finally:
+            heartbeat.cancel()
+
+        job.finished_at = datetime.utcnow()
+        job.result_expires_at = job.finished_at + timedelta(seconds=JOB_RESULT_TTL_SECONDS)
+        db.commit()
+    finally:
+        db.close()
+        purge_expired_results()
+
+def purge_expired_results() -> None:
+    """Delete stored results whose TTL has passed"""
+    db = SessionLocal()
+    try:
+        expired = db.query(ScrapeJob).filter(
+            ScrapeJob.result_expires_at < datetime.utcnow(),
+            ScrapeJob.results_deleted == False
+        ).all()
+        for job in expired:
+            JobStore.delete(job.id)
+            job.results_deleted = True
+        if expired:
+            db.commit()
+            logger.info(f"Deleted expired results of {len(expired)} jobs")
+    except Exception as e:
+        logger.error(f"Failed to purge expired job results: {e}")
+    finally:
+        db.close()
+
+def recover_unfinished_jobs() -> List[str]:
+    """
+    Requeue queued jobs and fail running jobs whose worker has died
+
+    Every process calls this when its workers start. A running job is only
+    failed once its heartbeat is JOB_HEARTBEAT_STALE_SECONDS old, so jobs of
+    live processes are left alone; a queued job may be requeued by several
+    processes, and the claim in run_scrape_job lets only one of them run it.
+
+    Returns:
+        List[str]: IDs of queued jobs, oldest first
+    """
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=JOB_HEARTBEAT_STALE_SECONDS)
+        interrupted = db.query(ScrapeJob).filter(
+            ScrapeJob.status == JOB_RUNNING,
+            or_(ScrapeJob.heartbeat_at == None, ScrapeJob.heartbeat_at < stale_before)
+        ).all()
+        for job in interrupted:
+            job.status = JOB_FAILED
+            job.error_message = "Interrupted: the worker running it stopped"
+            job.finished_at = datetime.utcnow()
+            job.result_expires_at = job.finished_at + timedelta(seconds=JOB_RESULT_TTL_SECONDS)
+        db.commit()
+        queued = db.query(ScrapeJob.id).filter(ScrapeJob.status == JOB_QUEUED).order_by(ScrapeJob.created_at).all()
+        return [job_id for (job_id,) in queued]
+    finally:
+        db.close()
+
+job_runner = JobRunner(run_scrape_job, recover_unfinished_jobs)
+
+def queue_scrape_job(
+    items: List[ScrapeRequest],
+    current_user: User,
+    db: Session,
+    sitemap: Optional[SitemapJobRequest] = None
+) -> JobStatusResponse:
+    """
+    Store a job for the items and hand it to the workers
+
+    A sitemap job starts without items; its total is max_urls, reserving
+    quota for every page it may find, until the worker has read the sitemap.
+
+    Raises:
+        HTTPException: If the user's quota can't cover every item on top of their unfinished jobs
+    """
+    total = sitemap.max_urls if sitemap else len(items)
+
+    # Reject what can't be paid for now rather than after the work is done
+    pending = pending_job_pages(db, current_user.id)
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=total + pending)
+    if not has_quota and error_message and pending:
+        error_message += f" ({pending} of them reserved by unfinished jobs)"
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+
+    job = ScrapeJob(
+        user_id=current_user.id,
+        items=[jsonable_encoder(item) for item in items],
+        sitemap=jsonable_encoder(sitemap) if sitemap else None,
+        total=total
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    job_runner.submit(job.id)
+    logger.info(f"Queued job {job.id} with {job.total} items for {current_user.id}")
+
+    return JobStatusResponse(**job.to_dict())
+
+@router.post("/scrape", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_scrape_job(
+    request: ScrapeBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit a scrape job and return immediately
+
+    The job runs the same pipeline as /scrape/batch on a background worker.
+    Poll GET /jobs/{id} for status, progress and results.
+
+    Args:
+        request (ScrapeBatchRequest): Items, each shaped like a /scrape request
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        JobStatusResponse: The queued job
+    """
+    return queue_scrape_job(request.items, current_user, db)
+
+@router.post("/scrape/sitemap", response_model=JobStatusResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_sitemap_job(
+    request: SitemapJobRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit a scrape job for the pages listed in a site's sitemaps
+
+    Pages whose <lastmod> is not after modified_since are left out, so a
+    recurring refresh (passing the previous run's time) only scrapes what
+    changed. Pages without a lastmod are always included.
+
+    The job is queued right away; its worker reads the sitemaps and adds the
+    pages to the job as it finds them, so total is max_urls until then.
+
+    Args:
+        request (SitemapJobRequest): Site or sitemap URL, data type and cut-off
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        JobStatusResponse: The queued job
+    """
+    return queue_scrape_job([], current_user, db, sitemap=request)
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get a job's status and progress, with a page of results once it has finished
+
+    Args:
+        job_id (str): Job ID
+        offset (int): Results to skip
+        limit (int): Maximum results to return
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        JobStatusResponse: Job status
+    """
+    job = db.query(ScrapeJob).filter(
+        ScrapeJob.id == job_id,
+        ScrapeJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    response = JobStatusResponse(**job.to_dict())
+    if job.status in (JOB_COMPLETED, JOB_FAILED) and not job.results_deleted:
+        expired = job.result_expires_at and job.result_expires_at < datetime.utcnow()
+        if expired:
+            response.results_expired = True
+        else:
+            response.results = JobStore.read(job.id, offset=offset, limit=limit)
+    return response
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Follow a job's progress as Server-Sent Events
+
+    Sends a "progress" event (the job status fields) whenever the number of
+    finished items changes, and a final "done" event once the job has
+    completed or failed. Fetch the results with GET /jobs/{id} afterwards.
+
+    Args:
+        job_id (str): Job ID
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+    job = db.query(ScrapeJob).filter(
+        ScrapeJob.id == job_id,
+        ScrapeJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    async def events():
+        last_completed = None
+        idle = 0.0
+        while True:
+            poll_db = SessionLocal()
+            try:
+                current = poll_db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+                snapshot = current.to_dict() if current else None
+            finally:
+                poll_db.close()
+
+            if snapshot is None:
+                yield sse_event({"error": "Job not found"}, event="error")
+                return
+            if snapshot["completed"] != last_completed:
+                last_completed = snapshot["completed"]
+                idle = 0.0
+                yield sse_event(snapshot, event="progress", event_id=last_completed)
+            if snapshot["status"] in (JOB_COMPLETED, JOB_FAILED):
+                yield sse_event(snapshot, event="done")
+                return
+
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            idle += JOB_EVENTS_POLL_SECONDS
+            if idle >= SSE_HEARTBEAT_SECONDS:
+                idle = 0.0
+                yield SSE_HEARTBEAT
+
+    return sse_response(events())
+
+@router.get("/{job_id}/export")
+async def export_job_results(
+    job_id: str,
+    file_format: Literal["csv", "jsonl", "parquet"] = Query("jsonl", alias="format"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Download a finished job's results as CSV, JSON Lines or Parquet
+
+    One row per extracted item: the page columns (page_index, page_url,
+    data_type, page_success, page_error) followed by the item's fields; pages
+    without items get a single row. The file is converted from the job store
+    a chunk of rows at a time while it streams. CSV and Parquet need the
+    csv_export plan feature, JSON Lines json_export.
+
+    Args:
+        job_id (str): Job ID
+        file_format (str): csv, jsonl or parquet (the "format" query parameter)
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        StreamingResponse: The export as an attachment
+    """
+    export_format = EXPORT_FORMATS[file_format]
+    await check_feature_access(current_user, export_format.feature)
+    if file_format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet export is not available on this server"
+        )
+
+    job = db.query(ScrapeJob).filter(
+        ScrapeJob.id == job_id,
+        ScrapeJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job.status not in (JOB_COMPLETED, JOB_FAILED):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Job has not finished yet")
+    expired = job.result_expires_at and job.result_expires_at < datetime.utcnow()
+    if job.results_deleted or expired:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Job results have expired")
+
+    exporter = ResultExporter(lambda: JobStore.iter_records(job.id))
+    headers = {
+        **STREAM_HEADERS,
+        "Content-Disposition": f'attachment; filename="job-{job.id}.{export_format.extension}"'
+    }
+    # Blocking file reads and conversion; StreamingResponse runs them in a worker thread
+    return StreamingResponse(exporter.stream(file_format), media_type=export_format.media_type, headers=headers)
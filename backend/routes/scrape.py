@@ -2,23 +2,42 @@
 API routes for DataZen web scraping functionality
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, status
-from pydantic import BaseModel, HttpUrl, validator
-from typing import Optional, Dict, Any, Literal
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, HttpUrl, ValidationError, validator
+from typing import Optional, Dict, Any, List, Literal
 import asyncio
+import json
 import logging
 import os
+import zlib
+from contextlib import asynccontextmanager
 from datetime import datetime
 from sqlalchemy.orm import Session
 
 from services.scraper import WebScraper
 from services.fallback_scraper import FallbackScraper
 from services.enhanced_scraper import EnhancedScraper
-from services.gemini_api import GeminiAI
-from services.utils import validate_url
+from services.gemini_api import get_shared_gemini_ai
+from services.utils import validate_url, check_robots_txt, truncate_html, format_scrape_result
 from services.usage_service import UsageService
+from services.domain_profile_service import DomainProfileService
+from services.host_backoff import HostBackoff
+from services.ai_router import choose_ai_route, AI_ROUTE_SKIP, AI_ROUTE_HYBRID
+from services.ai_providers import AIUsage, get_provider_stats
+from services.health_monitor import HealthMonitor
+from services.scrape_limiter import ScrapeLimiter
+from services.plan_catalog import PlanCatalog
+from services.fast_json import FastJSONResponse, model_payload
+from services.result_selection import (
+    ExtractionOptions, PageWindow, RESULT_FIELDS, SCRAPE_MAX_LIMIT, validate_fields, encode_cursor, decode_cursor
+)
+from services.streaming import (
+    ndjson_line, sse_event, accepts, ndjson_response, sse_response,
+    NDJSON_MEDIA_TYPE, SSE_HEARTBEAT, SSE_HEARTBEAT_SECONDS
+)
 from middleware.auth_middleware import get_current_user
-from config.database import get_db
+from config.database import get_db, SessionLocal
 from models.user import User
 
 # Configure logging
@@ -34,9 +53,17 @@ class ScrapeRequest(BaseModel):
     url: str
     data_type: Literal["text", "images", "links", "emails", "phone_numbers"]
     ai_mode: bool = False
+    ai_strategy: Literal["auto", "skip", "hybrid", "full"] = "auto"
     custom_prompt: Optional[str] = ""
     check_robots: bool = True
     resolve_owner: bool = False
+    # Item fields to return (all by default); unrequested costly fields are never computed
+    fields: Optional[List[str]] = None
+    # Page of items to return; extraction stops once it is complete
+    limit: Optional[int] = None
+    offset: int = 0
+    # next_cursor of the previous page, instead of offset
+    cursor: Optional[str] = None
 
     @validator('url')
     def validate_url_format(cls, v):
@@ -44,15 +71,47 @@ class ScrapeRequest(BaseModel):
             raise ValueError('Invalid URL format')
         return v
 
+    @validator('fields')
+    def validate_selected_fields(cls, v, values):
+        return validate_fields(v, values.get('data_type'))
+
+    @validator('limit')
+    def validate_limit(cls, v):
+        if v is not None and not 1 <= v <= SCRAPE_MAX_LIMIT:
+            raise ValueError(f'limit must be between 1 and {SCRAPE_MAX_LIMIT}')
+        return v
+
+    @validator('offset')
+    def validate_offset(cls, v):
+        if v < 0:
+            raise ValueError('offset must not be negative')
+        return v
+
+    @validator('cursor')
+    def validate_cursor(cls, v, values):
+        if v is None:
+            return v
+        if values.get('offset'):
+            raise ValueError('Pass either offset or cursor, not both')
+        if 'url' in values and 'data_type' in values:
+            decode_cursor(v, values['url'], values['data_type'])
+        return v
+
 class EnhancedScrapeRequest(BaseModel):
     """Request model for enhanced scraping endpoint with LinkedIn and social media support"""
     url: str
     data_type: Literal["text", "images", "links", "emails", "phone_numbers", "linkedin_profile", "linkedin_company", "linkedin_jobs", "social_posts", "ecommerce_products"]
     ai_mode: bool = False
+    ai_strategy: Literal["auto", "skip", "hybrid", "full"] = "auto"
     custom_prompt: Optional[str] = ""
     check_robots: bool = True
     extract_structured_data: bool = True
     resolve_owner: bool = False
+    # Item fields to return (all by default) and the page of items, as on /scrape
+    fields: Optional[List[str]] = None
+    limit: Optional[int] = None
+    offset: int = 0
+    cursor: Optional[str] = None
 
     @validator('url')
     def validate_url_format(cls, v):
@@ -67,6 +126,33 @@ class EnhancedScrapeRequest(BaseModel):
             raise ValueError(f'Data type must be one of: {", ".join(allowed_types)}')
         return v
 
+    @validator('fields')
+    def validate_selected_fields(cls, v):
+        # Item shapes vary with the site type detected, so fields aren't checked against a list
+        return validate_fields(v, None)
+
+    @validator('limit')
+    def validate_limit(cls, v):
+        if v is not None and not 1 <= v <= SCRAPE_MAX_LIMIT:
+            raise ValueError(f'limit must be between 1 and {SCRAPE_MAX_LIMIT}')
+        return v
+
+    @validator('offset')
+    def validate_offset(cls, v):
+        if v < 0:
+            raise ValueError('offset must not be negative')
+        return v
+
+    @validator('cursor')
+    def validate_cursor(cls, v, values):
+        if v is None:
+            return v
+        if values.get('offset'):
+            raise ValueError('Pass either offset or cursor, not both')
+        if 'url' in values and 'data_type' in values:
+            decode_cursor(v, values['url'], values['data_type'])
+        return v
+
 class ScrapeResponse(BaseModel):
     """Response model for scraping endpoint"""
     success: bool
@@ -77,71 +163,280 @@ class ScrapeResponse(BaseModel):
     url: Optional[str] = None
     original_url: Optional[str] = None
     ai_processed: bool = False
+    ai_route: Optional[str] = None
+    ai_usage: Optional[Dict[str, Any]] = None
     model: Optional[str] = None
     error: Optional[str] = None
     processing_time_seconds: Optional[float] = None
+    # Cursor for the next page when the request set a limit and more items follow
+    next_cursor: Optional[str] = None
+
+class DocumentScrapeResponse(ScrapeResponse):
+    """Result of an uploaded document: data_type's result, plus one per further data type"""
+    results: Optional[Dict[str, ScrapeResponse]] = None
+
+# Largest batch accepted by /scrape/batch
+SCRAPE_BATCH_MAX_ITEMS = int(os.getenv("SCRAPE_BATCH_MAX_ITEMS", 500))
+
+# Documents uploaded by the browser extension: request body as sent, and once decompressed
+EXTENSION_MAX_UPLOAD_BYTES = int(os.getenv("EXTENSION_MAX_UPLOAD_BYTES", 2 * 1024 * 1024))
+EXTENSION_MAX_DOCUMENT_BYTES = int(os.getenv("EXTENSION_MAX_DOCUMENT_BYTES", 8 * 1024 * 1024))
+
+class DocumentScrapeRequest(ScrapeRequest):
+    """A page the client has already rendered, with the same options as /scrape"""
+    html: str
+    # Further data types to extract from the same upload, each with its own result
+    data_types: List[Literal["text", "images", "links", "emails", "phone_numbers"]] = []
+
+    @validator('fields')
+    def validate_selected_fields(cls, v, values):
+        # Checked against every requested data type in validate_data_types
+        return validate_fields(v, None)
+
+    @validator('data_types', always=True)
+    def validate_data_types(cls, v, values):
+        data_type = values.get('data_type')
+        extra = [item for item in dict.fromkeys(v) if item != data_type]
+        if extra and values.get('cursor'):
+            raise ValueError('cursor can only be used with a single data type')
+
+        fields = values.get('fields')
+        if fields and data_type:
+            if not extra:
+                validate_fields(fields, data_type)
+                return extra
+            # Each field only applies to the data types that have it
+            types = [data_type] + extra
+            known = set().union(*(RESULT_FIELDS[item] for item in types))
+            unknown = [field for field in fields if field not in known]
+            if unknown:
+                raise ValueError(f'Unknown fields for {", ".join(types)}: {", ".join(unknown)}')
+            missing = [item for item in types if not RESULT_FIELDS[item].intersection(fields)]
+            if missing:
+                raise ValueError(f'fields must name at least one field of {", ".join(missing)}')
+        return extra
+
+    def for_data_type(self, data_type: str) -> "DocumentScrapeRequest":
+        """This request narrowed to one of its data types, with that type's fields"""
+        if not self.data_types:
+            return self
+        fields = [field for field in self.fields if field in RESULT_FIELDS[data_type]] if self.fields else None
+        return self.model_copy(update={'data_type': data_type, 'fields': fields, 'data_types': []})
+
+class ScrapeBatchRequest(BaseModel):
+    """Request model for the bulk scraping endpoint"""
+    items: List[ScrapeRequest]
+
+    @validator('items')
+    def validate_items(cls, v):
+        if not v:
+            raise ValueError('At least one item is required')
+        if len(v) > SCRAPE_BATCH_MAX_ITEMS:
+            raise ValueError(f'At most {SCRAPE_BATCH_MAX_ITEMS} items are allowed per batch')
+        return v
+
+class ScrapeBatchItemResult(BaseModel):
+    """Outcome of one item of a batch"""
+    index: int
+    url: str
+    success: bool
+    status_code: int
+    result: Optional[ScrapeResponse] = None
+    error: Optional[str] = None
+
+class ScrapeBatchResponse(BaseModel):
+    """Response model for the bulk scraping endpoint"""
+    success: bool
+    total: int
+    succeeded: int
+    failed: int
+    results: List[ScrapeBatchItemResult]
+    timestamp: str
+    processing_time_seconds: Optional[float] = None
 
 # Global scraper instance (will be initialized per request)
 async def get_scraper():
     """Get a new scraper instance"""
     return WebScraper(timeout=20000, max_html_size_mb=2.0)
 
+def ensure_host_available(url: str) -> None:
+    """Reject scrapes of hosts in their failure cool-down with 503 and Retry-After"""
+    remaining = HostBackoff.remaining(url)
+    if remaining > 0:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Target host is temporarily unavailable after repeated failures or blocking. Retry in {int(remaining + 0.999)}s.",
+            headers={"Retry-After": str(int(remaining + 0.999))}
+        )
+
 async def get_gemini_ai():
-    """Get Gemini AI instance if available"""
+    """Get the shared Gemini AI client if available"""
     try:
-        return GeminiAI()
+        return get_shared_gemini_ai()
     except ValueError as e:
         logger.warning(f"Gemini AI not available: {e}")
         return None
 
-@router.post("/scrape", response_model=ScrapeResponse)
-async def scrape_website(
+def select_result_page(request: ScrapeRequest, result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Cut a scrape result to the fields and page of items the request asked for
+
+    Args:
+        request (ScrapeRequest): Request with optional fields, limit, offset or cursor
+        result (Dict[str, Any]): Successful scrape (or AI) result
+
+    Returns:
+        Dict[str, Any]: The result, with next_cursor set when more items follow
+    """
+    options = ExtractionOptions.from_request(request)
+    if options is None:
+        return result
+    data, has_more = options.page(result.get('data') or [])
+    result['data'] = data
+    result['count'] = len(data)
+    if has_more:
+        result['next_cursor'] = encode_cursor(request.url, request.data_type, options.offset + len(data))
+    return result
+
+async def run_ai_stage(request, result: Dict[str, Any], html_content: Optional[str], user_id: str) -> Dict[str, Any]:
+    """
+    Apply AI mode to a successful scrape, using the model only as much as needed
+
+    Args:
+        request (ScrapeRequest | EnhancedScrapeRequest): Scraping request parameters
+        result (Dict[str, Any]): Basic scraper result
+        html_content (Optional[str]): Document the scraper fetched
+        user_id (str): Requesting user
+
+    Returns:
+        Dict[str, Any]: AI result, or the basic result noting why it was kept
+    """
+    route, score, reason = choose_ai_route(
+        request.data_type, result.get('data', []), request.custom_prompt, request.ai_strategy
+    )
+    logger.info(f"AI route for {request.url}: {route} ({reason}, score={score})")
+    result['ai_route'] = route
+
+    if route == AI_ROUTE_SKIP:
+        return result
+
+    gemini = await get_gemini_ai()
+    if not (gemini and gemini.is_available()):
+        logger.warning("AI mode requested but Gemini AI not available")
+        result['ai_processing_error'] = "Gemini AI not configured"
+        return result
+
+    try:
+        if route == AI_ROUTE_HYBRID:
+            # Pre-extracted items as compact JSON instead of the page
+            ai_result = await gemini.rerank_items(
+                items=result['data'],
+                data_type=request.data_type,
+                custom_prompt=request.custom_prompt or "",
+                user_id=user_id
+            )
+        elif html_content:
+            ai_result = await gemini.extract_structured_data(
+                html_content=html_content,
+                data_type=request.data_type,
+                custom_prompt=request.custom_prompt or "",
+                user_id=user_id
+            )
+        else:
+            ai_result = {"success": False, "error": "Fetched document not available for AI processing"}
+
+        if ai_result.get('success', False):
+            # Use AI-processed data
+            ai_result['ai_route'] = route
+            logger.info(f"AI processing successful for {request.url}")
+            return ai_result
+
+        # AI failed, but we have basic scraping results; the calls made still count
+        logger.warning(f"AI processing failed, using basic results: {ai_result.get('error')}")
+        result['ai_processing_error'] = ai_result.get('error')
+        if ai_result.get('ai_usage'):
+            result['ai_usage'] = ai_result['ai_usage']
+
+    except Exception as e:
+        logger.error(f"AI processing error: {str(e)}")
+        result['ai_processing_error'] = str(e)
+
+    return result
+
+async def fetch_scrape_result(
     request: ScrapeRequest,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+    db: Session,
+    keep_document: bool = False,
+    browser=None
+) -> Dict[str, Any]:
     """
-    Main scraping endpoint with authentication and quota checking
+    Run the basic scrape for a request, picking the cheapest fetch path the domain allows
 
     Args:
         request (ScrapeRequest): Scraping request parameters
-        background_tasks (BackgroundTasks): FastAPI background tasks
-        current_user (User): Authenticated user
-        db (Session): Database session
+        db (Session): Database session, for domain profiles
+        keep_document (bool): Include the fetched HTML as 'html_content'
+        browser (Optional[Browser]): Running browser to share instead of launching one
 
     Returns:
-        ScrapeResponse: Scraping results
+        Dict[str, Any]: Scraper result (may be unsuccessful)
+
+    Raises:
+        HTTPException: If robots.txt disallows the URL or every scraper errors out
     """
-    start_time = datetime.now()
+    # Start from what we already know about this domain
+    domain_profile = DomainProfileService.get_profile(db, request.url)
+    wait_strategy = domain_profile.wait_strategy if domain_profile else None
+    result = None
+    scraper_used = "playwright"
+    # AI mode sees every item and field; otherwise extraction stops at the requested page
+    options = None if request.ai_mode else ExtractionOptions.from_request(request)
 
-    # Check if user has quota available
-    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=1)
-    if not has_quota:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=error_message or "Quota exceeded. Please upgrade your plan."
+    # Domains known to serve complete HTML skip the browser entirely
+    if DomainProfileService.prefers_static_fetch(domain_profile) and not request.resolve_owner:
+        # Blocking fetches run in a thread so concurrent scrapes overlap
+        if request.check_robots and not await asyncio.to_thread(check_robots_txt, request.url):
+            raise HTTPException(
+                status_code=400,
+                detail="Scraping not allowed by robots.txt"
+            )
+
+        static_scraper = FallbackScraper()
+        static_scraper.charset_hint = domain_profile.charset
+        static_result = await asyncio.to_thread(
+            static_scraper.scrape,
+            url=request.url,
+            data_type=request.data_type,
+            keep_document=keep_document,
+            options=options
         )
-    
-    try:
-        logger.info(f"Starting scrape request: {request.url} ({request.data_type})")
-        
-        # Try Playwright scraper first, fallback to requests if it fails
-        result = None
-        scraper_used = "playwright"
+        DomainProfileService.record_fetch(db, request.url, **static_scraper.last_fetch)
+        if static_result.get('success') and static_result.get('data'):
+            result = static_result
+            scraper_used = "fallback"
+            logger.info(f"Static fetch sufficed for {request.url} (learned profile)")
+        else:
+            # The profile may be outdated; let the browser pass re-learn it
+            wait_strategy = None
 
+    if result is None:
+        # Try Playwright scraper first, fallback to requests if it fails
         try:
             # Initialize Playwright scraper with environment timeout
             timeout_ms = int(os.getenv('SCRAPE_TIMEOUT_SECONDS', 120)) * 1000
             max_size_mb = float(os.getenv('MAX_HTML_SIZE_MB', 2))
-            async with WebScraper(timeout=timeout_ms, max_html_size_mb=max_size_mb) as scraper:
+            async with WebScraper(timeout=timeout_ms, max_html_size_mb=max_size_mb, browser=browser) as scraper:
                 # Perform basic scraping
                 result = await scraper.scrape(
                     url=request.url,
                     data_type=request.data_type,
                     check_robots=request.check_robots,
-                    resolve_owner=getattr(request, 'resolve_owner', False)
+                    resolve_owner=getattr(request, 'resolve_owner', False),
+                    wait_strategy=wait_strategy,
+                    keep_document=keep_document,
+                    options=options
                 )
+            DomainProfileService.record_fetch(db, request.url, **scraper.last_fetch)
         except Exception as playwright_error:
             logger.warning(f"Playwright scraper failed: {playwright_error}")
             logger.info("Falling back to requests-based scraper...")
@@ -149,10 +444,15 @@ async def scrape_website(
             try:
                 # Use fallback scraper with environment settings
                 fallback_scraper = FallbackScraper()
-                result = fallback_scraper.scrape(
+                fallback_scraper.charset_hint = domain_profile.charset if domain_profile else None
+                result = await asyncio.to_thread(
+                    fallback_scraper.scrape,
                     url=request.url,
-                    data_type=request.data_type
+                    data_type=request.data_type,
+                    keep_document=keep_document,
+                    options=options
                 )
+                DomainProfileService.record_fetch(db, request.url, **fallback_scraper.last_fetch)
                 scraper_used = "fallback"
                 logger.info(f"Fallback scraper successful for {request.url}")
             except Exception as fallback_error:
@@ -162,54 +462,78 @@ async def scrape_website(
                     status_code=500,
                     detail=error_detail
                 )
+
+    logger.info(f"Scraped {request.url} with {scraper_used} scraper")
+    return result
+
+@router.post("/scrape", response_model=ScrapeResponse, response_class=FastJSONResponse)
+async def scrape_website(
+    request: ScrapeRequest,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Main scraping endpoint with authentication and quota checking
+
+    Clients sending "Accept: application/x-ndjson" get the streamed form
+    (see /scrape/stream) instead of one JSON document.
+
+    fields limits each item to the named fields; limit with offset (or the
+    previous response's next_cursor) returns one page of items. Without AI
+    mode, extraction stops once the page is complete and costly fields that
+    weren't requested are never computed. Every page is a fresh scrape and
+    is charged as one.
+
+    Args:
+        request (ScrapeRequest): Scraping request parameters
+        background_tasks (BackgroundTasks): FastAPI background tasks
+        http_request (Request): Incoming HTTP request, for content negotiation
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        ScrapeResponse: Scraping results
+    """
+    if accepts(http_request.headers.get("accept"), NDJSON_MEDIA_TYPE):
+        return await scrape_website_stream(request, current_user, db)
+
+    start_time = datetime.now()
+
+    # Fail fast on hosts known to be down or blocking us
+    ensure_host_available(request.url)
+
+    # Check if user has quota available
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=1)
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+    
+    try:
+        logger.info(f"Starting scrape request: {request.url} ({request.data_type})")
+        
+        result = await fetch_scrape_result(request, db, keep_document=request.ai_mode)
             
         # If scraping failed or result is None, return error
         if not result or not result.get('success', False):
+            # A host that just blocked us or went down gets a 503 with Retry-After
+            ensure_host_available(request.url)
             error_message = result.get('error', 'Scraping failed') if result else 'Scraping failed - no result returned'
             raise HTTPException(
                 status_code=400,
                 detail=error_message
             )
 
+        # The document the scraper fetched, so AI mode sees the same (rendered) bytes
+        html_content = result.pop('html_content', None)
+
         # If AI mode is enabled and we have data, process with Gemini
         if request.ai_mode and result.get('data'):
-            gemini = await get_gemini_ai()
-
-            if gemini and gemini.is_available():
-                try:
-                    # Get the HTML content for AI processing
-                    if scraper_used == "fallback":
-                        # Use fallback scraper to get HTML content
-                        fallback_scraper = FallbackScraper(timeout=20, max_html_size_mb=2)
-                        html_content, _ = fallback_scraper.fetch_page_content(request.url)
-                    else:
-                        # This shouldn't happen since we're outside the context, but handle it
-                        import requests
-                        response = requests.get(request.url, timeout=20)
-                        html_content = response.text
-
-                    # Process with AI
-                    ai_result = await gemini.extract_structured_data(
-                        html_content=html_content,
-                        data_type=request.data_type,
-                        custom_prompt=request.custom_prompt or ""
-                    )
-
-                    if ai_result.get('success', False):
-                        # Use AI-processed data
-                        result = ai_result
-                        logger.info(f"AI processing successful for {request.url}")
-                    else:
-                        # AI failed, but we have basic scraping results
-                        logger.warning(f"AI processing failed, using basic results: {ai_result.get('error')}")
-                        result['ai_processing_error'] = ai_result.get('error')
-
-                except Exception as e:
-                    logger.error(f"AI processing error: {str(e)}")
-                    result['ai_processing_error'] = str(e)
-            else:
-                logger.warning("AI mode requested but Gemini AI not available")
-                result['ai_processing_error'] = "Gemini AI not configured"
+            result = await run_ai_stage(request, result, html_content, current_user.id)
+        result = select_result_page(request, result)
 
         # Calculate processing time
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -228,11 +552,12 @@ async def scrape_website(
             source="api",
             success=result.get('success', False),
             error_message=None,
-            processing_time_seconds=int(processing_time)
+            processing_time_seconds=int(processing_time),
+            ai_usage=result.get('ai_usage')
         )
 
-        # Return response
-        return ScrapeResponse(**result)
+        # Our extractors' output needs no re-validation; orjson handles large result lists
+        return FastJSONResponse(model_payload(ScrapeResponse, result))
             
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -252,6 +577,616 @@ async def scrape_website(
             }
         )
 
+async def run_batch_item(
+    index: int,
+    request: ScrapeRequest,
+    db: Session,
+    user_id: str,
+    user_limit: int,
+    browser=None
+) -> Dict[str, Any]:
+    """
+    Scrape one batch item under the user's and domain's concurrency limits
+
+    Args:
+        index (int): Position in the batch
+        request (ScrapeRequest): Item parameters
+        db (Session): Database session, for domain profiles
+        user_id (str): Requesting user
+        user_limit (int): The user's plan concurrency
+        browser (Optional[Browser]): Browser shared by the batch
+
+    Returns:
+        Dict[str, Any]: Item outcome (ScrapeBatchItemResult fields), plus the usage entry to log
+    """
+    start_time = datetime.now()
+    try:
+        async with ScrapeLimiter.slot(user_id, request.url, user_limit):
+            ensure_host_available(request.url)
+            result = await fetch_scrape_result(request, db, keep_document=request.ai_mode, browser=browser)
+
+            if not result or not result.get('success', False):
+                ensure_host_available(request.url)
+                error_message = result.get('error', 'Scraping failed') if result else 'Scraping failed - no result returned'
+                raise HTTPException(status_code=400, detail=error_message)
+
+            html_content = result.pop('html_content', None)
+            if request.ai_mode and result.get('data'):
+                result = await run_ai_stage(request, result, html_content, user_id)
+            result = select_result_page(request, result)
+
+        processing_time = (datetime.now() - start_time).total_seconds()
+        result['processing_time_seconds'] = round(processing_time, 2)
+        return {
+            "index": index,
+            "url": request.url,
+            "success": True,
+            "status_code": 200,
+            "result": model_payload(ScrapeResponse, result),
+            "usage": {
+                "url": request.url,
+                "data_type": request.data_type,
+                "success": True,
+                "processing_time_seconds": int(processing_time),
+                "ai_usage": result.get('ai_usage')
+            }
+        }
+    except HTTPException as e:
+        error_message = e.detail if isinstance(e.detail, str) else json.dumps(e.detail, default=str)
+        status_code = e.status_code
+    except Exception as e:
+        logger.error(f"Unexpected error scraping batch item {request.url}: {str(e)}")
+        error_message = str(e) or repr(e)
+        status_code = 500
+
+    return {
+        "index": index,
+        "url": request.url,
+        "success": False,
+        "status_code": status_code,
+        "error": error_message,
+        "usage": {
+            "url": request.url,
+            "data_type": request.data_type,
+            "success": False,
+            "error_message": error_message,
+            "processing_time_seconds": int((datetime.now() - start_time).total_seconds())
+        }
+    }
+
+@asynccontextmanager
+async def shared_browser():
+    """
+    Launch one browser for many scrapes
+
+    Yields:
+        Optional[Browser]: The running browser, or None if it could not be launched
+        (scrapes then launch their own or fall back to static fetches)
+    """
+    scraper = WebScraper()
+    try:
+        await scraper.__aenter__()
+    except Exception as e:
+        logger.warning(f"Shared browser unavailable: {e}")
+        if getattr(scraper, 'playwright', None):
+            await scraper.playwright.stop()
+        yield None
+        return
+    try:
+        yield scraper.browser
+    finally:
+        await scraper.__aexit__(None, None, None)
+
+async def run_batch_items(
+    items: List[ScrapeRequest],
+    db: Session,
+    user_id: str,
+    user_limit: int,
+    on_done=None,
+    start: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Scrape many items concurrently, sharing one browser when it can be launched
+
+    Args:
+        items (List[ScrapeRequest]): Items to scrape
+        db (Session): Database session, for domain profiles
+        user_id (str): Requesting user
+        user_limit (int): The user's plan concurrency
+        on_done (Optional[Callable[[Dict[str, Any]], None]]): Called with each item outcome as it finishes
+        start (int): Index of the first item, when items continue an earlier batch
+
+    Returns:
+        List[Dict[str, Any]]: Item outcomes (see run_batch_item) in request order
+    """
+    async def run_one(index: int, item: ScrapeRequest, browser):
+        outcome = await run_batch_item(index, item, db, user_id, user_limit, browser)
+        if on_done:
+            try:
+                on_done(outcome)
+            except Exception as e:
+                logger.error(f"Batch progress callback failed for {item.url}: {e}")
+        return outcome
+
+    # One browser for the whole batch instead of one launch per URL
+    async with shared_browser() as browser:
+        return await asyncio.gather(*[run_one(index, item, browser) for index, item in enumerate(items, start=start)])
+
+@router.post("/scrape/batch", response_model=ScrapeBatchResponse, response_class=FastJSONResponse)
+async def scrape_batch(
+    request: ScrapeBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Scrape many URLs in one call
+
+    Quota is checked once for the whole batch. Items run concurrently, limited
+    per user by the plan's max_concurrent_jobs and per target domain; browser
+    items share one browser. Usage for every item is written in one
+    transaction, and each item reports its own result or error.
+
+    Args:
+        request (ScrapeBatchRequest): Items, each shaped like a /scrape request
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        ScrapeBatchResponse: Per-item results in request order
+    """
+    start_time = datetime.now()
+    items = request.items
+
+    # Check quota for the whole batch up front
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=len(items))
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+
+    user_id = current_user.id
+    user_limit = PlanCatalog.max_concurrent_jobs(current_user.plan_id)
+    logger.info(f"Starting batch scrape of {len(items)} URLs for {user_id} (concurrency {user_limit})")
+
+    outcomes = await run_batch_items(items, db, user_id, user_limit)
+
+    UsageService.log_usage_batch(
+        db=db,
+        user_id=user_id,
+        entries=[outcome.pop('usage') for outcome in outcomes],
+        source="api"
+    )
+
+    succeeded = sum(1 for outcome in outcomes if outcome['success'])
+    processing_time = (datetime.now() - start_time).total_seconds()
+    logger.info(f"Batch scrape completed: {succeeded}/{len(items)} succeeded in {processing_time:.2f}s")
+
+    return FastJSONResponse(model_payload(ScrapeBatchResponse, {
+        "success": succeeded == len(items),
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "results": [model_payload(ScrapeBatchItemResult, outcome) for outcome in outcomes],
+        "timestamp": datetime.now().isoformat(),
+        "processing_time_seconds": round(processing_time, 2)
+    }))
+
+@router.post("/scrape/batch/stream")
+async def scrape_batch_stream(
+    request: ScrapeBatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Scrape many URLs, reporting each item as a Server-Sent Event as it finishes
+
+    Events are "start" ({"total"}), one "item" per finished item (the
+    /scrape/batch item fields plus "completed" and "total"; the event id is
+    the item's index), then "done" with the counts. Items finish in any order.
+    Usage is written once at the end, or for the finished items if the client
+    disconnects early.
+
+    Args:
+        request (ScrapeBatchRequest): Items, each shaped like a /scrape request
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+    items = request.items
+
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=len(items))
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+
+    user_id = current_user.id
+    user_limit = PlanCatalog.max_concurrent_jobs(current_user.plan_id)
+    logger.info(f"Starting streamed batch scrape of {len(items)} URLs for {user_id}")
+
+    async def events():
+        start_time = datetime.now()
+        # The request's session is closed once streaming starts
+        stream_db = SessionLocal()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished: List[Dict[str, Any]] = []
+        task = asyncio.create_task(run_batch_items(items, stream_db, user_id, user_limit, queue.put_nowait))
+        try:
+            yield sse_event({"total": len(items)}, event="start")
+
+            while len(finished) < len(items):
+                try:
+                    outcome = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if task.done() and queue.empty():
+                        break
+                    yield SSE_HEARTBEAT
+                    continue
+                finished.append(outcome)
+                payload = {k: v for k, v in outcome.items() if k != 'usage'}
+                payload.update({"completed": len(finished), "total": len(items)})
+                yield sse_event(payload, event="item", event_id=outcome['index'])
+
+            try:
+                await task
+            except Exception as e:
+                logger.error(f"Streamed batch failed: {str(e)}")
+                yield sse_event({"error": str(e) or repr(e)}, event="error")
+
+            succeeded = sum(1 for outcome in finished if outcome['success'])
+            yield sse_event({
+                "success": succeeded == len(items),
+                "total": len(items),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded,
+                "processing_time_seconds": round((datetime.now() - start_time).total_seconds(), 2)
+            }, event="done")
+        finally:
+            if not task.done():
+                # Client went away; stop scraping what nobody will read
+                task.cancel()
+            try:
+                UsageService.log_usage_batch(
+                    db=stream_db,
+                    user_id=user_id,
+                    entries=[outcome['usage'] for outcome in finished],
+                    source="api"
+                )
+            except Exception as e:
+                logger.error(f"Failed to log usage for streamed batch: {e}")
+            finally:
+                stream_db.close()
+
+    return sse_response(events())
+
+@router.post("/scrape/stream")
+async def scrape_website_stream(
+    request: ScrapeRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Scrape a page and stream its items as NDJSON
+
+    Lines are {"type": "start", ...}, then one {"type": "item", "data": ...} per
+    item, then {"type": "done", ...}. In AI mode items are sent while the model
+    generates them; the AI router may skip the model when the basic results are
+    already complete. If AI is off, skipped, unavailable or fails before its
+    first item, the basic scraper results are streamed instead. With limit,
+    offset or cursor only that page of items is sent, and "done" carries the
+    next_cursor when more follow.
+
+    Args:
+        request (ScrapeRequest): Scraping request parameters
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        StreamingResponse: application/x-ndjson stream
+    """
+    start_time = datetime.now()
+
+    # Fail fast on hosts known to be down or blocking us
+    ensure_host_available(request.url)
+
+    # Check if user has quota available
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=1)
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+
+    logger.info(f"Starting streaming scrape request: {request.url} ({request.data_type})")
+    result = await fetch_scrape_result(request, db, keep_document=True)
+
+    if not result or not result.get('success', False):
+        # A host that just blocked us or went down gets a 503 with Retry-After
+        ensure_host_available(request.url)
+        error_message = result.get('error', 'Scraping failed') if result else 'Scraping failed - no result returned'
+        raise HTTPException(
+            status_code=400,
+            detail=error_message
+        )
+
+    html_content = result.pop('html_content', None)
+
+    # The page has been fetched, so charge it now; the session is gone once streaming starts
+    usage_log = UsageService.log_usage(
+        db=db,
+        user_id=current_user.id,
+        url=request.url,
+        data_type=request.data_type,
+        pages_scraped=1,
+        source="api",
+        success=True,
+        error_message=None,
+        processing_time_seconds=int((datetime.now() - start_time).total_seconds())
+    )
+
+    if request.ai_mode:
+        route, score, reason = choose_ai_route(
+            request.data_type, result.get('data', []), request.custom_prompt, request.ai_strategy
+        )
+        logger.info(f"AI route for {request.url}: {route} ({reason}, score={score})")
+    else:
+        route = AI_ROUTE_SKIP
+    gemini = await get_gemini_ai() if route != AI_ROUTE_SKIP else None
+    user_id = current_user.id
+    usage_log_id = usage_log.id
+
+    async def events():
+        yield ndjson_line({
+            "type": "start",
+            "url": result.get('url', request.url),
+            "data_type": request.data_type,
+            "ai_route": route,
+            "timestamp": datetime.now().isoformat()
+        })
+
+        # Items outside the requested page are dropped; the model stops once it's full
+        window = PageWindow(ExtractionOptions.from_request(request))
+        ai_error = None
+        ai_usage = None
+        ai_started = datetime.now()
+        if route == AI_ROUTE_SKIP:
+            pass
+        elif gemini and gemini.is_available() and (html_content or route == AI_ROUTE_HYBRID):
+            try:
+                if route == AI_ROUTE_HYBRID:
+                    # Re-ranking a short list is fast enough to send in one go
+                    ai_result = await gemini.rerank_items(
+                        items=result['data'],
+                        data_type=request.data_type,
+                        custom_prompt=request.custom_prompt or "",
+                        user_id=user_id
+                    )
+                    ai_usage = ai_result.get('ai_usage')
+                    if ai_result.get('success'):
+                        for item in ai_result['data']:
+                            selected = window.offer(item)
+                            if window.has_more:
+                                break
+                            if selected is not None:
+                                yield ndjson_line({"type": "item", "data": selected})
+                    else:
+                        ai_error = ai_result.get('error')
+                else:
+                    stream_usage = AIUsage()
+                    try:
+                        async for item in gemini.stream_structured_data(
+                            html_content=html_content,
+                            data_type=request.data_type,
+                            custom_prompt=request.custom_prompt or "",
+                            user_id=user_id,
+                            usage=stream_usage
+                        ):
+                            selected = window.offer(item)
+                            if window.has_more:
+                                break
+                            if selected is not None:
+                                yield ndjson_line({"type": "item", "data": selected})
+                    finally:
+                        stream_usage.latency_ms = (datetime.now() - ai_started).total_seconds() * 1000
+                        ai_usage = stream_usage.to_dict()
+            except Exception as e:
+                logger.error(f"AI streaming error: {str(e)}")
+                ai_error = str(e) or repr(e)
+        else:
+            ai_error = "Gemini AI not configured"
+
+        ai_processed = window.seen > 0
+        if not ai_processed:
+            # Nothing came from the model; send what the scraper found
+            for item in result.get('data', []):
+                selected = window.offer(item)
+                if window.has_more:
+                    break
+                if selected is not None:
+                    yield ndjson_line({"type": "item", "data": selected})
+
+        yield ndjson_line({
+            "type": "done",
+            "success": True,
+            "count": window.sent,
+            "next_cursor": encode_cursor(request.url, request.data_type, window.seen - 1) if window.has_more else None,
+            "ai_processed": ai_processed,
+            "ai_processing_error": ai_error,
+            "ai_usage": ai_usage,
+            "processing_time_seconds": round((datetime.now() - start_time).total_seconds(), 2)
+        })
+
+        if ai_usage:
+            # The request's session is closed by now
+            usage_db = SessionLocal()
+            try:
+                UsageService.record_ai_usage(usage_db, usage_log_id, ai_usage)
+            except Exception as e:
+                logger.error(f"Failed to record AI usage for {request.url}: {e}")
+            finally:
+                usage_db.close()
+
+    return ndjson_response(events())
+
+async def read_document_body(http_request: Request) -> bytes:
+    """
+    Read an uploaded document body, gzip-compressed or not, within the size caps
+
+    Args:
+        http_request (Request): Incoming request
+
+    Returns:
+        bytes: The decompressed body
+
+    Raises:
+        HTTPException: 413 if either cap is exceeded, 415 for an unsupported
+        Content-Encoding, 400 for a corrupt gzip stream
+    """
+    encoding = (http_request.headers.get("content-encoding") or "identity").strip().lower()
+    if encoding not in ("gzip", "identity"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Encoding must be gzip or identity"
+        )
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Document exceeds {EXTENSION_MAX_UPLOAD_BYTES} bytes compressed or {EXTENSION_MAX_DOCUMENT_BYTES} bytes uncompressed"
+    )
+    declared = http_request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > EXTENSION_MAX_UPLOAD_BYTES:
+        raise too_large
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding == "gzip" else None
+    received = 0
+    parts = []
+    size = 0
+    try:
+        async for chunk in http_request.stream():
+            received += len(chunk)
+            if received > EXTENSION_MAX_UPLOAD_BYTES:
+                raise too_large
+            if decompressor is not None:
+                # Bounded output, so a small compression bomb can't inflate past the cap
+                chunk = decompressor.decompress(chunk, EXTENSION_MAX_DOCUMENT_BYTES - size + 1)
+                if decompressor.unconsumed_tail:
+                    raise too_large
+            size += len(chunk)
+            if size > EXTENSION_MAX_DOCUMENT_BYTES:
+                raise too_large
+            parts.append(chunk)
+        if decompressor is not None:
+            parts.append(decompressor.flush())
+    except zlib.error as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid gzip body: {e}")
+    return b"".join(parts)
+
+@router.post("/scrape/document", response_model=DocumentScrapeResponse, response_class=FastJSONResponse)
+async def scrape_document(
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Extract data from a page the browser extension has already rendered
+
+    The body is a DocumentScrapeRequest (the /scrape fields plus "html", the
+    serialized DOM) as JSON, optionally gzip-compressed with
+    "Content-Encoding: gzip", within EXTENSION_MAX_UPLOAD_BYTES as sent and
+    EXTENSION_MAX_DOCUMENT_BYTES decompressed. The same extractors, AI stage
+    and field/page selection as /scrape run on the document directly: no
+    browser, no fetch, and pages behind the user's login work.
+
+    data_types asks for more data types from the same upload; their results
+    are returned in "results", keyed by data type. fields may then mix fields
+    of all requested types, and limit/offset apply to each type. An upload
+    counts as one page whatever the number of data types: usage is logged
+    as a single row with source "extension", under the primary data_type,
+    carrying the combined AI usage of all types.
+
+    Args:
+        http_request (Request): Incoming request with the uploaded document
+        current_user (User): Authenticated user
+        db (Session): Database session
+
+    Returns:
+        DocumentScrapeResponse: Scraping results
+    """
+    start_time = datetime.now()
+
+    has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=1)
+    if not has_quota:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=error_message or "Quota exceeded. Please upgrade your plan."
+        )
+
+    body = await read_document_body(http_request)
+    try:
+        request = DocumentScrapeRequest.model_validate_json(body)
+    except ValidationError as e:
+        # Same 422 shape as a validated JSON body
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+    data_types = [request.data_type] + request.data_types
+    logger.info(f"Extracting uploaded document: {request.url} ({', '.join(data_types)}, {len(body)} bytes)")
+    max_size_mb = float(os.getenv('MAX_HTML_SIZE_MB', 2))
+    html_content = truncate_html(request.html, max_size_mb)
+
+    async def extract(type_request: DocumentScrapeRequest) -> Dict[str, Any]:
+        options = None if type_request.ai_mode else ExtractionOptions.from_request(type_request)
+        # Parsing a large document is CPU-bound; keep it off the event loop
+        data = await asyncio.to_thread(
+            WebScraper().extract_data,
+            html_content,
+            type_request.url,
+            type_request.data_type,
+            type_request.resolve_owner,
+            options
+        )
+        result = format_scrape_result(data, type_request.data_type)
+        result['timestamp'] = datetime.now().isoformat()
+        result['url'] = type_request.url
+        result['original_url'] = type_request.url
+
+        if type_request.ai_mode and result.get('data'):
+            result = await run_ai_stage(type_request, result, html_content, current_user.id)
+        return select_result_page(type_request, result)
+
+    try:
+        results = await asyncio.gather(*[extract(request.for_data_type(data_type)) for data_type in data_types])
+    except Exception as e:
+        logger.error(f"Extraction failed for uploaded document {request.url}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+
+    processing_time = (datetime.now() - start_time).total_seconds()
+
+    # One page per upload: a single log row carrying the AI usage of every data type
+    UsageService.log_usage(
+        db=db,
+        user_id=current_user.id,
+        url=request.url,
+        data_type=request.data_type,
+        pages_scraped=1,
+        processing_time_seconds=int(processing_time),
+        source="extension",
+        ai_usage=AIUsage.combine([result.get('ai_usage') for result in results])
+    )
+
+    result = results[0]
+    result['processing_time_seconds'] = round(processing_time, 2)
+    if request.data_types:
+        result['results'] = {
+            data_type: model_payload(ScrapeResponse, type_result)
+            for data_type, type_result in zip(request.data_types, results[1:])
+        }
+    return FastJSONResponse(model_payload(DocumentScrapeResponse, result))
+
 @router.get("/test-ai")
 async def test_ai_connection():
     """
@@ -283,6 +1218,19 @@ async def test_ai_connection():
             "available": False
         }
 
+@router.get("/ai/providers")
+async def ai_provider_stats(current_user: User = Depends(get_current_user)):
+    """
+    Call, token and latency accounting per AI provider in this worker
+
+    Returns:
+        Dict[str, Any]: Stats keyed by provider name
+    """
+    return {
+        "providers": get_provider_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/supported-types")
 async def get_supported_data_types():
     """
@@ -321,32 +1269,13 @@ async def health_check():
     """
     Health check for scraping service
     
+    Serves the last background check, so probes don't launch a browser
+    or touch the model.
+    
     Returns:
         Dict[str, Any]: Health status
     """
-    try:
-        # Test basic scraper initialization
-        async with WebScraper() as scraper:
-            scraper_status = "healthy"
-    except Exception as e:
-        scraper_status = f"error: {str(e)}"
-    
-    # Test AI availability
-    try:
-        gemini = await get_gemini_ai()
-        ai_status = "available" if gemini and gemini.is_available() else "not configured"
-    except Exception as e:
-        ai_status = f"error: {str(e)}"
-    
-    return {
-        "status": "healthy" if scraper_status == "healthy" else "degraded",
-        "timestamp": datetime.now().isoformat(),
-        "services": {
-            "scraper": scraper_status,
-            "ai": ai_status
-        },
-        "version": "1.0.0"
-    }
+    return HealthMonitor.snapshot()
 
 @router.post("/scrape-enhanced")
 async def scrape_enhanced(
@@ -357,6 +1286,10 @@ async def scrape_enhanced(
     """
     Enhanced scraping endpoint with LinkedIn and social media support and quota checking
 
+    fields, limit, offset and cursor select items as on /scrape. The enhanced
+    extractors don't stop early, so the whole page is still extracted; only
+    the response is cut to the requested fields and page.
+
     Args:
         request (EnhancedScrapeRequest): Scraping request with enhanced options
         current_user (User): Authenticated user
@@ -367,6 +1300,9 @@ async def scrape_enhanced(
     """
     start_time = datetime.now()
 
+    # Fail fast on hosts known to be down or blocking us
+    ensure_host_available(request.url)
+
     # Check if user has quota available
     has_quota, error_message = UsageService.check_quota(db, current_user.id, pages_to_scrape=1)
     if not has_quota:
@@ -379,51 +1315,35 @@ async def scrape_enhanced(
 
     try:
         # Use enhanced scraper
+        domain_profile = DomainProfileService.get_profile(db, request.url)
         enhanced_scraper = EnhancedScraper()
-        result = enhanced_scraper.scrape(
+        enhanced_scraper.charset_hint = domain_profile.charset if domain_profile else None
+        # Blocking fetch and parse; keep them off the event loop
+        result = await asyncio.to_thread(
+            enhanced_scraper.scrape,
             url=request.url,
-            data_type=request.data_type
+            data_type=request.data_type,
+            keep_document=request.ai_mode
         )
+        DomainProfileService.record_fetch(db, request.url, **enhanced_scraper.last_fetch)
 
         # If scraping failed or result is None, return error
         if not result or not result.get('success', False):
+            # A host that just blocked us or went down gets a 503 with Retry-After
+            ensure_host_available(request.url)
             error_message = result.get('error', 'Enhanced scraping failed') if result else 'Enhanced scraping failed - no result returned'
             raise HTTPException(
                 status_code=400,
                 detail=error_message
             )
 
+        # The document the scraper fetched, so AI mode sees the same (rendered) bytes
+        html_content = result.pop('html_content', None)
+
         # If AI mode is enabled and we have data, process with Gemini
         if request.ai_mode and result.get('data'):
-            gemini = await get_gemini_ai()
-
-            if gemini and gemini.is_available():
-                try:
-                    # Get the HTML content for AI processing
-                    html_content, _ = enhanced_scraper.fetch_page_content(request.url)
-
-                    # Process with AI
-                    ai_result = await gemini.extract_structured_data(
-                        html_content=html_content,
-                        data_type=request.data_type,
-                        custom_prompt=request.custom_prompt or ""
-                    )
-
-                    if ai_result.get('success', False):
-                        # Use AI-processed data
-                        result = ai_result
-                        logger.info(f"AI processing successful for {request.url}")
-                    else:
-                        # AI failed, but we have basic scraping results
-                        logger.warning(f"AI processing failed, using basic results: {ai_result.get('error')}")
-                        result['ai_processing_error'] = ai_result.get('error')
-
-                except Exception as e:
-                    logger.error(f"AI processing error: {str(e)}")
-                    result['ai_processing_error'] = str(e)
-            else:
-                logger.warning("AI mode requested but Gemini AI not available")
-                result['ai_processing_error'] = "Gemini AI not configured"
+            result = await run_ai_stage(request, result, html_content, current_user.id)
+        result = select_result_page(request, result)
 
         # Calculate processing time
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -441,7 +1361,8 @@ async def scrape_enhanced(
             source="api",
             success=result.get('success', False),
             error_message=None,
-            processing_time_seconds=int(processing_time)
+            processing_time_seconds=int(processing_time),
+            ai_usage=result.get('ai_usage')
         )
 
         return result
@@ -10,6 +10,7 @@ from datetime import datetime
 from config.database import get_db
 from config.razorpay import PRICING
 from services.razorpay_service import RazorpayService
+from services.plan_catalog import PlanCatalog
 from middleware.auth_middleware import get_current_user
 from models.user import User
 from models.subscription import Subscription, SubscriptionStatus
@@ -50,10 +51,10 @@ class PlanResponse(BaseModel):
     features: dict
 
 @router.get("/plans", response_model=list[PlanResponse])
-async def get_plans(db: Session = Depends(get_db)):
+async def get_plans():
     """Get all available plans"""
     
-    plans = db.query(Plan).filter(Plan.is_active == True).all()
+    plans = PlanCatalog.active_plans()
     
     return [
         PlanResponse(
@@ -87,7 +88,7 @@ async def create_subscription(
     plan_details = PRICING[request.plan_key]
     
     # Get or create plan in database
-    plan = db.query(Plan).filter(Plan.name == plan_details["name"]).first()
+    plan = PlanCatalog.get_by_name(plan_details["name"])
     if not plan:
         plan = Plan(
             name=plan_details["name"],
@@ -13,6 +13,7 @@ from config.database import get_db
 from middleware.auth_middleware import get_current_user
 from models.user import User
 from models.webhook import Webhook
+from services.webhook_delivery import WebhookDelivery
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
@@ -192,12 +193,21 @@ async def test_webhook(
             detail="Webhook not found"
         )
     
-    # TODO: Implement webhook test logic
-    # This would send a test event to the webhook URL
+    status_code = await WebhookDelivery.deliver_async(
+        webhook.url,
+        webhook.secret,
+        "webhook.test",
+        {"webhook_id": webhook.id, "message": "Test event from DataZen"}
+    )
+    webhook.last_triggered = datetime.utcnow()
+    webhook.last_response_status = status_code
+    db.commit()
     
+    delivered = status_code is not None and status_code < 400
     return {
-        "status": "success",
-        "message": "Test event sent",
-        "webhook_id": webhook_id
+        "status": "success" if delivered else "error",
+        "message": "Test event sent" if delivered else "Test event could not be delivered",
+        "webhook_id": webhook_id,
+        "response_status": status_code
     }
 
@@ -10,6 +10,7 @@ import logging
 from config.database import get_db
 from config.razorpay import WEBHOOK_EVENTS
 from services.razorpay_service import RazorpayService
+from services.plan_catalog import PlanCatalog
 
 router = APIRouter(prefix="/webhooks", tags=["webhooks"])
 
@@ -54,6 +55,8 @@ async def handle_razorpay_webhook(
                 )
                 
                 if success:
+                    # Subscription changes can move users between plans
+                    PlanCatalog.invalidate()
                     logger.info(f"Successfully processed {event_type}")
                     return {"status": "success", "event": event_type}
                 else:
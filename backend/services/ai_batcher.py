@@ -0,0 +1,218 @@
+"""
+Micro-batching for AI extraction
+Packs small pages that want the same extraction into one Gemini call and
+splits the answer back per caller; per-call overhead dominates for small pages.
+Batches never mix users, so each call counts against one user's limits and usage
+"""
+
+import os
+import re
+import json
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.content_minimizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# How long the first request of a batch waits for company; 0 disables batching
+GEMINI_BATCH_WINDOW_MS = float(os.getenv("GEMINI_BATCH_WINDOW_MS", 25))
+GEMINI_BATCH_TOKEN_BUDGET = int(os.getenv("GEMINI_BATCH_TOKEN_BUDGET", 6000))
+GEMINI_BATCH_MAX_DOCUMENTS = int(os.getenv("GEMINI_BATCH_MAX_DOCUMENTS", 8))
+# Larger pages gain little from sharing a call and go out on their own
+GEMINI_BATCH_MAX_DOCUMENT_TOKENS = int(os.getenv("GEMINI_BATCH_MAX_DOCUMENT_TOKENS", 1000))
+
+_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+class _PendingBatch:
+    """Requests collected for one (user_id, data_type, custom_prompt) key"""
+
+    def __init__(self, gemini):
+        self.gemini = gemini
+        self.documents: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.usages: List[Optional[Any]] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class AIBatcher:
+    """Collects small extraction requests for a short window and runs them as one call"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Optional[str], str, str], _PendingBatch] = {}
+        # Keep running batches referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def accepts(page_content: str) -> bool:
+        """Check if a minimized page is small enough to be batched"""
+        return GEMINI_BATCH_WINDOW_MS > 0 and estimate_tokens(page_content) <= GEMINI_BATCH_MAX_DOCUMENT_TOKENS
+
+    async def submit(
+        self,
+        gemini,
+        page_content: str,
+        data_type: str,
+        custom_prompt: str = "",
+        user_id: Optional[str] = None,
+        usage=None
+    ) -> List[Any]:
+        """
+        Queue one page for batched extraction
+
+        Args:
+            gemini (GeminiAI): Client used if this request opens a new batch
+            page_content (str): Minimized page content
+            data_type (str): Type of data to extract
+            custom_prompt (str): Additional custom instructions
+            user_id (Optional[str]): Requesting user; only batched with their own pages
+            usage (Optional[AIUsage]): Invocation accounting; gets this page's share of a batched call
+
+        Returns:
+            List[Any]: Extracted items, the same array an individual call would return
+
+        Raises:
+            Exception: Whatever the individual fallback call raised for this page
+        """
+        key = (user_id, data_type, custom_prompt)
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(page_content)
+
+        batch = self._pending.get(key)
+        if batch and batch.tokens + tokens > GEMINI_BATCH_TOKEN_BUDGET:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = _PendingBatch(gemini)
+            self._pending[key] = batch
+            batch.timer = loop.call_later(GEMINI_BATCH_WINDOW_MS / 1000, self._flush, key, batch)
+
+        future = loop.create_future()
+        batch.documents.append(page_content)
+        batch.futures.append(future)
+        batch.usages.append(usage)
+        batch.tokens += tokens
+
+        if len(batch.documents) >= GEMINI_BATCH_MAX_DOCUMENTS:
+            self._flush(key, batch)
+
+        return await future
+
+    def _flush(self, key: Tuple[Optional[str], str, str], batch: _PendingBatch) -> None:
+        """Close a batch and start its model call"""
+        if self._pending.get(key) is not batch:
+            # Already flushed by size or budget
+            return
+        del self._pending[key]
+        if batch.timer:
+            batch.timer.cancel()
+
+        task = asyncio.get_running_loop().create_task(self._run(batch, *key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _PendingBatch, user_id: Optional[str], data_type: str, custom_prompt: str) -> None:
+        """Run one batched call and resolve every caller's future"""
+        # Callers that gave up while queued don't need an answer
+        live = [
+            (document, future, usage)
+            for document, future, usage in zip(batch.documents, batch.futures, batch.usages)
+            if not future.done()
+        ]
+        if not live:
+            return
+
+        answers: Dict[int, List[Any]] = {}
+        if len(live) > 1:
+            try:
+                prompt = batch.gemini._build_batch_prompt(
+                    [document for document, _, _ in live], data_type, custom_prompt
+                )
+                # Holds one of the user's slots, like any of their calls
+                response = await batch.gemini._generate(prompt, user_id)
+                answers = self._split_response(response.text or "", len(live))
+                # Each page is charged for its part of the prompt
+                total_tokens = sum(estimate_tokens(document) for document, _, _ in live) or 1
+                for document, _, usage in live:
+                    if usage is not None:
+                        usage.add(response, estimate_tokens(document) / total_tokens)
+                        usage.batched = True
+                logger.info(f"Batched Gemini call answered {len(answers)} of {len(live)} {data_type} documents")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Batched Gemini call failed, falling back to individual calls: {e}")
+
+        # Anything the batch didn't answer cleanly is retried on its own
+        fallbacks = []
+        for index, (document, future, usage) in enumerate(live, start=1):
+            items = answers.get(index)
+            if items is None:
+                fallbacks.append(self._run_single(batch.gemini, document, future, user_id, usage, data_type, custom_prompt))
+            elif not future.done():
+                future.set_result(items)
+        if fallbacks:
+            await asyncio.gather(*fallbacks)
+
+    @staticmethod
+    async def _run_single(
+        gemini,
+        document: str,
+        future: asyncio.Future,
+        user_id: Optional[str],
+        usage,
+        data_type: str,
+        custom_prompt: str
+    ) -> None:
+        """Extract one document with its own call and resolve its future"""
+        try:
+            items = await gemini._extract_chunk(document, data_type, custom_prompt, None, user_id, usage)
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(items)
+
+    @staticmethod
+    def _split_response(text: str, count: int) -> Dict[int, List[Any]]:
+        """
+        Split a batched answer into per-document arrays
+
+        Args:
+            text (str): Model response, a JSON object keyed by document number
+            count (int): Number of documents in the batch
+
+        Returns:
+            Dict[int, List[Any]]: Arrays by 1-based document number; missing or malformed entries are left out
+        """
+        text = _CODE_FENCE.sub('', text.strip())
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            start, end = text.find('{'), text.rfind('}')
+            if start < 0 or end <= start:
+                return {}
+            try:
+                parsed = json.loads(text[start:end + 1])
+            except json.JSONDecodeError:
+                return {}
+        if not isinstance(parsed, dict):
+            return {}
+
+        answers = {}
+        for index in range(1, count + 1):
+            value = parsed.get(str(index))
+            if isinstance(value, list):
+                answers[index] = value
+            elif isinstance(value, dict):
+                answers[index] = [value] if value else []
+        return answers
+
+# Shared by every GeminiAI instance in the process
+ai_batcher = AIBatcher()
@@ -0,0 +1,64 @@
+"""
+In-memory cache of AI extraction results
+Identical prompts (same minimized page, data type and instructions) reuse the
+previous answer instead of paying for another model call
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", 600))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", 1000))
+
+class AICache:
+    """Process-wide LRU cache of extracted items with a TTL"""
+
+    # key -> (expiry (monotonic), items)
+    _entries: "OrderedDict[str, Tuple[float, List[Any]]]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hash the inputs that determine a model answer"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8', 'replace'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    @classmethod
+    def get(cls, key: str) -> Optional[List[Any]]:
+        """Get cached items, or None on a miss"""
+        if AI_CACHE_TTL_SECONDS <= 0:
+            return None
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if not entry:
+                return None
+            if entry[0] < time.monotonic():
+                del cls._entries[key]
+                return None
+            cls._entries.move_to_end(key)
+            # Callers may modify the result; hand out a copy of the list
+            return list(entry[1])
+
+    @classmethod
+    def put(cls, key: str, items: List[Any]) -> None:
+        """Store items for a key"""
+        if AI_CACHE_TTL_SECONDS <= 0:
+            return
+        with cls._lock:
+            cls._entries[key] = (time.monotonic() + AI_CACHE_TTL_SECONDS, list(items))
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > AI_CACHE_MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop all cached results"""
+        with cls._lock:
+            cls._entries.clear()
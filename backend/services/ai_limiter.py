@@ -0,0 +1,101 @@
+"""
+Concurrency limits for AI model calls
+Bounds in-flight model requests globally and per user so one worker can
+overlap many AI requests without flooding the provider or starving other users
+"""
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 32))
+GEMINI_MAX_CONCURRENCY_PER_USER = int(os.getenv("GEMINI_MAX_CONCURRENCY_PER_USER", 4))
+# How long a call may wait for a free slot before giving up
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", 30))
+
+class AILimitExceeded(Exception):
+    """Raised when no AI slot frees up within the queue timeout"""
+
+class AILimiter:
+    """Process-wide global and per-user semaphores for AI calls"""
+
+    _global: Optional[asyncio.Semaphore] = None
+    # user_id -> (semaphore, number of callers holding or waiting on it)
+    _per_user: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+
+    @classmethod
+    def _global_semaphore(cls) -> asyncio.Semaphore:
+        if cls._global is None:
+            cls._global = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return cls._global
+
+    @classmethod
+    def _user_semaphore(cls, user_id: str) -> asyncio.Semaphore:
+        semaphore, users = cls._per_user.get(user_id, (None, 0))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY_PER_USER)
+        cls._per_user[user_id] = (semaphore, users + 1)
+        return semaphore
+
+    @classmethod
+    def _release_user(cls, user_id: str) -> None:
+        semaphore, users = cls._per_user[user_id]
+        if users <= 1:
+            # Drop idle users so the map doesn't grow with every account ever seen
+            del cls._per_user[user_id]
+        else:
+            cls._per_user[user_id] = (semaphore, users - 1)
+
+    @classmethod
+    @asynccontextmanager
+    async def slot(cls, user_id: Optional[str] = None):
+        """
+        Hold one AI call slot for the duration of the block
+
+        Args:
+            user_id (Optional[str]): Caller's user ID; None only counts against the global limit
+
+        Raises:
+            AILimitExceeded: If no slot frees up within GEMINI_QUEUE_TIMEOUT_SECONDS
+        """
+        user_semaphore = cls._user_semaphore(user_id) if user_id else None
+        acquired = []
+
+        def release():
+            for semaphore in acquired:
+                semaphore.release()
+            if user_id:
+                cls._release_user(user_id)
+
+        try:
+            async with asyncio.timeout(GEMINI_QUEUE_TIMEOUT_SECONDS):
+                # Per-user first, so a busy user queues without holding a global slot
+                for semaphore in (user_semaphore, cls._global_semaphore()):
+                    if semaphore is not None:
+                        await semaphore.acquire()
+                        acquired.append(semaphore)
+        except TimeoutError:
+            release()
+            raise AILimitExceeded(
+                f"AI capacity busy; no slot became free within {GEMINI_QUEUE_TIMEOUT_SECONDS:g}s"
+            )
+        except BaseException:
+            # Cancelled while queued
+            release()
+            raise
+
+        try:
+            yield
+        finally:
+            release()
+
+    @classmethod
+    def in_flight(cls) -> int:
+        """Number of AI calls currently holding a global slot"""
+        if cls._global is None:
+            return 0
+        return GEMINI_MAX_CONCURRENCY - cls._global._value
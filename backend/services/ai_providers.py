@@ -0,0 +1,449 @@
+"""
+AI model providers for DataZen
+GeminiAI talks to a provider instead of a specific SDK, so the backing model
+can be swapped (or failed over) and AI mode can be load-tested offline
+against a deterministic local stand-in
+"""
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from services.content_minimizer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# "gemini" or "local"
+AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini")
+# Provider tried when the primary one errors; empty disables failover
+AI_FALLBACK_PROVIDER = os.getenv("AI_FALLBACK_PROVIDER", "")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Local stand-in behaviour
+AI_STUB_LATENCY_MS = float(os.getenv("AI_STUB_LATENCY_MS", 200))
+AI_STUB_MS_PER_1K_TOKENS = float(os.getenv("AI_STUB_MS_PER_1K_TOKENS", 50))
+AI_STUB_ERROR_RATE = float(os.getenv("AI_STUB_ERROR_RATE", 0))
+AI_STUB_SEED = int(os.getenv("AI_STUB_SEED", 0))
+
+class AIProviderError(Exception):
+    """Raised when a provider fails to produce a response"""
+
+class AIResponse:
+    """Text of one model call plus its accounting"""
+
+    def __init__(self, text: str, provider: str, tokens_in: int, tokens_out: int, latency_ms: float):
+        self.text = text
+        self.provider = provider
+        self.tokens_in = tokens_in
+        self.tokens_out = tokens_out
+        self.latency_ms = latency_ms
+
+class AIUsage:
+    """Accounting for one AI invocation (one page or item list), across all its model calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.model_latency_ms = 0.0
+        self.latency_ms: Optional[float] = None
+        self.cache_hit = False
+        self.chunks = 0
+        self.batched = False
+        self.provider: Optional[str] = None
+
+    def add(self, response: AIResponse, share: float = 1.0) -> None:
+        """
+        Count a model call
+
+        Args:
+            response (AIResponse): The call's response
+            share (float): Part of the call attributable to this invocation (batched calls are split)
+        """
+        self.calls += 1
+        self.tokens_in += round(response.tokens_in * share)
+        self.tokens_out += round(response.tokens_out * share)
+        self.model_latency_ms += response.latency_ms
+        self.provider = response.provider
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary"""
+        return {
+            "calls": self.calls,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "latency_ms": round(self.latency_ms) if self.latency_ms is not None else None,
+            "model_latency_ms": round(self.model_latency_ms),
+            "cache_hit": self.cache_hit,
+            "chunks": self.chunks,
+            "batched": self.batched,
+            "provider": self.provider
+        }
+
+    @staticmethod
+    def combine(usages: List[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Merge the usage dicts of invocations that ran side by side for one request
+
+        Counters add up; wall-clock latency is the longest invocation's since
+        they ran concurrently, and the request counts as a cache hit only if
+        every invocation was one.
+
+        Args:
+            usages (List[Optional[Dict[str, Any]]]): to_dict() outputs, None where no AI ran
+
+        Returns:
+            Optional[Dict[str, Any]]: Combined usage, or None if no invocation used AI
+        """
+        usages = [usage for usage in usages if usage]
+        if not usages:
+            return None
+        latencies = [usage["latency_ms"] for usage in usages if usage.get("latency_ms") is not None]
+        return {
+            "calls": sum(usage.get("calls", 0) for usage in usages),
+            "tokens_in": sum(usage.get("tokens_in", 0) for usage in usages),
+            "tokens_out": sum(usage.get("tokens_out", 0) for usage in usages),
+            "latency_ms": max(latencies) if latencies else None,
+            "model_latency_ms": sum(usage.get("model_latency_ms", 0) for usage in usages),
+            "cache_hit": all(usage.get("cache_hit") for usage in usages),
+            "chunks": sum(usage.get("chunks", 0) for usage in usages),
+            "batched": any(usage.get("batched") for usage in usages),
+            "provider": next((usage["provider"] for usage in usages if usage.get("provider")), None)
+        }
+
+class ProviderStats:
+    """Call, token and latency counters for one provider"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.in_flight = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def record(self, tokens_in: int, tokens_out: int, latency_ms: float) -> None:
+        self.calls += 1
+        self.tokens_in += tokens_in
+        self.tokens_out += tokens_out
+        self.total_latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary"""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "in_flight": self.in_flight,
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+            "avg_latency_ms": round(self.total_latency_ms / self.calls, 1) if self.calls else None,
+            "max_latency_ms": round(self.max_latency_ms, 1)
+        }
+
+class AIProvider(ABC):
+    """
+    Base class for model providers
+
+    Subclasses implement _complete and _stream; generate and generate_stream
+    add the per-provider accounting.
+    """
+
+    name = "base"
+    model_name = "unknown"
+
+    def __init__(self):
+        self.stats = ProviderStats()
+
+    def is_available(self) -> bool:
+        """Check if the provider can take calls"""
+        return True
+
+    @abstractmethod
+    async def _complete(self, prompt: str, generation_config: Dict[str, Any]) -> AIResponse:
+        """Run one call and return the whole response"""
+
+    @abstractmethod
+    def _stream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        """Run one call and yield the response text as it arrives"""
+
+    async def generate(self, prompt: str, generation_config: Dict[str, Any]) -> AIResponse:
+        """
+        Run one model call
+
+        Args:
+            prompt (str): Prompt to send
+            generation_config (Dict[str, Any]): Sampling settings
+
+        Returns:
+            AIResponse: Response text and accounting
+        """
+        self.stats.in_flight += 1
+        try:
+            response = await self._complete(prompt, generation_config)
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            raise
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.in_flight -= 1
+        self.stats.record(response.tokens_in, response.tokens_out, response.latency_ms)
+        return response
+
+    async def generate_stream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Run one model call, yielding text as it is generated
+
+        Args:
+            prompt (str): Prompt to send
+            generation_config (Dict[str, Any]): Sampling settings
+
+        Yields:
+            str: Response text pieces
+        """
+        started = time.monotonic()
+        produced = []
+        self.stats.in_flight += 1
+        try:
+            async for text in self._stream(prompt, generation_config):
+                produced.append(text)
+                yield text
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            raise
+        except GeneratorExit:
+            # The caller stopped reading (e.g. the JSON array was complete); still a served call
+            self._record_stream(prompt, produced, started)
+            raise
+        except Exception:
+            self.stats.errors += 1
+            raise
+        else:
+            self._record_stream(prompt, produced, started)
+        finally:
+            self.stats.in_flight -= 1
+
+    def _record_stream(self, prompt: str, produced: List[str], started: float) -> None:
+        self.stats.record(
+            estimate_tokens(prompt),
+            estimate_tokens(''.join(produced)),
+            (time.monotonic() - started) * 1000
+        )
+
+class GeminiProvider(AIProvider):
+    """Google Gemini through google.generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = GEMINI_MODEL):
+        super().__init__()
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not self.api_key:
+            raise ValueError("Gemini API key not provided. Set GEMINI_API_KEY environment variable.")
+
+        import google.generativeai as genai
+
+        # Configure Gemini
+        genai.configure(api_key=self.api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def is_available(self) -> bool:
+        return bool(self.api_key)
+
+    async def _complete(self, prompt: str, generation_config: Dict[str, Any]) -> AIResponse:
+        started = time.monotonic()
+        response = await self.model.generate_content_async(prompt, generation_config=generation_config)
+        latency_ms = (time.monotonic() - started) * 1000
+
+        try:
+            text = response.text
+        except ValueError:
+            # No text parts, e.g. the candidate was blocked
+            text = ""
+
+        # Prefer the API's own token counts when it reports them
+        usage = getattr(response, 'usage_metadata', None)
+        tokens_in = getattr(usage, 'prompt_token_count', None) or estimate_tokens(prompt)
+        tokens_out = getattr(usage, 'candidates_token_count', None) or estimate_tokens(text)
+        return AIResponse(text, self.name, tokens_in, tokens_out, latency_ms)
+
+    async def _stream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=generation_config,
+            stream=True
+        )
+        async for piece in response:
+            try:
+                text = piece.text
+            except ValueError:
+                # Pieces without text parts (e.g. only finish metadata)
+                continue
+            if text:
+                yield text
+
+class LocalStubProvider(AIProvider):
+    """
+    Deterministic offline stand-in for load testing
+
+    Answers the prompts GeminiAI builds with items pulled from the prompt
+    itself by simple rules, after a latency that grows with prompt size.
+    Errors are injected at AI_STUB_ERROR_RATE from a seeded generator, so a
+    run is repeatable.
+    """
+
+    name = "local"
+    model_name = "local-stub"
+
+    _LINK = re.compile(r'(?<!!)\[([^\]]*)\]\(([^)\s]+)\)')
+    _IMAGE = re.compile(r'!\[([^\]]*)\]\(([^)\s]+)\)')
+    _EMAIL = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+    _DOCUMENT = re.compile(r'=== DOCUMENT (\d+) ===\n(.*?)\n=== END DOCUMENT \1 ===', re.DOTALL)
+    _DATA_TYPE = re.compile(r'Task: (?:Extract|Structure these) (\S+)')
+
+    def __init__(
+        self,
+        latency_ms: float = AI_STUB_LATENCY_MS,
+        ms_per_1k_tokens: float = AI_STUB_MS_PER_1K_TOKENS,
+        error_rate: float = AI_STUB_ERROR_RATE,
+        seed: int = AI_STUB_SEED
+    ):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def _latency_seconds(self, prompt: str) -> float:
+        return (self.latency_ms + self.ms_per_1k_tokens * estimate_tokens(prompt) / 1000) / 1000
+
+    def _maybe_fail(self) -> None:
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise AIProviderError("Injected local provider error")
+
+    def _items(self, content: str, data_type: str) -> List[Dict[str, Any]]:
+        """Rule-based items from minimized page content"""
+        if data_type == 'emails':
+            emails = dict.fromkeys(match.lower() for match in self._EMAIL.findall(content))
+            return [{"email": email, "context": "", "type": "contact"} for email in emails]
+        if data_type == 'links':
+            return [
+                {"url": url, "text": text, "category": "navigation", "importance": 5, "section": "content"}
+                for text, url in self._LINK.findall(content)
+            ]
+        if data_type == 'images':
+            return [
+                {"url": src, "alt": alt, "context": "", "type": "content", "relevance": 5}
+                for alt, src in self._IMAGE.findall(content)
+            ]
+
+        items = []
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith(('---', 'Title:', 'Description:', '[...')):
+                continue
+            if line.startswith('#'):
+                category, text = "heading", line.lstrip('#').strip()
+            elif line.startswith('- '):
+                category, text = "list_item", line[2:]
+            else:
+                category, text = "paragraph", line
+            items.append({"text": text, "category": category, "importance": 5, "length": len(text)})
+        return items
+
+    def _answer(self, prompt: str) -> str:
+        """Build the response GeminiAI expects for this prompt"""
+        match = self._DATA_TYPE.search(prompt)
+        data_type = match.group(1) if match else 'text'
+
+        documents = self._DOCUMENT.findall(prompt)
+        if documents:
+            return json.dumps({
+                number: self._items(content, data_type)[:100]
+                for number, content in documents
+            })
+
+        if '\nItems:\n' in prompt:
+            # Hybrid re-rank: hand the items back with a category
+            raw = prompt.split('\nItems:\n', 1)[1].split('\n\nTask:', 1)[0]
+            try:
+                items = json.loads(raw)
+            except json.JSONDecodeError:
+                items = []
+            for item in items:
+                if isinstance(item, dict):
+                    item.setdefault("category", item.get("type", "general"))
+                    item.setdefault("importance", 5)
+            return json.dumps(items[:100])
+
+        if '\nPage Content:\n' in prompt:
+            content = prompt.split('\nPage Content:\n', 1)[1].split('\n\nTask:', 1)[0]
+            return json.dumps(self._items(content, data_type)[:100])
+
+        return json.dumps({"status": "connected", "model": self.model_name})
+
+    async def _complete(self, prompt: str, generation_config: Dict[str, Any]) -> AIResponse:
+        started = time.monotonic()
+        await asyncio.sleep(self._latency_seconds(prompt))
+        self._maybe_fail()
+        text = self._answer(prompt)
+        return AIResponse(
+            text,
+            self.name,
+            estimate_tokens(prompt),
+            estimate_tokens(text),
+            (time.monotonic() - started) * 1000
+        )
+
+    async def _stream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[str]:
+        latency = self._latency_seconds(prompt)
+        # A fifth of the latency before the first token, the rest spread over the pieces
+        await asyncio.sleep(latency / 5)
+        self._maybe_fail()
+        text = self._answer(prompt)
+        pieces = [text[index:index + 64] for index in range(0, len(text), 64)] or [""]
+        for piece in pieces:
+            await asyncio.sleep(latency * 4 / 5 / len(pieces))
+            yield piece
+
+_providers: Dict[str, AIProvider] = {}
+
+def get_provider(name: str) -> AIProvider:
+    """
+    Get the process-wide provider instance by name
+
+    Args:
+        name (str): "gemini" or "local"
+
+    Returns:
+        AIProvider: Shared provider, so stats cover every caller
+
+    Raises:
+        ValueError: If the name is unknown or the provider isn't configured
+    """
+    provider = _providers.get(name)
+    if provider is None:
+        if name == GeminiProvider.name:
+            provider = GeminiProvider()
+        elif name == LocalStubProvider.name:
+            provider = LocalStubProvider()
+        else:
+            raise ValueError(f"Unknown AI provider: {name}")
+        _providers[name] = provider
+    return provider
+
+def get_provider_stats() -> Dict[str, Dict[str, Any]]:
+    """Accounting for every provider used so far in this process"""
+    return {name: provider.stats.to_dict() for name, provider in _providers.items()}
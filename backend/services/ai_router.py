@@ -0,0 +1,119 @@
+"""
+Routing between deterministic extraction and Gemini for AI mode
+Scores what the rule-based extractors found and sends only ambiguous
+results (or custom instructions) to the model
+"""
+
+import os
+import re
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Routes, from cheapest to most expensive
+AI_ROUTE_SKIP = "skip"      # deterministic results are returned as-is
+AI_ROUTE_HYBRID = "hybrid"  # the model ranks/categorizes pre-extracted items sent as compact JSON
+AI_ROUTE_FULL = "full"      # the model reads the page itself
+
+AI_STRATEGIES = ("auto", AI_ROUTE_SKIP, AI_ROUTE_HYBRID, AI_ROUTE_FULL)
+
+# Completeness/confidence thresholds for the "auto" strategy
+AI_ROUTE_SKIP_SCORE = float(os.getenv("AI_ROUTE_SKIP_SCORE", 0.9))
+AI_ROUTE_HYBRID_SCORE = float(os.getenv("AI_ROUTE_HYBRID_SCORE", 0.5))
+# Beyond this many items the page itself is the cheaper prompt
+AI_HYBRID_MAX_ITEMS = int(os.getenv("AI_HYBRID_MAX_ITEMS", 200))
+
+_EMAIL_PATTERN = re.compile(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$')
+# Common false positives from the email regex (asset names like logo@2x.png)
+_ASSET_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.css', '.js')
+
+def _share(items: List[Dict[str, Any]], check) -> float:
+    if not items:
+        return 0.0
+    return sum(1 for item in items if isinstance(item, dict) and check(item)) / len(items)
+
+def _valid_http_url(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    parsed = urlparse(value)
+    return parsed.scheme in ('http', 'https') and bool(parsed.netloc)
+
+def _email_confident(item: Dict[str, Any]) -> bool:
+    email = str(item.get('email', ''))
+    return bool(_EMAIL_PATTERN.match(email)) and not email.lower().endswith(_ASSET_SUFFIXES)
+
+def _link_confident(item: Dict[str, Any]) -> bool:
+    return _valid_http_url(item.get('url')) and bool(str(item.get('text', '')).strip())
+
+def _image_confident(item: Dict[str, Any]) -> bool:
+    return _valid_http_url(item.get('url')) and bool(str(item.get('alt', '')).strip())
+
+def _phone_confident(item: Dict[str, Any]) -> bool:
+    digits = re.sub(r'\D', '', str(item.get('normalized') or item.get('phone') or ''))
+    return 10 <= len(digits) <= 15 and (item.get('confidence') or 0) >= 60
+
+_SCORERS = {
+    'emails': _email_confident,
+    'links': _link_confident,
+    'images': _image_confident,
+    'phone_numbers': _phone_confident,
+}
+
+def score_extraction(data_type: str, items: List[Any]) -> Optional[float]:
+    """
+    Score deterministic results for completeness and confidence
+
+    Args:
+        data_type (str): Extracted data type
+        items (List[Any]): Items from the rule-based extractor
+
+    Returns:
+        Optional[float]: Share of items that look complete and correct (0-1), or
+        None if the type has no deterministic scorer
+    """
+    scorer = _SCORERS.get(data_type)
+    if scorer is None:
+        return None
+    return _share(items, scorer)
+
+def choose_ai_route(
+    data_type: str,
+    items: List[Any],
+    custom_prompt: Optional[str] = "",
+    strategy: str = "auto"
+) -> Tuple[str, Optional[float], str]:
+    """
+    Decide how much model involvement an AI-mode request needs
+
+    Args:
+        data_type (str): Extracted data type
+        items (List[Any]): Items from the rule-based extractor
+        custom_prompt (Optional[str]): User instructions for the model
+        strategy (str): "auto", or a route forced by the caller
+
+    Returns:
+        Tuple[str, Optional[float], str]: (route, score, reason)
+    """
+    score = score_extraction(data_type, items)
+
+    if strategy != "auto":
+        return strategy, score, "requested"
+    if custom_prompt and custom_prompt.strip():
+        # Free-form instructions can ask for anything on the page
+        return AI_ROUTE_FULL, score, "custom prompt"
+    if not items:
+        return AI_ROUTE_FULL, score, "nothing extracted"
+
+    if score is None:
+        # Text (and site-specific types) need structuring; ranking what we have is cheaper than the page
+        if len(items) <= AI_HYBRID_MAX_ITEMS:
+            return AI_ROUTE_HYBRID, score, "structuring pre-extracted items"
+        return AI_ROUTE_FULL, score, "too many items to send as JSON"
+
+    if score >= AI_ROUTE_SKIP_SCORE:
+        return AI_ROUTE_SKIP, score, "deterministic extraction is complete"
+    if score >= AI_ROUTE_HYBRID_SCORE and len(items) <= AI_HYBRID_MAX_ITEMS:
+        return AI_ROUTE_HYBRID, score, "some items need categorizing"
+    return AI_ROUTE_FULL, score, "deterministic extraction is unreliable"
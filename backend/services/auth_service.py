@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 
 from models.user import User
 from models.plan import Plan
+from services.plan_catalog import PlanCatalog
 
 load_dotenv()
 
@@ -78,7 +79,7 @@ class AuthService:
             return None, "Email already registered"
 
         # Get or create Free plan
-        free_plan = db.query(Plan).filter(Plan.name == "Free").first()
+        free_plan = PlanCatalog.get_by_name("Free")
         if not free_plan:
             free_plan = Plan(
                 name="Free",
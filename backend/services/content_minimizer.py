@@ -0,0 +1,320 @@
+"""
+HTML minimizer for DataZen AI extraction
+Turns a page into compact markdown-like text that fits a token budget,
+keeping only the attributes the requested data type needs
+"""
+
+import os
+import re
+import logging
+from typing import List, Optional, Tuple
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+logger = logging.getLogger(__name__)
+
+GEMINI_PROMPT_TOKEN_BUDGET = int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", 4000))
+# Pages larger than one budget are split into at most this many chunks
+GEMINI_MAX_CHUNKS = int(os.getenv("GEMINI_MAX_CHUNKS", 8))
+
+# Nodes that never carry content the model can use
+DROP_TAGS = {
+    'script', 'style', 'noscript', 'template', 'svg', 'canvas', 'iframe',
+    'object', 'embed', 'video', 'audio', 'source', 'track', 'map',
+    'input', 'select', 'option', 'textarea', 'button', 'link', 'meta', 'head'
+}
+
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'body', 'dd', 'details', 'div',
+    'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2',
+    'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre',
+    'section', 'summary', 'table', 'tbody', 'thead', 'tfoot', 'tr', 'ul'
+}
+
+# Page regions worth naming, so the model can tell navigation from content
+SECTION_TAGS = {'header', 'nav', 'main', 'aside', 'footer'}
+
+TRUNCATION_MARKER = "[... content truncated to fit token budget ...]"
+
+_WHITESPACE = re.compile(r'\s+')
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate without a tokenizer
+
+    Roughly four ASCII characters per token; other scripts (CJK etc.) tend
+    toward one token per character.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    non_ascii = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+def _cut_to_tokens(text: str, tokens: int) -> str:
+    """Longest prefix of text that estimate_tokens puts at no more than tokens"""
+    # Counted in quarter tokens: one per ASCII character, four per other character
+    allowance = tokens * 4
+    for index, char in enumerate(text):
+        allowance -= 1 if ord(char) <= 127 else 4
+        if allowance < 0:
+            return text[:index]
+    return text
+
+class _Renderer:
+    """Walks a parsed document and emits compact lines"""
+
+    def __init__(self, data_type: str):
+        self.data_type = data_type
+        known = data_type in ('text', 'images', 'links', 'emails', 'phone_numbers')
+        # Unknown (custom) types keep everything that might matter
+        self.keep_links = data_type == 'links' or not known
+        self.keep_images = data_type == 'images' or not known
+        self.lines: List[str] = []
+        self.inline: List[str] = []
+        self.prefix = ""
+
+    def flush(self) -> None:
+        text = _WHITESPACE.sub(' ', ''.join(self.inline)).strip(' |')
+        self.inline = []
+        if text:
+            self.lines.append(self.prefix + text)
+            self.prefix = ""
+
+    def _link(self, tag: Tag) -> str:
+        href = (tag.get('href') or '').strip()
+        text = _WHITESPACE.sub(' ', tag.get_text(' ', strip=True))
+        # Linked images (logos, product cards) are part of the anchor's content
+        nested = tag.find_all('img')
+        images = [rendered for rendered in map(self._image, nested) if rendered]
+
+        if not href or href.startswith(('#', 'javascript:')):
+            keep_href = False
+        elif self.keep_links:
+            keep_href = True
+        # Contact types only need the scheme-bearing hrefs
+        elif self.data_type == 'emails':
+            keep_href = href.lower().startswith('mailto:')
+        elif self.data_type == 'phone_numbers':
+            keep_href = href.lower().startswith('tel:')
+        else:
+            keep_href = False
+
+        if keep_href:
+            if not text:
+                # An image-only link is named by its images' alt text
+                text = ' '.join(filter(None, (_WHITESPACE.sub(' ', img.get('alt') or '').strip() for img in nested)))
+            text = f"[{text}]({href})"
+        return ' '.join(part for part in [text] + images if part)
+
+    def _image(self, tag: Tag) -> Optional[str]:
+        if not self.keep_images:
+            return None
+        alt = _WHITESPACE.sub(' ', tag.get('alt') or '').strip()
+        src = tag.get('src') or tag.get('data-src') or tag.get('data-lazy-src') or ''
+        if not src or src.startswith('data:'):
+            return None
+        return f"![{alt}]({src})"
+
+    def walk(self, node: Tag) -> None:
+        for child in node.children:
+            if isinstance(child, Comment):
+                continue
+            if isinstance(child, NavigableString):
+                self.inline.append(str(child))
+                continue
+            if not isinstance(child, Tag):
+                continue
+
+            name = child.name
+            if name in DROP_TAGS or child.get('hidden') is not None or child.get('aria-hidden') == 'true':
+                continue
+            if name == 'a':
+                rendered = self._link(child)
+                if rendered:
+                    self.inline.append(f" {rendered} ")
+                continue
+            if name == 'img':
+                rendered = self._image(child)
+                if rendered:
+                    self.inline.append(f" {rendered} ")
+                continue
+            if name == 'br':
+                self.flush()
+                continue
+            if name in ('td', 'th'):
+                self.walk(child)
+                self.inline.append(' | ')
+                continue
+            if name not in BLOCK_TAGS:
+                self.walk(child)
+                continue
+
+            self.flush()
+            if name in SECTION_TAGS:
+                self.lines.append(f"--- {name} ---")
+            if name in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+                self.prefix = '#' * int(name[1]) + ' '
+            elif name == 'li':
+                self.prefix = '- '
+            elif name == 'tr':
+                self.prefix = '| '
+            self.walk(child)
+            self.flush()
+            if name in SECTION_TAGS:
+                self.lines.append(f"--- end {name} ---")
+
+def _dedupe(lines: List[str]) -> List[str]:
+    """Drop repeated blocks (menus, cards, footers repeated by templates)"""
+    seen = set()
+    unique = []
+    for line in lines:
+        key = line.lower()
+        if key in seen and not line.startswith('---'):
+            continue
+        seen.add(key)
+        unique.append(line)
+
+    # Section markers left with nothing between them are noise
+    compact = []
+    for line in unique:
+        if line.startswith('--- end ') and compact and compact[-1] == f"--- {line[8:]}":
+            compact.pop()
+            continue
+        compact.append(line)
+    return compact
+
+def _render_lines(html_content: str, data_type: str) -> Tuple[List[str], List[str]]:
+    """Parse HTML and return (page header lines, deduplicated content lines)"""
+    try:
+        soup = BeautifulSoup(html_content, 'lxml')
+    except Exception:
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+    header = []
+    if soup.title and soup.title.string:
+        header.append(f"Title: {_WHITESPACE.sub(' ', soup.title.string).strip()}")
+    description = soup.find('meta', attrs={'name': 'description'})
+    if description and description.get('content'):
+        header.append(f"Description: {_WHITESPACE.sub(' ', description['content']).strip()}")
+
+    renderer = _Renderer(data_type)
+    renderer.walk(soup.body or soup)
+    renderer.flush()
+    return header, _dedupe(renderer.lines)
+
+def _line_cost(line: str) -> int:
+    return estimate_tokens(line) + 1
+
+def minimize_html(html_content: str, data_type: str = 'text', token_budget: Optional[int] = None) -> str:
+    """
+    Convert HTML into compact markdown-like text within a token budget
+
+    Args:
+        html_content (str): Raw HTML
+        data_type (str): Requested data type; decides which attributes survive
+        token_budget (Optional[int]): Maximum estimated tokens, defaults to GEMINI_PROMPT_TOKEN_BUDGET
+
+    Returns:
+        str: Compact page content
+    """
+    budget = token_budget or GEMINI_PROMPT_TOKEN_BUDGET
+    header, lines = _render_lines(html_content, data_type)
+
+    output = []
+    used = 0
+    for line in header + lines:
+        cost = _line_cost(line)
+        if used + cost > budget:
+            # Keep the head of an oversized block rather than dropping it whole
+            remaining = budget - used - _line_cost(TRUNCATION_MARKER)
+            if remaining > 32:
+                output.append(_cut_to_tokens(line, remaining - 1))
+            output.append(TRUNCATION_MARKER)
+            break
+        output.append(line)
+        used += cost
+
+    minimized = '\n'.join(output)
+    logger.debug(
+        f"Minimized {len(html_content)} chars of HTML to {len(minimized)} chars "
+        f"(~{estimate_tokens(minimized)} tokens, budget {budget})"
+    )
+    return minimized
+
+def _structural_blocks(lines: List[str]) -> List[List[str]]:
+    """Group lines into blocks that start at a heading or page region"""
+    blocks: List[List[str]] = []
+    for line in lines:
+        starts_block = line.startswith('#') or (line.startswith('--- ') and not line.startswith('--- end '))
+        if starts_block or not blocks:
+            blocks.append([])
+        blocks[-1].append(line)
+    return blocks
+
+def minimize_html_chunks(
+    html_content: str,
+    data_type: str = 'text',
+    chunk_token_budget: Optional[int] = None,
+    max_chunks: Optional[int] = None
+) -> List[str]:
+    """
+    Convert HTML into compact text split on structural boundaries
+
+    Blocks (a heading or page region and what follows) are packed whole into
+    chunks of at most chunk_token_budget; only blocks larger than a chunk are
+    split between lines. Every chunk repeats the page title and description.
+
+    Args:
+        html_content (str): Raw HTML
+        data_type (str): Requested data type; decides which attributes survive
+        chunk_token_budget (Optional[int]): Maximum estimated tokens per chunk, defaults to GEMINI_PROMPT_TOKEN_BUDGET
+        max_chunks (Optional[int]): Maximum number of chunks, defaults to GEMINI_MAX_CHUNKS
+
+    Returns:
+        List[str]: Compact page content, one entry per chunk (a single entry for pages that fit)
+    """
+    budget = chunk_token_budget or GEMINI_PROMPT_TOKEN_BUDGET
+    limit = max_chunks or GEMINI_MAX_CHUNKS
+    header, lines = _render_lines(html_content, data_type)
+    header_cost = sum(_line_cost(line) for line in header)
+    # Leave room for content even when the header itself is huge
+    content_budget = max(budget - header_cost, budget // 2)
+
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+
+    def close():
+        nonlocal current, used
+        if current:
+            chunks.append(current)
+        current, used = [], 0
+
+    for block in _structural_blocks(lines):
+        block_cost = sum(_line_cost(line) for line in block)
+        if used and used + block_cost > content_budget:
+            close()
+        for line in block:
+            cost = _line_cost(line)
+            if cost > content_budget:
+                line = _cut_to_tokens(line, content_budget - 1)
+                cost = content_budget
+            if used and used + cost > content_budget:
+                close()
+            current.append(line)
+            used += cost
+    close()
+
+    if not chunks:
+        return ['\n'.join(header)]
+
+    truncated = len(chunks) > limit
+    chunks = chunks[:limit]
+    if truncated:
+        chunks[-1].append(TRUNCATION_MARKER)
+
+    logger.debug(f"Split {len(html_content)} chars of HTML into {len(chunks)} chunks of <= {budget} tokens")
+    return ['\n'.join(header + chunk) for chunk in chunks]
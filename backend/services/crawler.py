@@ -0,0 +1,519 @@
+"""
+Multi-page site crawling for DataZen
+Walks a site breadth-first from a seed URL through a deduplicating frontier,
+politely per host (concurrency, delay, robots.txt), and yields each page's
+result as soon as it has been scraped
+"""
+
+import os
+import math
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from .utils import fetch_robots_parser
+from .host_backoff import HostBackoff
+
+logger = logging.getLogger(__name__)
+
+# Hard caps on what a single crawl request may ask for
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", 500))
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", 5))
+CRAWL_MAX_DOMAINS = int(os.getenv("CRAWL_MAX_DOMAINS", 10))
+# Pages in flight across all hosts of one crawl
+CRAWL_MAX_CONCURRENCY = int(os.getenv("CRAWL_MAX_CONCURRENCY", 8))
+# Politeness per host: pages in flight, and seconds between request starts
+CRAWL_HOST_CONCURRENCY = int(os.getenv("CRAWL_HOST_CONCURRENCY", 2))
+CRAWL_HOST_DELAY_SECONDS = float(os.getenv("CRAWL_HOST_DELAY_SECONDS", 1.0))
+# Longest robots.txt Crawl-delay / host cool-down a crawl will wait out
+CRAWL_MAX_HOST_DELAY_SECONDS = float(os.getenv("CRAWL_MAX_HOST_DELAY_SECONDS", 30))
+
+# Query parameters that never change page content
+_TRACKING_PARAMS = {'gclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga', 'ref', 'igshid'}
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+# Links to these are downloads, not pages
+_SKIPPED_EXTENSIONS = (
+    '.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.iso',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.bmp',
+    '.mp3', '.mp4', '.avi', '.mov', '.webm', '.wav',
+    '.css', '.js', '.json', '.xml', '.rss', '.woff', '.woff2', '.ttf',
+    '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.csv',
+)
+
+def _normalize_path(path: str) -> str:
+    # Resolve "." and ".." segments the way browsers do
+    segments: List[str] = []
+    for segment in path.split('/'):
+        if segment == '..':
+            if len(segments) > 1:
+                segments.pop()
+        elif segment != '.':
+            segments.append(segment)
+    if path.endswith(('/.', '/..')):
+        segments.append('')
+    normalized = '/'.join(segments)
+    return normalized if normalized.startswith('/') else '/' + normalized
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to the key used to decide whether a page was already seen
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, resolves dot segments and sorts the query string.
+
+    Args:
+        url (str): Absolute URL
+
+    Returns:
+        str: Canonical form of the URL
+    """
+    parsed = urlparse(url.strip())
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').lower().rstrip('.')
+    try:
+        port = parsed.port
+    except ValueError:
+        port = None
+    netloc = host if port in (None, _DEFAULT_PORTS.get(scheme)) else f"{host}:{port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in _TRACKING_PARAMS and not key.lower().startswith('utm_')
+    )
+    return urlunparse((scheme, netloc, _normalize_path(parsed.path or '/'), '', urlencode(query), ''))
+
+def extract_page_links(html: str, base_url: str) -> List[str]:
+    """
+    Collect crawlable http(s) links from a page
+
+    Args:
+        html (str): Page HTML
+        base_url (str): URL the page was served from, for relative links
+
+    Returns:
+        List[str]: Absolute link URLs in document order, without fragments or downloads
+    """
+    links = []
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(['a', 'base']))
+    base_tag = soup.find('base', href=True)
+    if base_tag:
+        base_url = urljoin(base_url, base_tag['href'])
+
+    for anchor in soup.find_all('a', href=True):
+        if 'nofollow' in (anchor.get('rel') or []):
+            continue
+        href = anchor['href'].strip()
+        if not href or href.startswith(('#', 'mailto:', 'tel:', 'javascript:', 'data:')):
+            continue
+        absolute = urljoin(base_url, href).split('#', 1)[0]
+        parsed = urlparse(absolute)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            continue
+        if parsed.path.lower().endswith(_SKIPPED_EXTENSIONS):
+            continue
+        links.append(absolute)
+    return links
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set for seen URLs
+
+    Membership tests may return false positives at roughly error_rate once
+    capacity items are added (a URL is then wrongly treated as seen), never
+    false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = max(int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.size
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False if it was (probably) already present"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+@dataclass
+class _HostQueue:
+    """Pending URLs and politeness state for one host"""
+    pending: Deque[Tuple[str, int]] = field(default_factory=deque)
+    in_flight: int = 0
+    next_allowed: float = 0.0
+    delay: float = 0.0
+
+class URLFrontier:
+    """
+    Queue of URLs to visit, deduplicated by canonical key and scheduled per host
+
+    URLs are served breadth-first within each host; hosts take turns, and a
+    host is only ready once it is below its concurrency limit and its delay
+    since the previous request has passed.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        host_concurrency: int = CRAWL_HOST_CONCURRENCY,
+        host_delay: float = CRAWL_HOST_DELAY_SECONDS
+    ):
+        self.seen = BloomFilter(capacity)
+        self.host_concurrency = max(host_concurrency, 1)
+        self.host_delay = host_delay
+        self._hosts: "OrderedDict[str, _HostQueue]" = OrderedDict()
+        self.pending = 0
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        """Host a URL is scheduled under"""
+        return (urlparse(url).hostname or '').lower()
+
+    def host(self, host: str) -> _HostQueue:
+        """Politeness state for a host, created on first use"""
+        if host not in self._hosts:
+            self._hosts[host] = _HostQueue(delay=self.host_delay)
+        return self._hosts[host]
+
+    @property
+    def hosts(self) -> Set[str]:
+        return set(self._hosts)
+
+    def push(self, url: str, depth: int) -> bool:
+        """
+        Queue a URL unless its canonical form was seen before
+
+        Returns:
+            bool: True if the URL was new and queued
+        """
+        if not self.seen.add(canonicalize_url(url)):
+            return False
+        self.host(self.host_of(url)).pending.append((url, depth))
+        self.pending += 1
+        return True
+
+    def _ready(self, state: _HostQueue, now: float) -> bool:
+        return bool(state.pending) and state.in_flight < self.host_concurrency and state.next_allowed <= now
+
+    def pop_ready(self, now: float) -> Optional[Tuple[str, int]]:
+        """
+        Take the next URL from a host that may be fetched now, and mark it in flight
+
+        Returns:
+            Optional[Tuple[str, int]]: (url, depth), or None if no host is ready
+        """
+        for host in list(self._hosts):
+            state = self._hosts[host]
+            # Rotate so the next call starts at the following host
+            self._hosts.move_to_end(host)
+            if self._ready(state, now):
+                url, depth = state.pending.popleft()
+                self.pending -= 1
+                state.in_flight += 1
+                state.next_allowed = now + state.delay
+                return url, depth
+        return None
+
+    def release(self, url: str) -> None:
+        """Mark a fetched URL as no longer in flight"""
+        self._hosts[self.host_of(url)].in_flight -= 1
+
+    def drop_host(self, host: str) -> int:
+        """Discard every pending URL of a host; returns how many were dropped"""
+        state = self._hosts.get(host)
+        if not state:
+            return 0
+        dropped = len(state.pending)
+        state.pending.clear()
+        self.pending -= dropped
+        return dropped
+
+    def next_ready_in(self, now: float) -> Optional[float]:
+        """Seconds until some host with pending URLs becomes ready, or None if it depends on fetches in flight"""
+        waits = [
+            max(state.next_allowed - now, 0.0)
+            for state in self._hosts.values()
+            if state.pending and state.in_flight < self.host_concurrency
+        ]
+        return min(waits) if waits else None
+
+# Fetches one page: returns the scraper result and the page HTML (None if unavailable)
+PageFetcher = Callable[[str], Awaitable[Tuple[Dict[str, Any], Optional[str]]]]
+
+class SiteCrawler:
+    """
+    One crawl from a seed URL
+
+    Pages are fetched through fetch_page (the regular scrape pipeline, so each
+    page runs the requested data_type extractor) and their links feed the
+    frontier until the depth, page or domain limits are reached.
+    """
+
+    def __init__(
+        self,
+        seed_url: str,
+        fetch_page: PageFetcher,
+        max_depth: int = 2,
+        max_pages: int = 50,
+        same_domain: bool = True,
+        allowed_domains: Optional[List[str]] = None,
+        max_domains: int = 1,
+        check_robots: bool = True,
+        host_delay: float = CRAWL_HOST_DELAY_SECONDS,
+        user_agent: str = "*"
+    ):
+        """
+        Args:
+            seed_url (str): First page to visit
+            fetch_page (PageFetcher): Coroutine scraping one URL
+            max_depth (int): Link hops from the seed (0 = only the seed)
+            max_pages (int): Pages to visit at most
+            same_domain (bool): Stay on the seed's host and its subdomains
+            allowed_domains (Optional[List[str]]): Further domains (and their subdomains) to follow
+            max_domains (int): Distinct hosts to visit at most
+            check_robots (bool): Honour robots.txt rules and Crawl-delay
+            host_delay (float): Minimum seconds between requests to one host
+            user_agent (str): User agent robots.txt rules are matched for
+        """
+        self.seed_url = seed_url
+        self.fetch_page = fetch_page
+        self.max_depth = max(0, min(max_depth, CRAWL_MAX_DEPTH))
+        self.max_pages = max(1, min(max_pages, CRAWL_MAX_PAGES))
+        self.max_domains = max(1, min(max_domains, CRAWL_MAX_DOMAINS))
+        self.check_robots = check_robots
+        self.host_delay = max(host_delay, 0.0)
+        self.user_agent = user_agent
+
+        seed_host = URLFrontier.host_of(seed_url)
+        self.scopes = [domain.lower().lstrip('.') for domain in (allowed_domains or [])]
+        if same_domain or not self.scopes:
+            self.scopes.append(seed_host[4:] if seed_host.startswith('www.') else seed_host)
+        self.follow_any = not same_domain and not allowed_domains
+
+        # Links discovered vastly outnumber pages visited
+        self.frontier = URLFrontier(capacity=max(self.max_pages * 50, 10000), host_delay=self.host_delay)
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self.frontier.push(seed_url, 0)
+
+        self.pages_started = 0
+        self.pages_crawled = 0
+        self.pages_failed = 0
+        self.skipped_robots = 0
+        self.skipped_out_of_scope = 0
+        self.skipped_cooling_down = 0
+
+    def add_seeds(self, urls: Iterable[str]) -> int:
+        """
+        Queue further start pages (e.g. from the site's sitemap) at depth 0
+
+        Args:
+            urls (Iterable[str]): Page URLs; out-of-scope and already queued ones are ignored
+
+        Returns:
+            int: Number of URLs queued
+        """
+        added = 0
+        for url in urls:
+            if self.in_scope(url) and self.frontier.push(url, 0):
+                added += 1
+        return added
+
+    def in_scope(self, url: str) -> bool:
+        """Check a link against the domain limits"""
+        host = URLFrontier.host_of(url)
+        if not host:
+            return False
+        if not self.follow_any and not any(host == scope or host.endswith('.' + scope) for scope in self.scopes):
+            return False
+        hosts = self.frontier.hosts
+        return host in hosts or len(hosts) < self.max_domains
+
+    async def _robots_for(self, url: str) -> Optional[RobotFileParser]:
+        host = URLFrontier.host_of(url)
+        if host not in self._robots:
+            try:
+                self._robots[host] = await asyncio.to_thread(fetch_robots_parser, url)
+            except Exception as e:
+                # Same policy as single scrapes: unreadable robots.txt allows crawling
+                logger.warning(f"Could not check robots.txt for {host}: {e}")
+                self._robots[host] = None
+            robots = self._robots[host]
+            crawl_delay = robots.crawl_delay(self.user_agent) if robots else None
+            state = self.frontier.host(host)
+            state.delay = max(self.host_delay, min(float(crawl_delay or 0), CRAWL_MAX_HOST_DELAY_SECONDS))
+        return self._robots[host]
+
+    async def _allowed(self, url: str) -> bool:
+        if not self.check_robots:
+            return True
+        robots = await self._robots_for(url)
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    async def _visit(self, url: str, depth: int) -> Dict[str, Any]:
+        started = time.monotonic()
+        links: List[str] = []
+        try:
+            result, html = await self.fetch_page(url)
+            if html:
+                links = extract_page_links(html, result.get('url') or url)
+        except Exception as e:
+            detail = getattr(e, 'detail', None)
+            result = {'success': False, 'error': str(detail or e) or repr(e)}
+
+        return {
+            'type': 'page',
+            'url': url,
+            'final_url': result.get('url') or url,
+            'depth': depth,
+            'success': bool(result.get('success')),
+            'data_type': result.get('data_type'),
+            'data': result.get('data', []),
+            'count': result.get('count', 0),
+            'error': result.get('error'),
+            'links_found': len(links),
+            'processing_time_seconds': round(time.monotonic() - started, 2),
+            '_links': links,
+        }
+
+    def _enqueue_links(self, page: Dict[str, Any]) -> None:
+        depth = page['depth'] + 1
+        if depth > self.max_depth:
+            return
+        for link in page['_links']:
+            if self.in_scope(link):
+                self.frontier.push(link, depth)
+            else:
+                self.skipped_out_of_scope += 1
+
+    async def _next_url(self) -> Optional[Tuple[str, int]]:
+        # Skip URLs robots.txt forbids or whose host is cooling down, without spending a page on them
+        while True:
+            now = time.monotonic()
+            entry = self.frontier.pop_ready(now)
+            if entry is None:
+                return None
+            url, _ = entry
+            host = URLFrontier.host_of(url)
+
+            cool_down = HostBackoff.remaining(url)
+            if cool_down > 0:
+                self.frontier.release(url)
+                if cool_down > CRAWL_MAX_HOST_DELAY_SECONDS:
+                    self.skipped_cooling_down += 1 + self.frontier.drop_host(host)
+                else:
+                    # Put it back and revisit the host once the cool-down ends
+                    state = self.frontier.host(host)
+                    state.pending.appendleft(entry)
+                    self.frontier.pending += 1
+                    state.next_allowed = now + cool_down
+                continue
+
+            if await self._allowed(url):
+                return entry
+            self.frontier.release(url)
+            self.skipped_robots += 1
+
+    def summary(self, stopped_reason: str) -> Dict[str, Any]:
+        """Counters for the final stream event"""
+        return {
+            'type': 'done',
+            'seed_url': self.seed_url,
+            'pages_crawled': self.pages_crawled,
+            'pages_succeeded': self.pages_crawled - self.pages_failed,
+            'pages_failed': self.pages_failed,
+            'urls_discovered': self.frontier.seen.count,
+            'frontier_remaining': self.frontier.pending,
+            'domains': sorted(self.frontier.hosts),
+            'skipped_robots': self.skipped_robots,
+            'skipped_out_of_scope': self.skipped_out_of_scope,
+            'skipped_cooling_down': self.skipped_cooling_down,
+            'stopped_reason': stopped_reason,
+        }
+
+    async def crawl(self, should_continue: Optional[Callable[[], bool]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Crawl and yield each page as it finishes, then a final summary
+
+        Args:
+            should_continue (Optional[Callable[[], bool]]): Checked before each new
+                page is started (e.g. remaining quota); False stops the crawl
+
+        Yields:
+            Dict[str, Any]: "page" events (url, depth, success, data, count, error,
+            links_found, ...) in completion order, then one "done" event
+        """
+        running: Dict[asyncio.Task, str] = {}
+        stopped_reason = "frontier exhausted"
+
+        try:
+            while True:
+                while len(running) < CRAWL_MAX_CONCURRENCY and self.pages_started < self.max_pages:
+                    if should_continue and not should_continue():
+                        stopped_reason = "quota exhausted"
+                        break
+                    entry = await self._next_url()
+                    if entry is None:
+                        break
+                    url, depth = entry
+                    self.pages_started += 1
+                    running[asyncio.create_task(self._visit(url, depth))] = url
+
+                if not running:
+                    wait = self.frontier.next_ready_in(time.monotonic())
+                    if self.pages_started >= self.max_pages:
+                        stopped_reason = "page limit reached"
+                        break
+                    if stopped_reason == "quota exhausted" or wait is None:
+                        break
+                    await asyncio.sleep(wait)
+                    continue
+
+                # Wake when a page finishes or, if another may start, a waiting host becomes ready
+                can_start = (
+                    len(running) < CRAWL_MAX_CONCURRENCY
+                    and self.pages_started < self.max_pages
+                    and stopped_reason != "quota exhausted"
+                )
+                timeout = self.frontier.next_ready_in(time.monotonic()) if can_start else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    self.frontier.release(running.pop(task))
+                    page = task.result()
+                    self.pages_crawled += 1
+                    if not page['success']:
+                        self.pages_failed += 1
+                    self._enqueue_links(page)
+                    page.pop('_links')
+                    yield page
+
+            yield self.summary(stopped_reason)
+        finally:
+            # Consumer stopped reading (client disconnect); abandon pages in flight
+            for task in running:
+                task.cancel()
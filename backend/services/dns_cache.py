@@ -0,0 +1,350 @@
+"""
+DNS resolution cache and happy-eyeballs connect for DataZen's fetch layer
+Shared by every requests-based fetcher through a common transport adapter
+"""
+
+import os
+import time
+import errno
+import socket
+import logging
+import selectors
+import threading
+import ipaddress
+from typing import Dict, List, Optional, Tuple, Any
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+try:
+    import dns.resolver
+    DNSPYTHON_AVAILABLE = True
+except ImportError:
+    DNSPYTHON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# getaddrinfo() doesn't expose record TTLs, so this is used unless dnspython is installed
+DNS_CACHE_TTL_SECONDS = float(os.getenv("DNS_CACHE_TTL_SECONDS", 300))
+DNS_CACHE_MIN_TTL_SECONDS = float(os.getenv("DNS_CACHE_MIN_TTL_SECONDS", 30))
+DNS_NEGATIVE_TTL_SECONDS = float(os.getenv("DNS_NEGATIVE_TTL_SECONDS", 30))
+DNS_CACHE_MAX_ENTRIES = int(os.getenv("DNS_CACHE_MAX_ENTRIES", 4096))
+
+# RFC 8305 "Connection Attempt Delay"
+HAPPY_EYEBALLS_DELAY_SECONDS = float(os.getenv("HAPPY_EYEBALLS_DELAY_MS", 250)) / 1000
+
+# Shared connection pool sizing for the fetch adapter
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 100))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 10))
+
+AddrInfo = Tuple[int, int, int, str, Any]
+
+_CONNECT_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, 10035}  # 10035: WSAEWOULDBLOCK
+
+class DNSCache:
+    """Thread-safe, process-wide cache of getaddrinfo results with negative caching"""
+
+    def __init__(self, max_entries: int = DNS_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, int], Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self._host_locks: Dict[Tuple[str, int], threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, host: str, port: int) -> Tuple[List[AddrInfo], float]:
+        """Resolve a host and return (addrinfos, ttl seconds)"""
+        ttl = DNS_CACHE_TTL_SECONDS
+
+        if DNSPYTHON_AVAILABLE:
+            # Use real record TTLs; fall back to getaddrinfo for /etc/hosts names
+            addrinfos: List[AddrInfo] = []
+            ttls = []
+            for rdtype, family in (("AAAA", socket.AF_INET6), ("A", socket.AF_INET)):
+                try:
+                    answer = dns.resolver.resolve(host, rdtype)
+                except Exception:
+                    continue
+                ttls.append(answer.rrset.ttl)
+                for record in answer:
+                    sockaddr = (record.address, port, 0, 0) if family == socket.AF_INET6 else (record.address, port)
+                    addrinfos.append((family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", sockaddr))
+            if addrinfos:
+                return addrinfos, max(DNS_CACHE_MIN_TTL_SECONDS, min(ttls))
+
+        addrinfos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        return addrinfos, ttl
+
+    def _get_cached(self, key: Tuple[str, int]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        return None
+
+    def _store(self, key: Tuple[str, int], value: Any, ttl: float) -> None:
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Evict the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def _resolve_uncached(self, key: Tuple[str, int]) -> List[AddrInfo]:
+        host, port = key
+        self.misses += 1
+        try:
+            addrinfos, ttl = self._lookup(host, port)
+        except socket.gaierror as e:
+            self._store(key, e, DNS_NEGATIVE_TTL_SECONDS)
+            raise
+        self._store(key, addrinfos, ttl)
+        return addrinfos
+
+    @staticmethod
+    def _unwrap(value: Any) -> List[AddrInfo]:
+        if isinstance(value, socket.gaierror):
+            raise socket.gaierror(*value.args)
+        return value
+
+    def resolve(self, host: str, port: int) -> List[AddrInfo]:
+        """
+        Resolve a host, serving from cache when possible
+
+        Args:
+            host (str): Hostname or IP literal
+            port (int): Port
+
+        Returns:
+            List[AddrInfo]: getaddrinfo-style address list
+        """
+        if _is_ip_literal(host):
+            return socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+
+        key = (host.lower(), port)
+        cached = self._get_cached(key)
+        if cached is not None:
+            return self._unwrap(cached)
+
+        # One resolver call per host even when many threads miss at once
+        with self._lock:
+            host_lock = self._host_locks.setdefault(key, threading.Lock())
+        with host_lock:
+            cached = self._get_cached(key)
+            if cached is not None:
+                return self._unwrap(cached)
+            try:
+                return self._resolve_uncached(key)
+            finally:
+                with self._lock:
+                    self._host_locks.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+def _is_ip_literal(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+        return True
+    except ValueError:
+        return False
+
+# Process-wide cache
+dns_cache = DNSCache()
+
+def _interleave_families(addrinfos: List[AddrInfo]) -> List[AddrInfo]:
+    """Alternate address families, starting with the resolver's first choice (RFC 8305)"""
+    if not addrinfos:
+        return []
+    first_family = addrinfos[0][0]
+    primary = [info for info in addrinfos if info[0] == first_family]
+    secondary = [info for info in addrinfos if info[0] != first_family]
+    ordered = []
+    for i in range(max(len(primary), len(secondary))):
+        if i < len(primary):
+            ordered.append(primary[i])
+        if i < len(secondary):
+            ordered.append(secondary[i])
+    return ordered
+
+def create_connection(
+    address: Tuple[str, int],
+    timeout: Optional[float] = None,
+    source_address: Optional[Tuple[str, int]] = None,
+    socket_options: Optional[list] = None
+) -> socket.socket:
+    """
+    Connect to a host using cached DNS and staggered parallel attempts
+
+    A new attempt to the next address (alternating IPv6/IPv4) starts every
+    HAPPY_EYEBALLS_DELAY_MS while earlier ones are still pending; the first
+    socket to connect wins and the rest are closed.
+
+    Args:
+        address (Tuple[str, int]): (host, port)
+        timeout (Optional[float]): Overall connect timeout in seconds
+        source_address (Optional[Tuple[str, int]]): Local address to bind
+        socket_options (Optional[list]): (level, option, value) tuples to apply
+
+    Returns:
+        socket.socket: Connected socket
+    """
+    host, port = address
+    addrinfos = _interleave_families(dns_cache.resolve(host, port))
+    if not addrinfos:
+        raise OSError(f"getaddrinfo returned no addresses for {host}")
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    selector = selectors.DefaultSelector()
+    pending: Dict[socket.socket, Any] = {}
+    errors: List[OSError] = []
+    winner: Optional[socket.socket] = None
+    next_index = 0
+    next_attempt_at = time.monotonic()
+
+    try:
+        while winner is None:
+            now = time.monotonic()
+
+            # Start the next attempt if nothing is pending or the stagger delay elapsed
+            if next_index < len(addrinfos) and (not pending or now >= next_attempt_at):
+                family, socktype, proto, _, sockaddr = addrinfos[next_index]
+                next_index += 1
+                sock = None
+                try:
+                    sock = socket.socket(family, socktype, proto)
+                    for option in socket_options or []:
+                        sock.setsockopt(*option)
+                    if source_address:
+                        sock.bind(source_address)
+                    sock.setblocking(False)
+                    err = sock.connect_ex(sockaddr)
+                except OSError as e:
+                    errors.append(e)
+                    if sock:
+                        sock.close()
+                    continue
+
+                if err == 0:
+                    winner = sock
+                    break
+                if err not in _CONNECT_IN_PROGRESS:
+                    errors.append(OSError(err, os.strerror(err)))
+                    sock.close()
+                    continue
+
+                pending[sock] = sockaddr
+                selector.register(sock, selectors.EVENT_WRITE)
+                next_attempt_at = now + HAPPY_EYEBALLS_DELAY_SECONDS
+
+            if not pending:
+                if next_index >= len(addrinfos):
+                    raise errors[-1] if errors else OSError(f"Could not connect to {host}")
+                continue
+
+            if deadline is not None and now >= deadline:
+                raise socket.timeout("timed out")
+
+            wait = None
+            if next_index < len(addrinfos):
+                wait = max(0.0, next_attempt_at - now)
+            if deadline is not None:
+                remaining = max(0.0, deadline - now)
+                wait = remaining if wait is None else min(wait, remaining)
+
+            for key, _ in selector.select(wait):
+                sock = key.fileobj
+                selector.unregister(sock)
+                del pending[sock]
+                err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err == 0 and winner is None:
+                    winner = sock
+                else:
+                    errors.append(OSError(err, os.strerror(err)))
+                    sock.close()
+    finally:
+        for sock in pending:
+            sock.close()
+        selector.close()
+
+    if timeout is not None:
+        winner.settimeout(timeout)
+    else:
+        winner.setblocking(True)
+    return winner
+
+class _CachedDNSConnectionMixin:
+    """urllib3 connection that connects through the DNS cache"""
+
+    def _new_conn(self) -> socket.socket:
+        timeout = self.timeout if isinstance(self.timeout, (int, float)) else None
+        try:
+            return create_connection(
+                (self._dns_host, self.port),
+                timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options
+            )
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self,
+                f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+
+class _CachedDNSHTTPConnection(_CachedDNSConnectionMixin, HTTPConnection):
+    pass
+
+class _CachedDNSHTTPSConnection(_CachedDNSConnectionMixin, HTTPSConnection):
+    pass
+
+class _CachedDNSHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+class _CachedDNSHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+class CachedDNSAdapter(HTTPAdapter):
+    """requests transport adapter using the DNS cache and happy-eyeballs connect"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CachedDNSHTTPConnectionPool,
+            "https": _CachedDNSHTTPSConnectionPool,
+        }
+
+_shared_adapter: Optional[CachedDNSAdapter] = None
+_shared_adapter_lock = threading.Lock()
+
+def get_http_adapter() -> CachedDNSAdapter:
+    """
+    Get the process-wide fetch adapter
+
+    Mounting it on several sessions shares both the DNS cache and the
+    keep-alive connection pools. Don't close sessions it is mounted on,
+    since Session.close() closes the adapter's pools too.
+    """
+    global _shared_adapter
+    if _shared_adapter is None:
+        with _shared_adapter_lock:
+            if _shared_adapter is None:
+                _shared_adapter = CachedDNSAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE
+                )
+    return _shared_adapter
+
+def mount_shared_adapter(session) -> None:
+    """Route a requests session through the shared fetch adapter"""
+    adapter = get_http_adapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
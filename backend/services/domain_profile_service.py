@@ -0,0 +1,110 @@
+"""
+Per-domain fetch profile service for DataZen
+Records what worked for each domain so later scrapes try the cheapest path first
+"""
+
+import logging
+from typing import Optional
+from urllib.parse import urlparse
+from sqlalchemy.orm import Session
+
+from models.domain_profile import DomainProfile
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest observation in moving averages
+EWMA_ALPHA = 0.2
+
+# Above this share of 403/429 answers, don't bother with the plain HTTP path
+STATIC_FETCH_MAX_BLOCK_RATE = 0.5
+
+def get_profile_domain(url: str) -> str:
+    """Normalize a URL to the key used for domain profiles"""
+    return urlparse(url).netloc.lower()
+
+def _ewma(current: Optional[float], value: float) -> float:
+    if current is None:
+        return value
+    return (1 - EWMA_ALPHA) * current + EWMA_ALPHA * value
+
+class DomainProfileService:
+    """Service for reading and updating domain profiles"""
+
+    @staticmethod
+    def get_profile(db: Session, url: str) -> Optional[DomainProfile]:
+        """Get the profile for a URL's domain"""
+        domain = get_profile_domain(url)
+        if not domain:
+            return None
+        return db.query(DomainProfile).filter(DomainProfile.domain == domain).first()
+
+    @staticmethod
+    def prefers_static_fetch(profile: Optional[DomainProfile]) -> bool:
+        """Check if a plain HTTP fetch is known to produce complete content"""
+        return bool(
+            profile
+            and profile.render_required is False
+            and (profile.block_rate or 0) < STATIC_FETCH_MAX_BLOCK_RATE
+        )
+
+    @staticmethod
+    def record_fetch(
+        db: Session,
+        url: str,
+        latency_ms: Optional[float] = None,
+        status_code: Optional[int] = None,
+        charset: Optional[str] = None,
+        render_required: Optional[bool] = None,
+        wait_strategy: Optional[str] = None,
+        website_type: Optional[str] = None,
+        **_
+    ) -> Optional[DomainProfile]:
+        """
+        Fold one fetch observation into the domain's profile
+
+        Args:
+            db (Session): Database session
+            url (str): Fetched URL
+            latency_ms (Optional[float]): Time to fetch the document
+            status_code (Optional[int]): HTTP status of the document
+            charset (Optional[str]): Detected character set
+            render_required (Optional[bool]): Whether JS rendering added content
+            wait_strategy (Optional[str]): Cheapest wait mode that gave complete content
+            website_type (Optional[str]): EnhancedScraper site type
+
+        Returns:
+            Optional[DomainProfile]: Updated profile
+        """
+        domain = get_profile_domain(url)
+        if not domain:
+            return None
+
+        try:
+            profile = db.query(DomainProfile).filter(DomainProfile.domain == domain).first()
+            if not profile:
+                profile = DomainProfile(domain=domain, block_rate=0.0, fetch_count=0)
+                db.add(profile)
+
+            profile.fetch_count = (profile.fetch_count or 0) + 1
+            if status_code is not None:
+                profile.last_status = status_code
+                blocked = 1.0 if status_code in (403, 429) else 0.0
+                profile.block_rate = _ewma(profile.block_rate, blocked)
+            if latency_ms is not None and status_code is not None and status_code < 400:
+                profile.avg_latency_ms = _ewma(profile.avg_latency_ms, latency_ms)
+            if charset:
+                profile.charset = charset.lower()
+            if render_required is not None:
+                profile.render_required = render_required
+            if wait_strategy:
+                profile.wait_strategy = wait_strategy
+            if website_type:
+                profile.website_type = website_type
+
+            db.commit()
+            return profile
+        except Exception as e:
+            # Profiles are an optimization; never fail a scrape over them
+            db.rollback()
+            logger.warning(f"Could not update domain profile for {domain}: {e}")
+            return None
@@ -17,8 +17,10 @@ from urllib.parse import urljoin, urlparse
 from .utils import (
     validate_url, check_robots_txt, extract_emails, 
     clean_text, normalize_url, is_valid_image_url,
-    format_scrape_result, truncate_html
+    format_scrape_result, truncate_html, detect_charset
 )
+from .dns_cache import mount_shared_adapter
+from .host_backoff import HostBackoff, HostCoolingDown, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
@@ -29,8 +31,14 @@ class EnhancedScraper:
         self.timeout = timeout or int(os.getenv('SCRAPE_TIMEOUT_SECONDS', 120))
         self.max_html_size_mb = max_html_size_mb or int(os.getenv('MAX_HTML_SIZE_MB', 2))
         self.session = requests.Session()
+        # Share DNS cache and keep-alive pools across scraper instances
+        mount_shared_adapter(self.session)
         self.max_retries = 3
         self.retry_delay = 2  # seconds
+        # Character set learned for this domain, used when headers don't declare one
+        self.charset_hint: Optional[str] = None
+        # Observations from the last fetch, for the domain profile store
+        self.last_fetch: Dict[str, Any] = {}
 
         # Comprehensive headers to bypass anti-bot detection
         self.session.headers.update({
@@ -51,76 +59,6 @@ class EnhancedScraper:
             'Sec-Ch-Ua-Platform': '"Windows"',
         })
     
-    def fetch_page_content(self, url: str) -> tuple[str, str]:
-        """Fetch page content with retry logic and anti-bot handling"""
-        last_error = None
-
-        for attempt in range(self.max_retries):
-            try:
-                logger.info(f"Fetching {url} (attempt {attempt + 1}/{self.max_retries})")
-
-                # Add referer header for better compatibility
-                headers = self.session.headers.copy()
-                headers['Referer'] = url
-
-                response = self.session.get(
-                    url,
-                    timeout=self.timeout,
-                    headers=headers,
-                    allow_redirects=True
-                )
-
-                # Check for common anti-bot responses
-                if response.status_code == 429:  # Too Many Requests
-                    logger.warning(f"Rate limited (429) on attempt {attempt + 1}")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay * (attempt + 1))
-                        continue
-                    raise Exception("Rate limited after retries")
-
-                if response.status_code == 403:  # Forbidden
-                    logger.warning(f"Access forbidden (403) - may be blocked by anti-bot")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay)
-                        continue
-                    raise Exception("Access forbidden - website may block scrapers")
-
-                response.raise_for_status()
-
-                # Check content size
-                content_length = len(response.content)
-                max_size_bytes = self.max_html_size_mb * 1024 * 1024
-
-                if content_length > max_size_bytes:
-                    logger.warning(f"Content size ({content_length} bytes) exceeds limit ({max_size_bytes} bytes)")
-                    html_content = response.text[:max_size_bytes]
-                else:
-                    html_content = response.text
-
-                logger.info(f"Successfully fetched {url}")
-                return html_content, response.url
-
-            except requests.exceptions.Timeout:
-                last_error = "Request timeout"
-                logger.warning(f"Timeout on attempt {attempt + 1}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
-            except requests.exceptions.ConnectionError:
-                last_error = "Connection error"
-                logger.warning(f"Connection error on attempt {attempt + 1}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
-            except Exception as e:
-                last_error = str(e)
-                logger.error(f"Error fetching {url} on attempt {attempt + 1}: {e}")
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                    continue
-
-        raise Exception(f"Failed to fetch {url} after {self.max_retries} attempts. Last error: {last_error}")
-
     def detect_website_type(self, url: str, soup: BeautifulSoup) -> str:
         """Detect the type of website for specialized extraction"""
         domain = urlparse(url).netloc.lower()
@@ -388,13 +326,45 @@ class EnhancedScraper:
 
     def fetch_page_content(self, url: str) -> Tuple[str, str]:
         """Fetch page content with enhanced headers and error handling"""
+        # Fail fast on hosts that recently blocked us or were unreachable
+        HostBackoff.check(url)
+
         try:
             # Add random delay to avoid rate limiting
             time.sleep(0.5)
 
+            self.last_fetch = {}
+            started = time.monotonic()
             response = self.session.get(url, timeout=self.timeout, allow_redirects=True)
+            self.last_fetch = {
+                'status_code': response.status_code,
+                'latency_ms': (time.monotonic() - started) * 1000
+            }
+
+            if response.status_code == 429:
+                reason = "rate limited (HTTP 429)"
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                cooldown = HostBackoff.record_failure(url, reason, retry_after)
+                raise HostCoolingDown(urlparse(url).netloc, cooldown, reason)
+
+            if response.status_code == 403:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                cooldown = HostBackoff.record_forbidden(url, retry_after)
+                if cooldown:
+                    raise HostCoolingDown(urlparse(url).netloc, cooldown, "access forbidden (HTTP 403)")
+
             response.raise_for_status()
 
+            # requests assumes ISO-8859-1 when the header has no charset
+            content_type = response.headers.get('Content-Type', '')
+            if 'charset' not in content_type.lower():
+                response.encoding = (
+                    detect_charset(response.content, content_type)
+                    or self.charset_hint
+                    or response.apparent_encoding
+                )
+            self.last_fetch['charset'] = response.encoding
+
             # Check content size
             content_length = len(response.content)
             max_size_bytes = self.max_html_size_mb * 1024 * 1024
@@ -404,8 +374,15 @@ class EnhancedScraper:
                 # Truncate content
                 response._content = response.content[:max_size_bytes]
 
+            HostBackoff.record_success(url)
             return response.text, response.url
 
+        except HostCoolingDown:
+            raise
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            HostBackoff.record_failure(url, type(e).__name__)
+            logger.error(f"Failed to fetch {url}: {e}")
+            raise
         except Exception as e:
             logger.error(f"Failed to fetch {url}: {e}")
             raise
@@ -599,8 +576,18 @@ class EnhancedScraper:
 
         return data
 
-    def scrape(self, url: str, data_type: str = 'text') -> Dict[str, Any]:
-        """Main scraping method with enhanced capabilities"""
+    def scrape(self, url: str, data_type: str = 'text', keep_document: bool = False) -> Dict[str, Any]:
+        """
+        Main scraping method with enhanced capabilities
+
+        Args:
+            url (str): URL to scrape
+            data_type (str): Type of data to extract
+            keep_document (bool): Include the fetched HTML as 'html_content' for later stages
+
+        Returns:
+            Dict[str, Any]: Scraping results
+        """
         try:
             # Validate URL
             if not validate_url(url):
@@ -628,6 +615,7 @@ class EnhancedScraper:
 
             # Detect website type and use appropriate extractor
             website_type = self.detect_website_type(url, soup)
+            self.last_fetch['website_type'] = website_type
             logger.info(f"Detected website type: {website_type} for {url}")
 
             extracted_data = []
@@ -665,6 +653,8 @@ class EnhancedScraper:
                 'website_type': website_type,
                 'timestamp': datetime.now().isoformat()
             })
+            if keep_document:
+                result['html_content'] = html_content
 
             return result
 
@@ -10,12 +10,17 @@ from typing import List, Dict, Any, Optional
 import re
 from datetime import datetime
 import os
+import time
+from urllib.parse import urlparse
 
 from .utils import (
     validate_url, check_robots_txt, extract_emails, 
     clean_text, normalize_url, is_valid_image_url,
-    format_scrape_result, truncate_html
+    format_scrape_result, truncate_html, detect_charset
 )
+from .dns_cache import mount_shared_adapter
+from .host_backoff import HostBackoff, HostCoolingDown, parse_retry_after
+from .result_selection import ExtractionOptions, ItemCollector
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +31,16 @@ class FallbackScraper:
         self.timeout = timeout or int(os.getenv('SCRAPE_TIMEOUT_SECONDS', 120))
         self.max_html_size_mb = max_html_size_mb or int(os.getenv('MAX_HTML_SIZE_MB', 2))
         self.session = requests.Session()
+        # Share DNS cache and keep-alive pools across scraper instances
+        mount_shared_adapter(self.session)
         self.max_retries = 3
         self.retry_delay = 2
+        # Character set learned for this domain, used when headers don't declare one
+        self.charset_hint: Optional[str] = None
+        # Observations from the last fetch, for the domain profile store
+        self.last_fetch: Dict[str, Any] = {}
+        # HTML of the last successful fetch, handed to later stages on request
+        self.last_document: Optional[str] = None
 
         # Comprehensive headers to bypass anti-bot detection
         self.session.headers.update({
@@ -50,8 +63,12 @@ class FallbackScraper:
     
     def fetch_page_content(self, url: str) -> tuple[str, str]:
         """Fetch page content using requests with retry logic"""
-        import time
         last_error = None
+        host_failure = False
+        self.last_fetch = {}
+
+        # Fail fast on hosts that recently blocked us or were unreachable
+        HostBackoff.check(url)
 
         for attempt in range(self.max_retries):
             try:
@@ -61,30 +78,49 @@ class FallbackScraper:
                 headers = self.session.headers.copy()
                 headers['Referer'] = url
 
+                started = time.monotonic()
                 response = self.session.get(
                     url,
                     timeout=self.timeout,
                     headers=headers,
                     allow_redirects=True
                 )
+                self.last_fetch = {
+                    'status_code': response.status_code,
+                    'latency_ms': (time.monotonic() - started) * 1000
+                }
 
                 # Check for common anti-bot responses
                 if response.status_code == 429:  # Too Many Requests
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
                     logger.warning(f"Rate limited (429) on attempt {attempt + 1}")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay * (attempt + 1))
+                    # Only sit out short, server-requested waits; otherwise cool the host down
+                    if attempt < self.max_retries - 1 and retry_after is not None and retry_after <= self.retry_delay * (attempt + 1):
+                        time.sleep(retry_after)
                         continue
-                    raise Exception("Rate limited after retries")
+                    cooldown = HostBackoff.record_failure(url, "rate limited (HTTP 429)", retry_after)
+                    raise HostCoolingDown(urlparse(url).netloc, cooldown, "rate limited (HTTP 429)")
 
                 if response.status_code == 403:  # Forbidden
                     logger.warning(f"Access forbidden (403) - may be blocked by anti-bot")
-                    if attempt < self.max_retries - 1:
-                        time.sleep(self.retry_delay)
-                        continue
-                    raise Exception("Access forbidden - website may block scrapers")
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    cooldown = HostBackoff.record_forbidden(url, retry_after)
+                    if cooldown:
+                        raise HostCoolingDown(urlparse(url).netloc, cooldown, "access forbidden - website may block scrapers")
+                    # Retrying won't change the answer, and each retry would count as another 403
+                    last_error = "Access forbidden (HTTP 403) - website may block scrapers"
+                    host_failure = False
+                    break
 
                 response.raise_for_status()
 
+                # requests assumes ISO-8859-1 when the header has no charset
+                content_type = response.headers.get('Content-Type', '')
+                charset = detect_charset(response.content, content_type)
+                if 'charset' not in content_type.lower():
+                    response.encoding = charset or self.charset_hint or response.apparent_encoding
+                self.last_fetch['charset'] = response.encoding
+
                 # Check content size
                 content_length = len(response.content)
                 max_size_bytes = self.max_html_size_mb * 1024 * 1024
@@ -95,32 +131,44 @@ class FallbackScraper:
                 else:
                     html_content = response.text
 
+                HostBackoff.record_success(url)
+                self.last_document = html_content
                 logger.info(f"Successfully fetched {url}")
                 return html_content, response.url
 
+            except HostCoolingDown:
+                raise
             except requests.exceptions.Timeout:
                 last_error = "Request timeout"
+                host_failure = True
                 logger.warning(f"Timeout on attempt {attempt + 1}")
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay)
                     continue
             except requests.exceptions.ConnectionError:
                 last_error = "Connection error"
+                host_failure = True
                 logger.warning(f"Connection error on attempt {attempt + 1}")
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay)
                     continue
             except Exception as e:
                 last_error = str(e)
+                status_code = self.last_fetch.get('status_code')
+                host_failure = status_code is not None and status_code >= 500
                 logger.error(f"Error fetching {url} on attempt {attempt + 1}: {e}")
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay)
                     continue
 
-        raise Exception(f"Failed to fetch {url} after {self.max_retries} attempts. Last error: {last_error}")
+        # Spare later requests the same retries while the host is down
+        if host_failure:
+            HostBackoff.record_failure(url, last_error)
+
+        raise Exception(f"Failed to fetch {url} after {attempt + 1} attempts. Last error: {last_error}")
     
-    def extract_text(self, url: str) -> Dict[str, Any]:
-        """Extract comprehensive text content from webpage"""
+    def extract_text(self, url: str, options: Optional[ExtractionOptions] = None) -> Dict[str, Any]:
+        """Extract comprehensive text content from webpage, stopping once the requested items are found"""
         try:
             html_content, final_url = self.fetch_page_content(url)
             soup = BeautifulSoup(html_content, 'html.parser')
@@ -129,13 +177,16 @@ class FallbackScraper:
             for element in soup(["script", "style", "noscript"]):
                 element.decompose()
 
-            text_elements = []
+            text_elements = ItemCollector(options)
             processed_texts = set()  # Track processed text to avoid duplicates
 
             # Strategy 1: Extract all text-containing elements in order
             all_text_elements = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'div', 'span', 'article', 'section', 'li', 'td', 'th', 'blockquote', 'pre', 'code'])
 
             for element in all_text_elements:
+                if text_elements.full:
+                    break
+
                 # Skip if this element is inside another element we'll process
                 if element.find_parent(['script', 'style', 'nav', 'header', 'footer']):
                     continue
@@ -190,11 +241,11 @@ class FallbackScraper:
                             except (ValueError, IndexError):
                                 text_data['level'] = 1
 
-                        text_elements.append(text_data)
+                        text_elements.add(text_data)
 
             # Strategy 2: If we still don't have much content, extract ALL visible text
-            if len(text_elements) < 10:
-                logger.info(f"Limited content found ({len(text_elements)} elements), extracting all visible text")
+            if len(text_elements.items) < 10 and not text_elements.full:
+                logger.info(f"Limited content found ({len(text_elements.items)} elements), extracting all visible text")
 
                 # Get all text and split into meaningful chunks
                 all_text = clean_text(soup.get_text(separator=' '))
@@ -225,15 +276,16 @@ class FallbackScraper:
                     # Add chunks as text elements
                     for i, chunk in enumerate(chunks[:50]):  # Limit to 50 chunks
                         if chunk not in processed_texts:
-                            text_elements.append({
+                            if not text_elements.add({
                                 'type': 'content',
                                 'text': chunk,
                                 'length': len(chunk),
                                 'order': i + 1
-                            })
+                            }):
+                                break
 
-            logger.info(f"Successfully scraped {len(text_elements)} text items from {url}")
-            result = format_scrape_result(text_elements, 'text')
+            logger.info(f"Successfully scraped {len(text_elements.items)} text items from {url}")
+            result = format_scrape_result(text_elements.items, 'text')
             result['url'] = url
             result['timestamp'] = datetime.now().isoformat()
             return result
@@ -251,13 +303,13 @@ class FallbackScraper:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def extract_images(self, url: str) -> Dict[str, Any]:
-        """Extract image information from webpage"""
+    def extract_images(self, url: str, options: Optional[ExtractionOptions] = None) -> Dict[str, Any]:
+        """Extract image information from webpage, stopping once the requested items are found"""
         try:
             html_content, final_url = self.fetch_page_content(url)
             soup = BeautifulSoup(html_content, 'html.parser')
             
-            images = []
+            images = ItemCollector(options)
             
             for img in soup.find_all('img'):
                 src = img.get('src')
@@ -275,7 +327,7 @@ class FallbackScraper:
                     src = urljoin(final_url, src)
                 
                 if is_valid_image_url(src):
-                    images.append({
+                    if not images.add({
                         'src': src,
                         'alt': img.get('alt', ''),
                         'title': img.get('title', ''),
@@ -283,10 +335,11 @@ class FallbackScraper:
                         'height': img.get('height', ''),
                         'class': ' '.join(img.get('class', [])),
                         'loading': img.get('loading', '')
-                    })
+                    }):
+                        break
             
-            logger.info(f"Successfully scraped {len(images)} images from {url}")
-            result = format_scrape_result(images, 'images')
+            logger.info(f"Successfully scraped {len(images.items)} images from {url}")
+            result = format_scrape_result(images.items, 'images')
             result['url'] = url
             result['timestamp'] = datetime.now().isoformat()
             return result
@@ -304,17 +357,19 @@ class FallbackScraper:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def extract_links(self, url: str) -> Dict[str, Any]:
-        """Extract links from webpage"""
+    def extract_links(self, url: str, options: Optional[ExtractionOptions] = None) -> Dict[str, Any]:
+        """Extract links from webpage, stopping once the requested items are found"""
         try:
+            options = options or ExtractionOptions()
             html_content, final_url = self.fetch_page_content(url)
             soup = BeautifulSoup(html_content, 'html.parser')
             
-            links = []
+            links = ItemCollector(options)
             
             for link in soup.find_all('a', href=True):
                 href = link['href']
-                text = clean_text(link.get_text())
+                # Anchor text is the costly part of a link; only when asked for
+                text = clean_text(link.get_text()) if options.wants('text') else ''
                 
                 # Convert relative URLs to absolute
                 if href.startswith('//'):
@@ -330,17 +385,18 @@ class FallbackScraper:
                 if href.startswith('#') or not href.strip():
                     continue
                 
-                links.append({
+                if not links.add({
                     'url': href,
                     'text': text,
                     'title': link.get('title', ''),
                     'target': link.get('target', ''),
                     'rel': ' '.join(link.get('rel', [])),
                     'type': 'external' if href.startswith(('http://', 'https://')) else 'internal'
-                })
+                }):
+                    break
             
-            logger.info(f"Successfully scraped {len(links)} links from {url}")
-            result = format_scrape_result(links, 'links')
+            logger.info(f"Successfully scraped {len(links.items)} links from {url}")
+            result = format_scrape_result(links.items, 'links')
             result['url'] = url
             result['timestamp'] = datetime.now().isoformat()
             return result
@@ -358,9 +414,10 @@ class FallbackScraper:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def extract_emails(self, url: str) -> Dict[str, Any]:
-        """Extract email addresses from webpage"""
+    def extract_emails(self, url: str, options: Optional[ExtractionOptions] = None) -> Dict[str, Any]:
+        """Extract email addresses from webpage, looking up each one's context only when requested"""
         try:
+            options = options or ExtractionOptions()
             html_content, final_url = self.fetch_page_content(url)
             
             # Extract emails from HTML content
@@ -368,26 +425,28 @@ class FallbackScraper:
             
             # Also parse with BeautifulSoup to get context
             soup = BeautifulSoup(html_content, 'html.parser')
-            email_data = []
+            email_data = ItemCollector(options)
             
             for email in emails:
-                # Find context for each email
+                # Find context for each email (a search of the whole tree)
                 context = ""
-                for element in soup.find_all(text=re.compile(re.escape(email))):
-                    parent = element.parent
-                    if parent:
-                        context = clean_text(parent.get_text())[:200]
-                        break
+                if options.wants('context'):
+                    for element in soup.find_all(text=re.compile(re.escape(email))):
+                        parent = element.parent
+                        if parent:
+                            context = clean_text(parent.get_text())[:200]
+                            break
                 
-                email_data.append({
+                if not email_data.add({
                     'email': email,
                     'context': context,
                     'domain': email.split('@')[1] if '@' in email else '',
                     'type': 'contact'
-                })
+                }):
+                    break
             
-            logger.info(f"Successfully scraped {len(email_data)} emails from {url}")
-            result = format_scrape_result(email_data, 'emails')
+            logger.info(f"Successfully scraped {len(email_data.items)} emails from {url}")
+            result = format_scrape_result(email_data.items, 'emails')
             result['url'] = url
             result['timestamp'] = datetime.now().isoformat()
             return result
@@ -405,13 +464,14 @@ class FallbackScraper:
                 'timestamp': datetime.now().isoformat()
             }
     
-    def extract_phone_numbers(self, url: str) -> Dict[str, Any]:
-        """Extract phone numbers from webpage"""
+    def extract_phone_numbers(self, url: str, options: Optional[ExtractionOptions] = None) -> Dict[str, Any]:
+        """Extract phone numbers from webpage, stopping once the requested items are found"""
         try:
+            options = options or ExtractionOptions()
             html_content, final_url = self.fetch_page_content(url)
             soup = BeautifulSoup(html_content, 'html.parser')
 
-            phone_numbers = []
+            phone_numbers = ItemCollector(options)
 
             # Phone number regex patterns
             patterns = [
@@ -439,10 +499,9 @@ class FallbackScraper:
                         context = text_content[start:end].strip()
 
                         # Extract context snippet (3-6 words)
-                        words = context.split()
-                        snippet = ' '.join(words[:6])
+                        snippet = ' '.join(context.split()[:6]) if options.wants('context_snippet') else ''
 
-                        phone_numbers.append({
+                        if not phone_numbers.add({
                             'phone': phone,
                             'normalized': normalized,
                             'owner': 'Unknown',
@@ -451,10 +510,14 @@ class FallbackScraper:
                             'source': 'unknown',
                             'context_snippet': snippet,
                             'data_source': 'extracted_from_page'
-                        })
+                        }):
+                            break
 
-            logger.info(f"Successfully scraped {len(phone_numbers)} phone numbers from {url}")
-            result = format_scrape_result(phone_numbers, 'phone_numbers')
+                if phone_numbers.full:
+                    break
+
+            logger.info(f"Successfully scraped {len(phone_numbers.items)} phone numbers from {url}")
+            result = format_scrape_result(phone_numbers.items, 'phone_numbers')
             result['url'] = url
             result['timestamp'] = datetime.now().isoformat()
             return result
@@ -472,8 +535,25 @@ class FallbackScraper:
                 'timestamp': datetime.now().isoformat()
             }
 
-    def scrape(self, url: str, data_type: str) -> Dict[str, Any]:
-        """Main scraping method"""
+    def scrape(
+        self,
+        url: str,
+        data_type: str,
+        keep_document: bool = False,
+        options: Optional[ExtractionOptions] = None
+    ) -> Dict[str, Any]:
+        """
+        Main scraping method
+
+        Args:
+            url (str): URL to scrape
+            data_type (str): Type of data to extract
+            keep_document (bool): Include the fetched HTML as 'html_content' for later stages
+            options (Optional[ExtractionOptions]): Items and fields needed; extraction stops at the page's end
+
+        Returns:
+            Dict[str, Any]: Scraping results
+        """
         # Validate URL
         if not validate_url(url):
             raise ValueError(f"Invalid URL: {url}")
@@ -490,15 +570,20 @@ class FallbackScraper:
             logger.warning(f"Could not check robots.txt for {url}: {e}")
 
         # Route to appropriate extraction method
+        self.last_document = None
         if data_type == 'text':
-            return self.extract_text(url)
+            result = self.extract_text(url, options)
         elif data_type == 'images':
-            return self.extract_images(url)
+            result = self.extract_images(url, options)
         elif data_type == 'links':
-            return self.extract_links(url)
+            result = self.extract_links(url, options)
         elif data_type == 'emails':
-            return self.extract_emails(url)
+            result = self.extract_emails(url, options)
         elif data_type == 'phone_numbers':
-            return self.extract_phone_numbers(url)
+            result = self.extract_phone_numbers(url, options)
         else:
             raise ValueError(f"Unsupported data type: {data_type}")
+
+        if keep_document and result.get('success') and self.last_document is not None:
+            result['html_content'] = self.last_document
+        return result
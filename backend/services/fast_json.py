@@ -0,0 +1,53 @@
+"""
+Fast JSON responses for DataZen
+orjson-encoded responses for endpoints returning large result lists, and
+response shaping that skips re-validating data our own extractors produced
+"""
+
+from typing import Any, Dict, Type
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _default(value: Any) -> Any:
+    # Types orjson doesn't handle natively
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+def dumps(payload: Any) -> bytes:
+    """Encode a payload as compact UTF-8 JSON"""
+    return orjson.dumps(payload, default=_default, option=_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, tolerant of the odd non-JSON value"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def model_payload(model: Type[BaseModel], data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Shape trusted data like a response model without validating it
+
+    Keeps the model's fields in order, fills in defaults for missing ones and
+    drops anything else, which is what response_model filtering would do.
+    Only use it for data our own code produced.
+
+    Args:
+        model (Type[BaseModel]): Response model
+        data (Dict[str, Any]): Data with (at least) the model's required fields
+
+    Returns:
+        Dict[str, Any]: Plain dict ready for FastJSONResponse
+    """
+    return {
+        name: data[name] if name in data else field.get_default(call_default_factory=True)
+        for name, field in model.model_fields.items()
+    }
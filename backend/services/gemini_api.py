@@ -4,35 +4,69 @@ Provides AI-powered data extraction and structuring capabilities
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
-import google.generativeai as genai
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from datetime import datetime
 import json
+from contextlib import aclosing
+
+from services.ai_limiter import AILimiter
+from services.ai_providers import (
+    AIResponse, AIUsage, GeminiProvider, get_provider, AI_PROVIDER, AI_FALLBACK_PROVIDER
+)
+from services.ai_batcher import AIBatcher, ai_batcher
+from services.ai_cache import AICache
+from services.content_minimizer import minimize_html, minimize_html_chunks, estimate_tokens, GEMINI_PROMPT_TOKEN_BUDGET
+from services.json_stream import JSONArrayStream, parse_json_items
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on a single model call, excluding time spent queued for a slot
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 60))
+
+# Cap on merged results, matching what the prompt asks of a single call
+MAX_AI_ITEMS = 100
+
+# Field that identifies an item per data type, for de-duplicating chunk results
+ITEM_KEYS = {
+    'text': 'text',
+    'images': 'url',
+    'links': 'url',
+    'emails': 'email',
+}
+
 class GeminiAI:
     """Gemini AI integration for intelligent data extraction"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, provider: Optional[str] = None):
         """
         Initialize Gemini AI client
         
         Args:
             api_key (Optional[str]): Gemini API key. If None, reads from environment
+            provider (Optional[str]): Model provider ("gemini" or "local"). If None, reads AI_PROVIDER
+            
+        Raises:
+            ValueError: If the provider is unknown or not configured (e.g. no Gemini API key)
         """
-        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
-        if not self.api_key:
-            raise ValueError("Gemini API key not provided. Set GEMINI_API_KEY environment variable.")
-        
-        # Configure Gemini
-        genai.configure(api_key=self.api_key)
+        provider_name = provider or AI_PROVIDER
+        if api_key and provider_name == GeminiProvider.name:
+            self.provider = GeminiProvider(api_key=api_key)
+        else:
+            self.provider = get_provider(provider_name)
+        self.api_key = getattr(self.provider, 'api_key', None)
         
-        # Initialize model (using available Gemini model)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        # Optional second provider for when the primary one errors
+        self.fallback_provider = None
+        if AI_FALLBACK_PROVIDER and AI_FALLBACK_PROVIDER != provider_name:
+            try:
+                self.fallback_provider = get_provider(AI_FALLBACK_PROVIDER)
+            except ValueError as e:
+                logger.warning(f"AI fallback provider unavailable: {e}")
         
         # Generation config for consistent outputs
         self.generation_config = {
@@ -51,18 +85,134 @@ class GeminiAI:
             data_type (str): Type of data to extract
             custom_prompt (str): Custom user prompt
             
+        Returns:
+            str: Formatted prompt for Gemini
+        """
+        # Scripts, styles and markup would eat most of the token budget
+        return self._build_prompt(minimize_html(html_content, data_type), data_type, custom_prompt)
+    
+    def _build_prompt(
+        self,
+        page_content: str,
+        data_type: str,
+        custom_prompt: str = "",
+        part: Optional[Tuple[int, int]] = None
+    ) -> str:
+        """
+        Create a prompt for already minimized page content
+        
+        Args:
+            page_content (str): Minimized page content
+            data_type (str): Type of data to extract
+            custom_prompt (str): Custom user prompt
+            part (Optional[Tuple[int, int]]): (index, total) when the content is one chunk of a page
+            
         Returns:
             str: Formatted prompt for Gemini
         """
         base_prompt = f"""
-You are an expert web scraper and data analyst. Analyze the following HTML content and extract structured data.
+You are an expert web scraper and data analyst. Analyze the following web page content and extract structured data.
+The page has been condensed to markdown-like text: "#" marks headings, "- " list items, "| " table rows,
+[text](url) links, ![alt](src) images and "--- name ---" page regions such as header, nav and footer.
+
+Page Content:
+{page_content}
+
+Task: Extract {data_type} data from this page content.
+"""
+        if part:
+            base_prompt += f"""
+This is part {part[0]} of {part[1]} of the page. Extract only what appears in this part.
+"""
+        
+        return base_prompt + self._task_instructions(data_type, custom_prompt)
+    
+    def _build_batch_prompt(self, documents: List[str], data_type: str, custom_prompt: str = "") -> str:
+        """
+        Create one prompt covering several small, independent pages
+        
+        Args:
+            documents (List[str]): Minimized page contents
+            data_type (str): Type of data to extract from every page
+            custom_prompt (str): Custom user prompt
+            
+        Returns:
+            str: Formatted prompt whose answer is keyed by document number
+        """
+        sections = "\n".join(
+            f"=== DOCUMENT {index} ===\n{document}\n=== END DOCUMENT {index} ==="
+            for index, document in enumerate(documents, start=1)
+        )
+        
+        prompt = f"""
+You are an expert web scraper and data analyst. Below are {len(documents)} separate web pages, each between
+"=== DOCUMENT n ===" and "=== END DOCUMENT n ===". Pages have been condensed to markdown-like text: "#" marks
+headings, "- " list items, "| " table rows, [text](url) links, ![alt](src) images and "--- name ---" page regions.
 
-HTML Content:
-{html_content[:10000]}  # Limit to first 10k characters to avoid token limits
+{sections}
 
-Task: Extract {data_type} data from this HTML content.
+Task: Extract {data_type} data from each page independently. Never mix data between documents.
+For EACH document, produce exactly the array described below:
+"""
+        prompt += self._task_instructions(data_type, custom_prompt)
+        prompt += f"""
+BATCH OUTPUT FORMAT:
+- Return ONE JSON object whose keys are the document numbers "1" to "{len(documents)}"
+- Each value is the JSON array for that document alone (an empty array [] if it has no relevant data)
 """
+        return prompt
+    
+    def _build_rerank_prompt(self, items: List[Any], data_type: str, custom_prompt: str = "") -> Tuple[str, int]:
+        """
+        Create a prompt that structures pre-extracted items instead of reading the page
         
+        Args:
+            items (List[Any]): Items from the rule-based extractor
+            data_type (str): Type of the items
+            custom_prompt (str): Custom user prompt
+            
+        Returns:
+            Tuple[str, int]: Formatted prompt and the number of items it includes
+        """
+        # Compact JSON: no whitespace, no empty fields, long texts cut
+        compact_items = []
+        used = 0
+        for item in items:
+            if isinstance(item, dict):
+                item = {
+                    key: (value[:500] if isinstance(value, str) else value)
+                    for key, value in item.items()
+                    if value not in (None, '', [], {})
+                }
+            encoded = json.dumps(item, separators=(',', ':'), ensure_ascii=False, default=str)
+            used += estimate_tokens(encoded) + 1
+            if used > GEMINI_PROMPT_TOKEN_BUDGET:
+                break
+            compact_items.append(encoded)
+        
+        prompt = f"""
+You are an expert data analyst. The items below were already extracted from a web page by a rule-based scraper
+and are given as a compact JSON array. Do not invent items that are not in the list and do not change URLs or
+addresses. Drop obvious noise, then categorize and rank the remaining items.
+
+Items:
+[{','.join(compact_items)}]
+
+Task: Structure these {data_type} items.
+"""
+        return prompt + self._task_instructions(data_type, custom_prompt), len(compact_items)
+    
+    def _task_instructions(self, data_type: str, custom_prompt: str = "") -> str:
+        """
+        Describe the expected output for a data type
+        
+        Args:
+            data_type (str): Type of data to extract
+            custom_prompt (str): Custom user prompt
+            
+        Returns:
+            str: Output instructions for one document
+        """
         if data_type == 'text':
             specific_prompt = """
 Extract all meaningful text content and organize it into structured categories.
@@ -147,13 +297,54 @@ IMPORTANT:
 - If no relevant data is found, return an empty array []
 """
         
-        return base_prompt + specific_prompt
+        return specific_prompt
+    
+    async def _generate(
+        self,
+        prompt: str,
+        user_id: Optional[str] = None,
+        usage: Optional[AIUsage] = None
+    ) -> AIResponse:
+        """
+        Run one model call without blocking the event loop
+        
+        Args:
+            prompt (str): Prompt to send
+            user_id (Optional[str]): Caller, for per-user concurrency limits
+            usage (Optional[AIUsage]): Invocation accounting to add this call to
+            
+        Returns:
+            AIResponse: Response text and accounting
+            
+        Raises:
+            AILimitExceeded: If no concurrency slot frees up in time
+            asyncio.TimeoutError: If the model doesn't answer within GEMINI_TIMEOUT_SECONDS
+        """
+        async with AILimiter.slot(user_id):
+            try:
+                # wait_for cancels the in-flight call on timeout or client disconnect
+                response = await asyncio.wait_for(
+                    self.provider.generate(prompt, self.generation_config),
+                    timeout=GEMINI_TIMEOUT_SECONDS
+                )
+            except Exception as e:
+                if not self.fallback_provider:
+                    raise
+                logger.warning(f"AI provider {self.provider.name} failed ({e!r}), failing over to {self.fallback_provider.name}")
+                response = await asyncio.wait_for(
+                    self.fallback_provider.generate(prompt, self.generation_config),
+                    timeout=GEMINI_TIMEOUT_SECONDS
+                )
+        if usage is not None:
+            usage.add(response)
+        return response
     
     async def extract_structured_data(
         self, 
         html_content: str, 
         data_type: str, 
-        custom_prompt: str = ""
+        custom_prompt: str = "",
+        user_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Use Gemini AI to extract and structure data from HTML
@@ -162,76 +353,211 @@ IMPORTANT:
             html_content (str): HTML content to analyze
             data_type (str): Type of data to extract
             custom_prompt (str): Additional custom instructions
+            user_id (Optional[str]): Requesting user, for per-user concurrency limits
             
         Returns:
-            Dict[str, Any]: Structured extraction results
+            Dict[str, Any]: Structured extraction results, with token, latency,
+            cache and chunk accounting under "ai_usage"
         """
+        usage = AIUsage()
+        started = time.monotonic()
+        result = await self._extract_structured_data(html_content, data_type, custom_prompt, user_id, usage)
+        usage.latency_ms = (time.monotonic() - started) * 1000
+        result["ai_usage"] = usage.to_dict()
+        return result
+    
+    async def _extract_structured_data(
+        self,
+        html_content: str,
+        data_type: str,
+        custom_prompt: str,
+        user_id: Optional[str],
+        usage: AIUsage
+    ) -> Dict[str, Any]:
+        """Extraction behind extract_structured_data, recording its model calls in usage"""
         try:
-            # Create extraction prompt
-            prompt = self._create_extraction_prompt(html_content, data_type, custom_prompt)
+            # Pages larger than one prompt budget are processed as parallel chunks
+            chunks = minimize_html_chunks(html_content, data_type)
+            usage.chunks = len(chunks)
             
-            # Generate response
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
-            )
+            # The same content and instructions get the same answer
+            cache_key = AICache.make_key(self.provider.model_name, data_type, custom_prompt or "", *chunks)
+            cached = AICache.get(cache_key)
+            if cached is not None:
+                usage.cache_hit = True
+                return self._success_result(cached, data_type)
             
-            # Parse response
-            if response.text:
-                try:
-                    # Try to parse as JSON
-                    structured_data = json.loads(response.text.strip())
-                    
-                    # Validate that it's a list
-                    if not isinstance(structured_data, list):
-                        structured_data = [structured_data] if structured_data else []
-                    
-                    return {
-                        "success": True,
-                        "data_type": data_type,
-                        "count": len(structured_data),
-                        "data": structured_data,
-                        "ai_processed": True,
-                        "timestamp": datetime.now().isoformat(),
-                        "model": "gemini-pro"
-                    }
-                    
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse Gemini response as JSON: {e}")
-                    logger.error(f"Response text: {response.text[:500]}...")
-                    
-                    # Fallback: try to extract JSON from response
-                    json_match = self._extract_json_from_text(response.text)
-                    if json_match:
-                        return {
-                            "success": True,
-                            "data_type": data_type,
-                            "count": len(json_match),
-                            "data": json_match,
-                            "ai_processed": True,
-                            "timestamp": datetime.now().isoformat(),
-                            "model": "gemini-pro",
-                            "note": "JSON extracted from mixed response"
-                        }
-                    
+            if len(chunks) > 1:
+                result = await self._extract_chunked(chunks, data_type, custom_prompt, user_id, usage)
+            elif AIBatcher.accepts(chunks[0]):
+                # Small pages share a model call with other small pages
+                structured_data = await ai_batcher.submit(self, chunks[0], data_type, custom_prompt, user_id, usage)
+                result = self._success_result(structured_data, data_type)
+            else:
+                result = await self._extract_single(chunks[0], data_type, custom_prompt, user_id, usage)
+            
+            # Partial answers are worth retrying next time
+            if result.get("success") and not result.get("failed_chunks"):
+                AICache.put(cache_key, result["data"])
+            return result
+                
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini AI extraction timed out after {GEMINI_TIMEOUT_SECONDS:g}s")
+            return {
+                "success": False,
+                "error": f"AI processing timed out after {GEMINI_TIMEOUT_SECONDS:g}s",
+                "data_type": data_type,
+                "ai_processed": True,
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Gemini AI extraction failed: {str(e)}")
+            return {
+                "success": False,
+                "error": f"AI processing failed: {str(e)}",
+                "data_type": data_type,
+                "ai_processed": True,
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    def _success_result(self, structured_data: List[Any], data_type: str) -> Dict[str, Any]:
+        """Build a successful extraction result"""
+        return {
+            "success": True,
+            "data_type": data_type,
+            "count": len(structured_data),
+            "data": structured_data,
+            "ai_processed": True,
+            "timestamp": datetime.now().isoformat(),
+            "model": self.provider.model_name
+        }
+    
+    async def _extract_single(
+        self,
+        page_content: str,
+        data_type: str,
+        custom_prompt: str,
+        user_id: Optional[str],
+        usage: AIUsage
+    ) -> Dict[str, Any]:
+        """Extract a page that fits one prompt with its own model call"""
+        # Create extraction prompt
+        prompt = self._build_prompt(page_content, data_type, custom_prompt)
+        
+        # Generate response
+        response = await self._generate(prompt, user_id, usage)
+        
+        # Parse response
+        if not response.text:
+            return {
+                "success": False,
+                "error": "Empty response from Gemini AI",
+                "data_type": data_type,
+                "ai_processed": True,
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        try:
+            # Try to parse as JSON
+            structured_data = json.loads(response.text.strip())
+            
+            # Validate that it's a list
+            if not isinstance(structured_data, list):
+                structured_data = [structured_data] if structured_data else []
+            
+            return self._success_result(structured_data, data_type)
+            
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse Gemini response as JSON: {e}")
+            logger.error(f"Response text: {response.text[:500]}...")
+            
+            # Fallback: try to extract JSON from response
+            json_match = parse_json_items(response.text)
+            if json_match:
+                result = self._success_result(json_match, data_type)
+                result["note"] = "JSON extracted from mixed response"
+                return result
+            
+            return {
+                "success": False,
+                "error": f"Invalid JSON response from AI: {str(e)}",
+                "data_type": data_type,
+                "ai_processed": True,
+                "timestamp": datetime.now().isoformat()
+            }
+    
+    async def rerank_items(
+        self,
+        items: List[Any],
+        data_type: str,
+        custom_prompt: str = "",
+        user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Hybrid mode: let Gemini categorize and rank items the scraper already found
+        
+        Args:
+            items (List[Any]): Items from the rule-based extractor
+            data_type (str): Type of the items
+            custom_prompt (str): Additional custom instructions
+            user_id (Optional[str]): Requesting user, for per-user concurrency limits
+            
+        Returns:
+            Dict[str, Any]: Structured extraction results, with accounting under "ai_usage"
+        """
+        usage = AIUsage()
+        usage.chunks = 1
+        started = time.monotonic()
+        result = await self._rerank_items(items, data_type, custom_prompt, user_id, usage)
+        usage.latency_ms = (time.monotonic() - started) * 1000
+        result["ai_usage"] = usage.to_dict()
+        return result
+    
+    async def _rerank_items(
+        self,
+        items: List[Any],
+        data_type: str,
+        custom_prompt: str,
+        user_id: Optional[str],
+        usage: AIUsage
+    ) -> Dict[str, Any]:
+        """Re-ranking behind rerank_items, recording its model call in usage"""
+        try:
+            prompt, included = self._build_rerank_prompt(items, data_type, custom_prompt)
+            cache_key = AICache.make_key(self.provider.model_name, prompt)
+            structured_data = AICache.get(cache_key)
+            if structured_data is not None:
+                usage.cache_hit = True
+            else:
+                response = await self._generate(prompt, user_id, usage)
+                structured_data = self._parse_items(response.text) if response.text else None
+                if structured_data is None:
                     return {
                         "success": False,
-                        "error": f"Invalid JSON response from AI: {str(e)}",
+                        "error": "Invalid JSON response from AI",
                         "data_type": data_type,
                         "ai_processed": True,
                         "timestamp": datetime.now().isoformat()
                     }
-            else:
-                return {
-                    "success": False,
-                    "error": "Empty response from Gemini AI",
-                    "data_type": data_type,
-                    "ai_processed": True,
-                    "timestamp": datetime.now().isoformat()
-                }
-                
+                structured_data = structured_data[:MAX_AI_ITEMS]
+                AICache.put(cache_key, structured_data)
+            
+            result = self._success_result(structured_data, data_type)
+            if included < len(items):
+                result["note"] = f"Only the first {included} of {len(items)} items fit the prompt budget"
+            return result
+        
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini AI re-ranking timed out after {GEMINI_TIMEOUT_SECONDS:g}s")
+            return {
+                "success": False,
+                "error": f"AI processing timed out after {GEMINI_TIMEOUT_SECONDS:g}s",
+                "data_type": data_type,
+                "ai_processed": True,
+                "timestamp": datetime.now().isoformat()
+            }
         except Exception as e:
-            logger.error(f"Gemini AI extraction failed: {str(e)}")
+            logger.error(f"Gemini AI re-ranking failed: {str(e)}")
             return {
                 "success": False,
                 "error": f"AI processing failed: {str(e)}",
@@ -240,48 +566,242 @@ IMPORTANT:
                 "timestamp": datetime.now().isoformat()
             }
     
-    def _extract_json_from_text(self, text: str) -> Optional[List[Dict[str, Any]]]:
+    async def _extract_chunked(
+        self,
+        chunks: List[str],
+        data_type: str,
+        custom_prompt: str = "",
+        user_id: Optional[str] = None,
+        usage: Optional[AIUsage] = None
+    ) -> Dict[str, Any]:
         """
-        Try to extract JSON array from mixed text response
+        Map-reduce extraction: one model call per chunk, run concurrently, then merged
         
         Args:
-            text (str): Text that might contain JSON
+            chunks (List[str]): Minimized page content split on structural boundaries
+            data_type (str): Type of data to extract
+            custom_prompt (str): Additional custom instructions
+            user_id (Optional[str]): Requesting user, for per-user concurrency limits
+            usage (Optional[AIUsage]): Invocation accounting to add the chunk calls to
             
         Returns:
-            Optional[List[Dict[str, Any]]]: Extracted JSON data or None
+            Dict[str, Any]: Structured extraction results
         """
+        total = len(chunks)
+        # The limiter bounds how many of these actually run at once
+        results = await asyncio.gather(
+            *[
+                self._extract_chunk(chunk, data_type, custom_prompt, (index + 1, total), user_id, usage)
+                for index, chunk in enumerate(chunks)
+            ],
+            return_exceptions=True
+        )
+        
+        item_lists = [result for result in results if not isinstance(result, BaseException)]
+        failures = [result for result in results if isinstance(result, BaseException)]
+        if not item_lists:
+            raise failures[0]
+        for failure in failures:
+            logger.warning(f"Gemini AI chunk failed: {failure!r}")
+        
+        structured_data = self._merge_items(item_lists, data_type)
+        result = self._success_result(structured_data, data_type)
+        result["chunks"] = total
+        if failures:
+            result["failed_chunks"] = len(failures)
+            result["note"] = f"{len(failures)} of {total} page chunks could not be processed"
+        return result
+    
+    async def _extract_chunk(
+        self,
+        page_content: str,
+        data_type: str,
+        custom_prompt: str,
+        part: Optional[Tuple[int, int]] = None,
+        user_id: Optional[str] = None,
+        usage: Optional[AIUsage] = None
+    ) -> List[Any]:
+        """Extract items from one chunk or page, raising if the response isn't usable JSON"""
+        prompt = self._build_prompt(page_content, data_type, custom_prompt, part)
+        response = await self._generate(prompt, user_id, usage)
+        if not response.text:
+            return []
+        items = self._parse_items(response.text)
+        if items is None:
+            where = f" for chunk {part[0]} of {part[1]}" if part else ""
+            raise ValueError(f"Invalid JSON response from AI{where}")
+        return items
+    
+    def _parse_items(self, text: str) -> Optional[List[Any]]:
+        """Parse a model response into a list of items, or None if it holds no JSON"""
         try:
-            # Look for JSON array patterns
-            import re
-            
-            # Try to find JSON array in the text
-            json_pattern = r'\[.*?\]'
-            matches = re.findall(json_pattern, text, re.DOTALL)
+            structured_data = json.loads(text.strip())
+        except json.JSONDecodeError:
+            return parse_json_items(text)
+        if not isinstance(structured_data, list):
+            structured_data = [structured_data] if structured_data else []
+        return structured_data
+    
+    def _merge_items(self, item_lists: List[List[Any]], data_type: str) -> List[Any]:
+        """
+        Merge per-chunk results in page order, dropping duplicates
+        
+        Args:
+            item_lists (List[List[Any]]): Items per chunk, in chunk order
+            data_type (str): Type of data extracted; decides the identifying field
             
-            for match in matches:
-                try:
-                    parsed = json.loads(match)
-                    if isinstance(parsed, list):
-                        return parsed
-                except json.JSONDecodeError:
+        Returns:
+            List[Any]: At most MAX_AI_ITEMS unique items
+        """
+        seen = set()
+        merged = []
+        for items in item_lists:
+            for item in items:
+                key = self._item_key(item, data_type)
+                if key in seen:
                     continue
+                seen.add(key)
+                merged.append(item)
+                if len(merged) >= MAX_AI_ITEMS:
+                    return merged
+        return merged
+    
+    @staticmethod
+    def _item_key(item: Any, data_type: str) -> str:
+        """Identity of an extracted item, for de-duplication across chunks"""
+        key_field = ITEM_KEYS.get(data_type)
+        if isinstance(item, dict) and key_field and item.get(key_field):
+            key = str(item[key_field]).strip()
+            return key.lower() if data_type == 'emails' else key
+        return json.dumps(item, sort_keys=True, default=str)
+    
+    async def _generate_stream(
+        self,
+        prompt: str,
+        user_id: Optional[str] = None,
+        usage: Optional[AIUsage] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream one model call's text as it is generated
+        
+        Args:
+            prompt (str): Prompt to send
+            user_id (Optional[str]): Caller, for per-user concurrency limits
+            usage (Optional[AIUsage]): Invocation accounting to add this call to
             
-            # Try to find JSON object and wrap in array
-            json_pattern = r'\{.*?\}'
-            matches = re.findall(json_pattern, text, re.DOTALL)
+        Yields:
+            str: Response text pieces
             
-            for match in matches:
-                try:
-                    parsed = json.loads(match)
-                    if isinstance(parsed, dict):
-                        return [parsed]
-                except json.JSONDecodeError:
-                    continue
-                    
-        except Exception as e:
-            logger.error(f"Failed to extract JSON from text: {e}")
+        Raises:
+            AILimitExceeded: If no concurrency slot frees up in time
+            asyncio.TimeoutError: If the whole response takes longer than GEMINI_TIMEOUT_SECONDS
+        """
+        loop = asyncio.get_running_loop()
+        async with AILimiter.slot(user_id):
+            deadline = loop.time() + GEMINI_TIMEOUT_SECONDS
+            providers = [self.provider] + ([self.fallback_provider] if self.fallback_provider else [])
+            for provider in providers:
+                produced: List[str] = []
+                started = time.monotonic()
+                # aclosing ends the provider call if we stop early
+                async with aclosing(provider.generate_stream(prompt, self.generation_config)) as pieces:
+                    try:
+                        while True:
+                            # The deadline covers the whole response, not each piece
+                            try:
+                                text = await asyncio.wait_for(pieces.__anext__(), timeout=max(deadline - loop.time(), 0))
+                            except StopAsyncIteration:
+                                return
+                            produced.append(text)
+                            yield text
+                    except Exception as e:
+                        # Fail over only while nothing has been sent downstream
+                        if produced or provider is providers[-1]:
+                            raise
+                        logger.warning(f"AI provider {provider.name} failed ({e!r}), failing over")
+                    finally:
+                        # Streams report no usage metadata; estimate from the text
+                        if usage is not None and produced:
+                            usage.add(AIResponse(
+                                '',
+                                provider.name,
+                                estimate_tokens(prompt),
+                                estimate_tokens(''.join(produced)),
+                                (time.monotonic() - started) * 1000
+                            ))
+    
+    async def stream_structured_data(
+        self,
+        html_content: str,
+        data_type: str,
+        custom_prompt: str = "",
+        user_id: Optional[str] = None,
+        usage: Optional[AIUsage] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Extract structured data, yielding each item as soon as the model completes it
+        
+        Large pages are streamed chunk by chunk in page order, with the same
+        de-duplication and item cap as extract_structured_data.
+        
+        Args:
+            html_content (str): HTML content to analyze
+            data_type (str): Type of data to extract
+            custom_prompt (str): Additional custom instructions
+            user_id (Optional[str]): Requesting user, for per-user concurrency limits
+            usage (Optional[AIUsage]): Filled in with the calls made, for the caller to report
+            
+        Yields:
+            Any: Extracted items
+            
+        Raises:
+            ValueError: If no chunk produced a usable JSON array
+            asyncio.TimeoutError: If a chunk's response exceeds GEMINI_TIMEOUT_SECONDS
+        """
+        chunks = minimize_html_chunks(html_content, data_type)
+        total = len(chunks)
+        if usage is not None:
+            usage.chunks = total
+        seen = set()
+        emitted = 0
+        errors = []
         
-        return None
+        for index, chunk in enumerate(chunks, start=1):
+            part = (index, total) if total > 1 else None
+            parser = JSONArrayStream()
+            try:
+                prompt = self._build_prompt(chunk, data_type, custom_prompt, part)
+                # aclosing releases the model call and its limiter slot when we stop early
+                async with aclosing(self._generate_stream(prompt, user_id, usage)) as pieces:
+                    async for text in pieces:
+                        for item in parser.feed(text):
+                            key = self._item_key(item, data_type)
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                            emitted += 1
+                            yield item
+                            if emitted >= MAX_AI_ITEMS:
+                                return
+                        if parser.done:
+                            break
+                for item in parser.close():
+                    key = self._item_key(item, data_type)
+                    if key not in seen:
+                        seen.add(key)
+                        emitted += 1
+                        yield item
+                        if emitted >= MAX_AI_ITEMS:
+                            return
+            except (ValueError, asyncio.TimeoutError) as e:
+                # Items already sent stay valid; only give up if nothing worked
+                if total == 1 and not parser.items_parsed:
+                    raise
+                logger.warning(f"Gemini AI stream for chunk {index} of {total} ended early: {e!r}")
+                errors.append(e)
+        
+        if errors and len(errors) == total and not emitted:
+            raise errors[0]
     
     def is_available(self) -> bool:
         """
@@ -290,7 +810,7 @@ IMPORTANT:
         Returns:
             bool: True if available, False otherwise
         """
-        return bool(self.api_key)
+        return self.provider.is_available()
     
     async def test_connection(self) -> Dict[str, Any]:
         """
@@ -300,16 +820,16 @@ IMPORTANT:
             Dict[str, Any]: Test result
         """
         try:
-            response = self.model.generate_content(
-                "Respond with exactly this JSON: {\"status\": \"connected\", \"model\": \"gemini-pro\"}",
-                generation_config=self.generation_config
+            response = await self._generate(
+                "Respond with exactly this JSON: {\"status\": \"connected\", \"model\": \"gemini-pro\"}"
             )
             
             if response.text:
                 return {
                     "success": True,
                     "message": "Gemini AI connection successful",
-                    "model": "gemini-pro"
+                    "model": self.provider.model_name,
+                    "provider": self.provider.name
                 }
             else:
                 return {
@@ -317,8 +837,30 @@ IMPORTANT:
                     "error": "No response from Gemini AI"
                 }
                 
+        except asyncio.TimeoutError:
+            return {
+                "success": False,
+                "error": f"Connection test timed out after {GEMINI_TIMEOUT_SECONDS:g}s"
+            }
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Connection test failed: {str(e)}"
             }
+
+_shared_client: Optional[GeminiAI] = None
+
+def get_shared_gemini_ai() -> GeminiAI:
+    """
+    Get the application-wide GeminiAI client, creating it on first use
+    
+    Returns:
+        GeminiAI: Shared client, configured from the environment
+        
+    Raises:
+        ValueError: If the configured provider is unknown or not configured
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = GeminiAI()
+    return _shared_client
@@ -0,0 +1,94 @@
+"""
+Cached health status for DataZen
+Probes read the last result; the expensive checks (browser launch, AI
+configuration) run in the background at most once per interval
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from services.scraper import WebScraper
+from services.gemini_api import get_shared_gemini_ai
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", 300))
+HEALTH_CHECK_TIMEOUT_SECONDS = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", 30))
+
+class HealthMonitor:
+    """Process-wide health status, refreshed in the background"""
+
+    _services: Dict[str, str] = {"scraper": "unknown", "ai": "unknown"}
+    _checked_at: Optional[datetime] = None
+    # Monotonic time of the last completed check
+    _checked_monotonic: Optional[float] = None
+    _refresh_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        """
+        Get the cached health status, starting a background refresh if it is stale
+
+        Returns:
+            Dict[str, Any]: Health status as of the last completed check
+        """
+        stale = cls._checked_monotonic is None or time.monotonic() - cls._checked_monotonic >= HEALTH_CHECK_INTERVAL_SECONDS
+        if stale and (cls._refresh_task is None or cls._refresh_task.done()):
+            cls._refresh_task = asyncio.get_running_loop().create_task(cls.refresh())
+
+        scraper_status = cls._services["scraper"]
+        if scraper_status == "healthy":
+            overall = "healthy"
+        elif cls._checked_at is None:
+            overall = "starting"
+        else:
+            overall = "degraded"
+
+        return {
+            "status": overall,
+            "timestamp": datetime.now().isoformat(),
+            "checked_at": cls._checked_at.isoformat() if cls._checked_at else None,
+            "services": dict(cls._services),
+            "version": "1.0.0"
+        }
+
+    @classmethod
+    async def refresh(cls) -> None:
+        """Run every check and store the results"""
+        cls._services = {
+            "scraper": await cls._check_scraper(),
+            "ai": cls._check_ai()
+        }
+        cls._checked_at = datetime.now()
+        cls._checked_monotonic = time.monotonic()
+        logger.info(f"Health check completed: {cls._services}")
+
+    @staticmethod
+    async def _check_scraper() -> str:
+        """Launch and close a browser"""
+        async def launch():
+            async with WebScraper():
+                pass
+
+        try:
+            await asyncio.wait_for(launch(), timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+            return "healthy"
+        except asyncio.TimeoutError:
+            return f"error: browser launch timed out after {HEALTH_CHECK_TIMEOUT_SECONDS:g}s"
+        except Exception as e:
+            return f"error: {str(e)}"
+
+    @staticmethod
+    def _check_ai() -> str:
+        """Check the shared AI client is configured (no model call)"""
+        try:
+            gemini = get_shared_gemini_ai()
+            return "available" if gemini.is_available() else "not configured"
+        except ValueError:
+            return "not configured"
+        except Exception as e:
+            return f"error: {str(e)}"
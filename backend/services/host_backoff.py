@@ -0,0 +1,186 @@
+"""
+Failure cache with exponential cool-down for unreachable or blocking hosts
+Lets scrapes of a host known to be down or blocking us fail fast
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+HOST_BACKOFF_BASE_SECONDS = float(os.getenv("HOST_BACKOFF_BASE_SECONDS", 30))
+HOST_BACKOFF_MAX_SECONDS = float(os.getenv("HOST_BACKOFF_MAX_SECONDS", 3600))
+# A 403 can be specific to one path; only this many in a row cool the host down
+HOST_BACKOFF_FORBIDDEN_THRESHOLD = int(os.getenv("HOST_BACKOFF_FORBIDDEN_THRESHOLD", 3))
+# Hosts tracked at once; the least recently failed are forgotten first
+HOST_BACKOFF_MAX_HOSTS = int(os.getenv("HOST_BACKOFF_MAX_HOSTS", 10000))
+# Failure history is forgotten once a cool-down has been over this long
+HOST_BACKOFF_FORGET_SECONDS = float(os.getenv("HOST_BACKOFF_FORGET_SECONDS", 3600))
+
+class HostCoolingDown(Exception):
+    """Raised when a host is in its failure cool-down window"""
+
+    def __init__(self, host: str, retry_after: float, reason: str = ""):
+        self.host = host
+        self.retry_after = retry_after
+        self.reason = reason
+        message = f"Host {host} is temporarily unavailable"
+        if reason:
+            message += f" ({reason})"
+        message += f"; retry in {int(retry_after + 0.999)}s"
+        super().__init__(message)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header
+
+    Args:
+        value (Optional[str]): Header value, either delta-seconds or an HTTP-date
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if absent or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def _host(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+class HostBackoff:
+    """Process-wide failure cache keyed by host"""
+
+    # host -> (consecutive failures, cool-down end (monotonic), reason), least recently failed first
+    _entries: "OrderedDict[str, Tuple[int, float, str]]" = OrderedDict()
+    # host -> (consecutive 403s not yet acted on, last 403 (monotonic))
+    _forbidden: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+    _lock = threading.Lock()
+
+    @classmethod
+    def _entry(cls, host: str, now: float) -> Optional[Tuple[int, float, str]]:
+        # Caller holds the lock
+        entry = cls._entries.get(host)
+        if entry and now - entry[1] > HOST_BACKOFF_FORGET_SECONDS:
+            del cls._entries[host]
+            return None
+        return entry
+
+    @classmethod
+    def _prune(cls, now: float) -> None:
+        # Caller holds the lock. Both maps are in write order, so stale entries
+        # collect at the front; the size cap bounds whatever is left
+        for entries in (cls._entries, cls._forbidden):
+            while entries:
+                host, entry = next(iter(entries.items()))
+                if len(entries) <= HOST_BACKOFF_MAX_HOSTS and now - entry[1] <= HOST_BACKOFF_FORGET_SECONDS:
+                    break
+                del entries[host]
+
+    @classmethod
+    def remaining(cls, url: str) -> float:
+        """Seconds left in the host's cool-down, 0 if it may be contacted"""
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entry(_host(url), now)
+        if not entry:
+            return 0.0
+        return max(0.0, entry[1] - now)
+
+    @classmethod
+    def check(cls, url: str) -> None:
+        """Raise HostCoolingDown if the host is in its cool-down window"""
+        host = _host(url)
+        with cls._lock:
+            entry = cls._entry(host, time.monotonic())
+        if entry:
+            remaining = entry[1] - time.monotonic()
+            if remaining > 0:
+                raise HostCoolingDown(host, remaining, entry[2])
+
+    @classmethod
+    def record_failure(
+        cls,
+        url: str,
+        reason: str = "",
+        retry_after: Optional[float] = None
+    ) -> float:
+        """
+        Record a failed contact and start or extend the host's cool-down
+
+        Args:
+            url (str): URL that failed
+            reason (str): Short description (e.g. "HTTP 429", "timeout")
+            retry_after (Optional[float]): Server-requested wait, honored when given
+
+        Returns:
+            float: Cool-down length in seconds
+        """
+        host = _host(url)
+        now = time.monotonic()
+        with cls._lock:
+            failures = (cls._entry(host, now) or (0, 0.0, ""))[0] + 1
+            if retry_after is not None:
+                cooldown = min(retry_after, HOST_BACKOFF_MAX_SECONDS)
+            else:
+                cooldown = min(HOST_BACKOFF_BASE_SECONDS * 2 ** (failures - 1), HOST_BACKOFF_MAX_SECONDS)
+            cls._entries[host] = (failures, now + cooldown, reason)
+            cls._entries.move_to_end(host)
+            cls._prune(now)
+
+        logger.warning(f"Host {host} cooling down for {cooldown:.0f}s after failure #{failures} ({reason})")
+        return cooldown
+
+    @classmethod
+    def record_forbidden(cls, url: str, retry_after: Optional[float] = None) -> float:
+        """
+        Record a 403 response, cooling the host down only once they repeat
+
+        Args:
+            url (str): URL that was refused
+            retry_after (Optional[float]): Server-requested wait, honored when the cool-down starts
+
+        Returns:
+            float: Cool-down length in seconds, 0 if the host may still be tried
+        """
+        host = _host(url)
+        now = time.monotonic()
+        with cls._lock:
+            previous = cls._forbidden.pop(host, None)
+            count = 1
+            if previous and now - previous[1] <= HOST_BACKOFF_FORGET_SECONDS:
+                count = previous[0] + 1
+            if count < HOST_BACKOFF_FORBIDDEN_THRESHOLD:
+                cls._forbidden[host] = (count, now)
+                cls._prune(now)
+                return 0.0
+        return cls.record_failure(url, f"access forbidden (HTTP 403 x{count})", retry_after)
+
+    @classmethod
+    def record_success(cls, url: str) -> None:
+        """Clear the host's failure history"""
+        with cls._lock:
+            cls._entries.pop(_host(url), None)
+            cls._forbidden.pop(_host(url), None)
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop all failure history"""
+        with cls._lock:
+            cls._entries.clear()
+            cls._forbidden.clear()
@@ -0,0 +1,80 @@
+"""
+Background workers for asynchronous jobs
+Submissions only enqueue a job ID; a fixed pool of workers runs them, so
+scraping capacity is independent of how many HTTP requests are open
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Jobs running at once in this process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+
+# Identifies this process's workers on the jobs they claim
+WORKER_ID = str(uuid.uuid4())
+
+class JobRunner:
+    """Queue of job IDs served by a pool of asyncio worker tasks"""
+
+    def __init__(
+        self,
+        handler: Callable[[str], Awaitable[None]],
+        recover: Optional[Callable[[], Iterable[str]]] = None
+    ):
+        """
+        Args:
+            handler (Callable[[str], Awaitable[None]]): Runs one job by ID
+            recover (Optional[Callable[[], Iterable[str]]]): Returns IDs of jobs left
+                unfinished by a previous process, enqueued when the workers start
+        """
+        self._handler = handler
+        self._recover = recover
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: Set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def ensure_started(self) -> None:
+        """Start the workers on first use (they need a running event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+        # First use, or the previous loop is gone (e.g. between test clients)
+        self._loop = loop
+        self._workers = set()
+        self._queue = asyncio.Queue()
+        for _ in range(max(JOB_WORKERS, 1)):
+            task = loop.create_task(self._work())
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+
+        if self._recover:
+            try:
+                for job_id in self._recover():
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                logger.error(f"Failed to recover unfinished jobs: {e}")
+
+    def submit(self, job_id: str) -> None:
+        """Enqueue a job"""
+        self.ensure_started()
+        self._queue.put_nowait(job_id)
+
+    def queued(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue else 0
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._handler(job_id)
+            except Exception as e:
+                # The handler records failures on the job; this is a last resort
+                logger.error(f"Job {job_id} crashed: {e!r}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,116 @@
+"""
+On-disk storage for asynchronous job results
+Each job's item outcomes are appended to a JSONL file as they finish and
+removed once the job's result TTL has passed
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+
+from .fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+JOB_RESULTS_DIR = os.getenv(
+    "JOB_RESULTS_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "job_results")
+)
+# How long finished results stay retrievable
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", 86400))
+
+class JobStore:
+    """JSONL result files, one per job"""
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def path(job_id: str) -> str:
+        """Result file for a job"""
+        # Job IDs are UUIDs we generate; never let one escape the directory
+        return os.path.join(JOB_RESULTS_DIR, f"{os.path.basename(job_id)}.jsonl")
+
+    @classmethod
+    def append(cls, job_id: str, record: Dict[str, Any]) -> None:
+        """Add one item outcome to a job's results"""
+        line = dumps(record) + b"\n"
+        with cls._lock:
+            os.makedirs(JOB_RESULTS_DIR, exist_ok=True)
+            with open(cls.path(job_id), "ab") as f:
+                f.write(line)
+
+    @classmethod
+    def finalize(cls, job_id: str) -> None:
+        """Rewrite a finished job's results in submission order (they are appended as items finish)"""
+        path = cls.path(job_id)
+        with cls._lock:
+            if not os.path.exists(path):
+                return
+            with open(path, "rb") as f:
+                lines = [line for line in f if line.strip()]
+            # Lines are moved as-is; only the index is decoded
+            lines.sort(key=lambda line: orjson.loads(line).get("index", 0))
+            temporary = f"{path}.tmp"
+            with open(temporary, "wb") as f:
+                f.writelines(lines)
+            os.replace(temporary, path)
+
+    @classmethod
+    def iter_lines(cls, job_id: str) -> Iterator[str]:
+        """
+        Stream a job's stored results line by line
+
+        Args:
+            job_id (str): Job ID
+
+        Yields:
+            str: One JSON-encoded item outcome per line (without the newline)
+        """
+        path = cls.path(job_id)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line:
+                    yield line
+
+    @classmethod
+    def iter_records(cls, job_id: str) -> Iterator[Dict[str, Any]]:
+        """Stream a job's stored results as decoded item outcomes"""
+        for line in cls.iter_lines(job_id):
+            yield orjson.loads(line)
+
+    @classmethod
+    def read(cls, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Read a page of a job's results
+
+        Args:
+            job_id (str): Job ID
+            offset (int): Number of results to skip
+            limit (Optional[int]): Maximum number of results, all if None
+
+        Returns:
+            List[Dict[str, Any]]: Item outcomes
+        """
+        records = []
+        for position, line in enumerate(cls.iter_lines(job_id)):
+            if position < offset:
+                continue
+            if limit is not None and len(records) >= limit:
+                break
+            records.append(orjson.loads(line))
+        return records
+
+    @classmethod
+    def delete(cls, job_id: str) -> None:
+        """Remove a job's results"""
+        with cls._lock:
+            try:
+                os.remove(cls.path(job_id))
+            except FileNotFoundError:
+                pass
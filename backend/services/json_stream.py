@@ -0,0 +1,144 @@
+"""
+Incremental JSON array parsing for streamed model output
+Yields each top-level array element as soon as its closing bracket arrives
+"""
+
+import json
+from typing import Any, List, Optional
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+class JSONArrayStream:
+    """
+    Incremental parser for a JSON array, possibly wrapped in prose or code fences
+
+    Feed text as it arrives; every call returns the elements completed so far.
+    A bare top-level object is treated as a one-element array.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        # None until the opening '[' or '{' has been seen
+        self._mode: Optional[str] = None
+        self.done = False
+        self.items_parsed = 0
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add text and return newly completed array elements
+
+        Args:
+            text (str): Next piece of model output
+
+        Returns:
+            List[Any]: Elements completed by this piece, in order
+        """
+        if self.done or not text:
+            return []
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """
+        Mark the end of input and return any remaining elements
+
+        Returns:
+            List[Any]: Elements completed only at end of input
+
+        Raises:
+            ValueError: If the input held no JSON array or object, or ended mid-element
+        """
+        items = self._parse(final=True) if not self.done else []
+        if self._mode is None:
+            raise ValueError("No JSON array found in response")
+        if not self.done:
+            if self._mode == '[':
+                raise ValueError(f"JSON array ended early after {self.items_parsed} items")
+            raise ValueError("Incomplete JSON object in response")
+        return items
+
+    def _skip(self, characters: str) -> None:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in characters:
+            self._pos += 1
+
+    def _parse(self, final: bool) -> List[Any]:
+        items = []
+
+        if self._mode is None:
+            # Skip prose and code fences up to the first bracket
+            starts = [index for index in (self._buffer.find('[', self._pos), self._buffer.find('{', self._pos)) if index >= 0]
+            if not starts:
+                self._pos = len(self._buffer)
+                return items
+            self._pos = min(starts)
+            self._mode = self._buffer[self._pos]
+            if self._mode == '[':
+                self._pos += 1
+
+        if self._mode == '{':
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                return items
+            self._pos = end
+            self.done = True
+            self.items_parsed = 1
+            return [value]
+
+        while True:
+            self._skip(_WHITESPACE + ',')
+            if self._pos >= len(self._buffer):
+                break
+            if self._buffer[self._pos] == ']':
+                self._pos += 1
+                self.done = True
+                break
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # Element not complete yet
+                break
+            if end == len(self._buffer) and not final and not isinstance(value, (dict, list)):
+                # A number or literal at the very end may still be growing
+                break
+            items.append(value)
+            self._pos = end
+            self.items_parsed += 1
+
+        # Drop consumed text so long streams don't re-scan it
+        if self._pos > 4096:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        return items
+
+def parse_json_items(text: str) -> Optional[List[Any]]:
+    """
+    Extract a JSON array (or single object) from text that may contain other content
+
+    Args:
+        text (str): Model response
+
+    Returns:
+        Optional[List[Any]]: Parsed elements, or None if no JSON was found. An
+        array cut off mid-way (e.g. at the output token limit) yields the
+        elements completed before the cut.
+    """
+    start = 0
+    while True:
+        candidates = [index for index in (text.find('[', start), text.find('{', start)) if index >= 0]
+        if not candidates:
+            return None
+        begin = min(candidates)
+
+        stream = JSONArrayStream()
+        items = stream.feed(text[begin:])
+        try:
+            items.extend(stream.close())
+            return items
+        except ValueError:
+            if items:
+                return items
+        # Bracket was prose, e.g. "[note]"; try the next one
+        start = begin + 1
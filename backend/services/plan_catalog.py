@@ -0,0 +1,122 @@
+"""
+In-memory plan catalog for DataZen SaaS
+Plans are few and change rarely, so they are loaded once and served from memory
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from config.database import SessionLocal
+from models.plan import Plan
+
+# Safety net for edits made by other workers, which don't fire our listeners
+PLAN_CATALOG_TTL_SECONDS = float(os.getenv("PLAN_CATALOG_TTL_SECONDS", 300))
+
+class PlanCatalog:
+    """Process-wide catalog of plans keyed by id and name"""
+
+    _by_id: Dict[str, Plan] = {}
+    _by_name: Dict[str, Plan] = {}
+    _loaded_at: Optional[float] = None
+    _lock = threading.Lock()
+    # Bumped by every invalidation; a load that overlapped one is served but not trusted
+    _generation = 0
+
+    @classmethod
+    def _ensure_loaded(cls) -> None:
+        """Load plans if the catalog is empty, stale or invalidated"""
+        loaded_at = cls._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < PLAN_CATALOG_TTL_SECONDS:
+            return
+        cls.reload()
+
+    @classmethod
+    def reload(cls) -> None:
+        """Reload all plans from the database"""
+        generation = cls._generation
+        db = SessionLocal()
+        try:
+            plans = db.query(Plan).all()
+            # Detach fully loaded rows so they can be read outside the session
+            db.expunge_all()
+        finally:
+            db.close()
+
+        with cls._lock:
+            cls._by_id = {plan.id: plan for plan in plans}
+            cls._by_name = {plan.name: plan for plan in plans}
+            # Rows read before a concurrent commit are reloaded on next access
+            cls._loaded_at = time.monotonic() if cls._generation == generation else None
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Force a reload on next access"""
+        with cls._lock:
+            cls._generation += 1
+            cls._loaded_at = None
+
+    @classmethod
+    def get_by_id(cls, plan_id: Optional[str]) -> Optional[Plan]:
+        """Get plan by ID"""
+        if not plan_id:
+            return None
+        cls._ensure_loaded()
+        return cls._by_id.get(plan_id)
+
+    @classmethod
+    def get_by_name(cls, name: str) -> Optional[Plan]:
+        """Get plan by name"""
+        cls._ensure_loaded()
+        return cls._by_name.get(name)
+
+    @classmethod
+    def active_plans(cls) -> List[Plan]:
+        """Get all active plans"""
+        cls._ensure_loaded()
+        return [plan for plan in cls._by_id.values() if plan.is_active]
+
+    @classmethod
+    def has_feature(cls, plan_id: Optional[str], feature_name: str) -> bool:
+        """Check if a plan has a specific feature"""
+        plan = cls.get_by_id(plan_id)
+        return bool(plan and plan.has_feature(feature_name))
+
+    @classmethod
+    def max_concurrent_jobs(cls, plan_id: Optional[str]) -> int:
+        """Get max concurrent jobs for a plan, defaulting to 1"""
+        plan = cls.get_by_id(plan_id)
+        return plan.max_concurrent_jobs if plan else 1
+
+    @classmethod
+    def max_team_seats(cls, plan_id: Optional[str]) -> int:
+        """Get max team seats for a plan, defaulting to 1"""
+        plan = cls.get_by_id(plan_id)
+        return plan.max_team_seats if plan else 1
+
+# Admin edits and plans created on the fly reload the catalog on next
+# access, once they have committed (see the user cache for why not at flush)
+_PLANS_WRITTEN = "plan_catalog_dirty"
+
+@event.listens_for(Plan, "after_insert")
+@event.listens_for(Plan, "after_update")
+@event.listens_for(Plan, "after_delete")
+def _note_plan_write(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        PlanCatalog.invalidate()
+    else:
+        session.info[_PLANS_WRITTEN] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog_on_commit(session):
+    if session.info.pop(_PLANS_WRITTEN, False):
+        PlanCatalog.invalidate()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_plan_write_on_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_PLANS_WRITTEN, None)
@@ -0,0 +1,246 @@
+"""
+Result export for DataZen
+Streams stored scrape results as CSV, JSON Lines or Parquet, one row per
+extracted item, converting a chunk of rows at a time so memory stays flat
+however large the results are
+"""
+
+import os
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from .fast_json import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Rows converted per chunk (one Parquet row group)
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", 5000))
+
+# Columns describing the scraped page; item fields follow them
+PAGE_COLUMNS = ["page_index", "page_url", "data_type", "page_success", "page_error"]
+
+# Spreadsheet apps run cells starting with these as formulas
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """An export format and the plan feature that unlocks it"""
+    media_type: str
+    extension: str
+    feature: str
+
+# Parquet is a tabular export, so it comes with the CSV feature
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    "csv": ExportFormat("text/csv; charset=utf-8", "csv", "csv_export"),
+    "jsonl": ExportFormat("application/x-ndjson", "jsonl", "json_export"),
+    "parquet": ExportFormat("application/vnd.apache.parquet", "parquet", "csv_export"),
+}
+
+def outcome_rows(outcome: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Flatten one stored item outcome into export rows
+
+    Args:
+        outcome (Dict[str, Any]): Batch/job item outcome (index, url, success, result, error)
+
+    Yields:
+        Dict[str, Any]: One row per extracted item, or a single row for a
+        page without items (e.g. a failed one)
+    """
+    result = outcome.get("result") or {}
+    page = {
+        "page_index": outcome.get("index"),
+        "page_url": outcome.get("url"),
+        "data_type": result.get("data_type"),
+        "page_success": outcome.get("success"),
+        "page_error": outcome.get("error") or result.get("error"),
+    }
+    items = result.get("data") or []
+    if not items:
+        yield page
+        return
+    for item in items:
+        row = dict(page)
+        row.update(item if isinstance(item, dict) else {"value": item})
+        yield row
+
+def _kind(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    return "string"
+
+def _merge_kinds(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    if current is None or current == new:
+        return new or current
+    if new is None:
+        return current
+    if {current, new} == {"int", "float"}:
+        return "float"
+    return "string"
+
+def _text(value: Any) -> Optional[str]:
+    # Nested values are kept as JSON text in flat formats
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple)):
+        return dumps(value).decode()
+    return str(value)
+
+def _csv_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    text = _text(value)
+    # Scraped text is untrusted; keep it from running as a formula when opened.
+    # Numbers (e.g. -3) are left alone so they still read as numbers
+    if isinstance(value, str) and text.startswith(_FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+class _ChunkSink:
+    """Writable file object whose output is taken out chunk by chunk"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class ResultExporter:
+    """
+    Converts stored item outcomes to an export format as a byte stream
+
+    CSV and Parquet need their columns up front, so they read the outcomes
+    twice: once for the column names and types, once to write the rows.
+    """
+
+    def __init__(self, open_outcomes: Callable[[], Iterable[Dict[str, Any]]], chunk_rows: int = EXPORT_CHUNK_ROWS):
+        """
+        Args:
+            open_outcomes (Callable[[], Iterable[Dict[str, Any]]]): Returns a fresh
+                iterator over the stored outcomes each time it's called
+            chunk_rows (int): Rows converted per chunk
+        """
+        self.open_outcomes = open_outcomes
+        self.chunk_rows = max(1, chunk_rows)
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Export rows of every stored outcome, in storage order"""
+        for outcome in self.open_outcomes():
+            yield from outcome_rows(outcome)
+
+    def _chunks(self) -> Iterator[List[Dict[str, Any]]]:
+        chunk = []
+        for row in self.rows():
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def columns(self) -> Dict[str, Optional[str]]:
+        """
+        Scan the rows for their columns
+
+        Returns:
+            Dict[str, Optional[str]]: Column name -> value kind ("bool", "int",
+            "float", "string", or None if always empty), page columns first,
+            then item fields in order of first appearance
+        """
+        kinds: Dict[str, Optional[str]] = {name: None for name in PAGE_COLUMNS}
+        for row in self.rows():
+            for name, value in row.items():
+                kinds[name] = _merge_kinds(kinds.get(name), _kind(value))
+        return kinds
+
+    def stream(self, export_format: str) -> Iterator[bytes]:
+        """Encoded export in the given format (a key of EXPORT_FORMATS)"""
+        if export_format == "csv":
+            return self.csv()
+        if export_format == "jsonl":
+            return self.jsonl()
+        if export_format == "parquet":
+            return self.parquet()
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    def jsonl(self) -> Iterator[bytes]:
+        """JSON Lines, one row per line"""
+        for chunk in self._chunks():
+            yield b"".join(dumps(row) + b"\n" for row in chunk)
+
+    def csv(self) -> Iterator[bytes]:
+        """CSV with a header row; nested values are JSON text"""
+        fieldnames = list(self.columns())
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        for chunk in self._chunks():
+            writer.writerows({name: _csv_cell(value) for name, value in row.items()} for row in chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    def parquet(self) -> Iterator[bytes]:
+        """Parquet, one row group per chunk"""
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("Parquet export requires the pyarrow package")
+
+        arrow_types = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64()}
+        kinds = self.columns()
+        schema = pa.schema([(name, arrow_types.get(kind, pa.string())) for name, kind in kinds.items()])
+        text_columns = [name for name, kind in kinds.items() if kind not in arrow_types]
+
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="snappy")
+        try:
+            for chunk in self._chunks():
+                for row in chunk:
+                    for name in text_columns:
+                        if name in row:
+                            row[name] = _text(row[name])
+                writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
@@ -0,0 +1,204 @@
+"""
+Field selection and pagination for DataZen scrape results
+Extractors stop once the requested page of items is collected and skip
+fields nobody asked for; results are then cut to that page and those fields
+"""
+
+import os
+import base64
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+# Largest page a single scrape request may ask for
+SCRAPE_MAX_LIMIT = int(os.getenv("SCRAPE_MAX_LIMIT", 10000))
+
+# Item fields each extractor can produce (browser and static scrapers combined)
+RESULT_FIELDS: Dict[str, FrozenSet[str]] = {
+    "text": frozenset({"text", "type", "tag", "level", "length", "order"}),
+    "images": frozenset({"url", "src", "alt", "title", "width", "height", "class", "loading"}),
+    "links": frozenset({"url", "text", "title", "target", "rel", "type"}),
+    "emails": frozenset({"email", "domain", "context", "type"}),
+    "phone_numbers": frozenset({
+        "phone", "normalized", "owner", "owner_type", "confidence",
+        "source", "context_snippet", "data_source"
+    }),
+}
+
+def _cursor_scope(url: str, data_type: str) -> str:
+    # Ties a cursor to the page and data type it was issued for
+    return hashlib.blake2b(f"{data_type}|{url}".encode(), digest_size=6).hexdigest()
+
+def encode_cursor(url: str, data_type: str, offset: int) -> str:
+    """
+    Build the opaque cursor for the page of results starting at offset
+
+    Args:
+        url (str): Scraped URL, as requested
+        data_type (str): Requested data type
+        offset (int): Index of the first item of the next page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = f"{offset}:{_cursor_scope(url, data_type)}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, url: str, data_type: str) -> int:
+    """
+    Read the offset from a cursor issued by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another URL or data type
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        offset, scope = raw.split(":", 1)
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if offset < 0 or scope != _cursor_scope(url, data_type):
+        raise ValueError("Cursor does not belong to this URL and data type")
+    return offset
+
+def validate_fields(fields: Optional[List[str]], data_type: Optional[str]) -> Optional[List[str]]:
+    """
+    Check requested fields against what the data type's extractor produces
+
+    Returns:
+        Optional[List[str]]: The fields without duplicates, in request order
+
+    Raises:
+        ValueError: If the list is empty or names an unknown field
+    """
+    if fields is None:
+        return None
+    if not fields:
+        raise ValueError("fields must name at least one field")
+    known = RESULT_FIELDS.get(data_type)
+    if known is not None:
+        unknown = [field for field in fields if field not in known]
+        if unknown:
+            raise ValueError(
+                f'Unknown {data_type} fields: {", ".join(unknown)}. Available: {", ".join(sorted(known))}'
+            )
+    return list(dict.fromkeys(fields))
+
+@dataclass(frozen=True)
+class ExtractionOptions:
+    """Which items (offset, limit) and which fields of them a caller wants"""
+    fields: Optional[FrozenSet[str]] = None
+    offset: int = 0
+    limit: Optional[int] = None
+
+    @classmethod
+    def from_request(cls, request) -> Optional["ExtractionOptions"]:
+        """
+        Selection options of a scrape request, or None if it asks for everything
+
+        The cursor, when given, takes the place of offset; it is validated on
+        the request model.
+        """
+        fields = getattr(request, 'fields', None)
+        limit = getattr(request, 'limit', None)
+        offset = getattr(request, 'offset', 0) or 0
+        cursor = getattr(request, 'cursor', None)
+        if cursor:
+            offset = decode_cursor(cursor, request.url, request.data_type)
+        if fields is None and limit is None and not offset:
+            return None
+        return cls(fields=frozenset(fields) if fields else None, offset=offset, limit=limit)
+
+    def wants(self, field: str) -> bool:
+        """Whether an item field should be computed"""
+        return self.fields is None or field in self.fields
+
+    @property
+    def max_items(self) -> Optional[int]:
+        """Items an extractor needs to collect; one past the page shows whether another follows"""
+        if self.limit is None:
+            return None
+        return self.offset + self.limit + 1
+
+    def project(self, item: Any) -> Any:
+        """Keep only the requested fields of an item"""
+        if self.fields is None or not isinstance(item, dict):
+            return item
+        return {key: value for key, value in item.items() if key in self.fields}
+
+    def page(self, items: List[Any]) -> Tuple[List[Any], bool]:
+        """
+        Cut extracted items to the requested page
+
+        Returns:
+            Tuple[List[Any], bool]: The page's items with only the requested
+            fields, and whether more items follow it
+        """
+        end = None if self.limit is None else self.offset + self.limit
+        selected = items[self.offset:end]
+        has_more = end is not None and len(items) > end
+        return [self.project(item) for item in selected], has_more
+
+class ItemCollector:
+    """
+    Gathers an extractor's items, dropping duplicates and reporting when
+    enough have been found for the requested page
+    """
+
+    def __init__(self, options: Optional[ExtractionOptions] = None, key: Optional[Callable[[Dict[str, Any]], Hashable]] = None):
+        self.max_items = options.max_items if options else None
+        self.key = key
+        self.items: List[Dict[str, Any]] = []
+        # Items offered, duplicates included
+        self.offered = 0
+        self._seen = set()
+
+    @property
+    def full(self) -> bool:
+        return self.max_items is not None and len(self.items) >= self.max_items
+
+    def add(self, item: Dict[str, Any]) -> bool:
+        """
+        Keep an item unless it's a duplicate or the page is already complete
+
+        Returns:
+            bool: False once no more items are needed, so the caller can stop
+        """
+        if self.full:
+            return False
+        self.offered += 1
+        if self.key is not None:
+            item_key = self.key(item)
+            if item_key in self._seen:
+                return True
+            self._seen.add(item_key)
+        self.items.append(item)
+        return not self.full
+
+class PageWindow:
+    """Picks a stream's items that fall in the requested page, as they arrive"""
+
+    def __init__(self, options: Optional[ExtractionOptions] = None):
+        self.options = options or ExtractionOptions()
+        # Items offered, and how many of them were in the page
+        self.seen = 0
+        self.sent = 0
+        # Set when an item past the page's end is offered; the stream can stop
+        self.has_more = False
+
+    def offer(self, item: Any) -> Optional[Any]:
+        """
+        Place the next item of the stream
+
+        Returns:
+            Optional[Any]: The item cut to the requested fields, or None if it
+            falls before the page or past its end
+        """
+        self.seen += 1
+        if self.seen <= self.options.offset:
+            return None
+        if self.options.limit is not None and self.sent >= self.options.limit:
+            self.has_more = True
+            return None
+        self.sent += 1
+        return self.options.project(item)
@@ -0,0 +1,78 @@
+"""
+Concurrency limits for bulk scraping
+Bounds how many pages one user fetches at once (by plan) and how many
+requests any single domain receives at once, across all running batches
+"""
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Upper bound per user even for plans with "unlimited" concurrent jobs
+SCRAPE_MAX_CONCURRENCY_PER_USER = int(os.getenv("SCRAPE_MAX_CONCURRENCY_PER_USER", 16))
+# Politeness toward target sites, shared by every user
+SCRAPE_MAX_CONCURRENCY_PER_DOMAIN = int(os.getenv("SCRAPE_MAX_CONCURRENCY_PER_DOMAIN", 2))
+
+class _KeyedSemaphores:
+    """Semaphores created on demand per key and dropped when nobody uses them"""
+
+    def __init__(self):
+        # key -> (semaphore, number of callers holding or waiting on it)
+        self._entries: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+
+    def acquire_entry(self, key: str, limit: int) -> asyncio.Semaphore:
+        semaphore, users = self._entries.get(key, (None, 0))
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max(limit, 1))
+        self._entries[key] = (semaphore, users + 1)
+        return semaphore
+
+    def release_entry(self, key: str) -> None:
+        semaphore, users = self._entries[key]
+        if users <= 1:
+            del self._entries[key]
+        else:
+            self._entries[key] = (semaphore, users - 1)
+
+class ScrapeLimiter:
+    """Process-wide per-user and per-domain semaphores for page fetches"""
+
+    _per_user = _KeyedSemaphores()
+    _per_domain = _KeyedSemaphores()
+
+    @staticmethod
+    def domain_of(url: str) -> str:
+        """Host a URL's requests are counted against"""
+        return (urlparse(url).hostname or url).lower()
+
+    @classmethod
+    @asynccontextmanager
+    async def slot(cls, user_id: str, url: str, user_limit: int):
+        """
+        Hold one fetch slot for the user and the URL's domain for the duration of the block
+
+        Args:
+            user_id (str): Requesting user
+            url (str): Page to fetch
+            user_limit (int): The user's plan concurrency (capped at SCRAPE_MAX_CONCURRENCY_PER_USER)
+        """
+        domain = cls.domain_of(url)
+        user_semaphore = cls._per_user.acquire_entry(user_id, min(user_limit, SCRAPE_MAX_CONCURRENCY_PER_USER))
+        domain_semaphore = cls._per_domain.acquire_entry(domain, SCRAPE_MAX_CONCURRENCY_PER_DOMAIN)
+        acquired = []
+        try:
+            # Per-user first, so a user's queue doesn't hold domain slots others could use
+            for semaphore in (user_semaphore, domain_semaphore):
+                await semaphore.acquire()
+                acquired.append(semaphore)
+            yield
+        finally:
+            for semaphore in acquired:
+                semaphore.release()
+            cls._per_user.release_entry(user_id)
+            cls._per_domain.release_entry(domain)
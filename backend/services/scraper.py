@@ -6,11 +6,13 @@ Uses Playwright for browser automation and BeautifulSoup for HTML parsing
 import asyncio
 import logging
 import sys
+import time
 from typing import List, Dict, Any, Optional
 from playwright.async_api import async_playwright, Browser, Page
 from bs4 import BeautifulSoup
 import re
 from datetime import datetime
+from urllib.parse import urlparse
 
 # Fix for Windows subprocess issue
 if sys.platform == "win32":
@@ -19,8 +21,11 @@ if sys.platform == "win32":
 from .utils import (
     validate_url, check_robots_txt, extract_emails, 
     clean_text, normalize_url, is_valid_image_url,
-    format_scrape_result, truncate_html
+    format_scrape_result, truncate_html, visible_text_length,
+    detect_charset
 )
+from .host_backoff import HostBackoff, HostCoolingDown, parse_retry_after
+from .result_selection import ExtractionOptions, ItemCollector
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,20 +34,26 @@ logger = logging.getLogger(__name__)
 class WebScraper:
     """Main web scraper class using Playwright and BeautifulSoup"""
     
-    def __init__(self, timeout: int = 20000, max_html_size_mb: float = 2.0):
+    def __init__(self, timeout: int = 20000, max_html_size_mb: float = 2.0, browser: Optional[Browser] = None):
         """
         Initialize the web scraper
         
         Args:
             timeout (int): Timeout in milliseconds
             max_html_size_mb (float): Maximum HTML size in MB
+            browser (Optional[Browser]): Already running browser to share; its owner closes it
         """
         self.timeout = timeout
         self.max_html_size_mb = max_html_size_mb
-        self.browser: Optional[Browser] = None
+        self.browser: Optional[Browser] = browser
+        self.owns_browser = browser is None
+        # Observations from the last fetch, for the domain profile store
+        self.last_fetch: Dict[str, Any] = {}
         
     async def __aenter__(self):
         """Async context manager entry"""
+        if not self.owns_browser:
+            return self
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch(
             headless=True,
@@ -60,16 +71,22 @@ class WebScraper:
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
+        if not self.owns_browser:
+            return
         if self.browser:
             await self.browser.close()
         await self.playwright.stop()
     
-    async def fetch_page_content(self, url: str) -> tuple[str, str]:
+    async def fetch_page_content(self, url: str, wait_strategy: Optional[str] = None) -> tuple[str, str]:
         """
         Fetch page content using Playwright
         
         Args:
             url (str): URL to fetch
+            wait_strategy (Optional[str]): Known-good wait mode for this domain
+                ('domcontentloaded' or 'networkidle'). When None, both are
+                tried and the cheapest one that gave complete content is
+                recorded in self.last_fetch.
             
         Returns:
             tuple[str, str]: (HTML content, final URL after redirects)
@@ -77,7 +94,12 @@ class WebScraper:
         if not self.browser:
             raise RuntimeError("Browser not initialized. Use async context manager.")
         
+        # Fail fast on hosts that recently blocked us or were unreachable
+        HostBackoff.check(url)
+        
         page = await self.browser.new_page()
+        started = time.monotonic()
+        self.last_fetch = {}
         
         try:
             # Set comprehensive headers to bypass anti-bot detection
@@ -103,15 +125,55 @@ class WebScraper:
                 timeout=self.timeout
             )
 
+            if response:
+                self.last_fetch = {
+                    'status_code': response.status,
+                    'charset': detect_charset(b'', response.headers.get('content-type', '')),
+                }
+
+            if response and response.status == 429:
+                reason = "rate limited (HTTP 429)"
+                retry_after = parse_retry_after(response.headers.get('retry-after'))
+                cooldown = HostBackoff.record_failure(url, reason, retry_after)
+                raise HostCoolingDown(urlparse(url).netloc, cooldown, reason)
+
+            # A 403 may only be the browser being fingerprinted; it's left to
+            # the requests fallback to decide whether the host is blocking us
+
             if not response or response.status >= 400:
                 raise Exception(f"Failed to load page: HTTP {response.status if response else 'No response'}")
 
-            # Wait for page to be fully loaded
-            await page.wait_for_load_state('networkidle', timeout=self.timeout)
-            
-            # Get HTML content
-            html_content = await page.content()
+            if wait_strategy == 'domcontentloaded':
+                # This domain is known to be complete without waiting for the network
+                html_content = await page.content()
+            elif wait_strategy == 'networkidle':
+                await page.wait_for_load_state('networkidle', timeout=self.timeout)
+                html_content = await page.content()
+            else:
+                # Learn which wait mode this domain needs
+                early_html = await page.content()
+                await page.wait_for_load_state('networkidle', timeout=self.timeout)
+                html_content = await page.content()
+
+                early_length = visible_text_length(early_html)
+                final_length = visible_text_length(html_content)
+                self.last_fetch['wait_strategy'] = (
+                    'domcontentloaded' if final_length <= early_length * 1.1 else 'networkidle'
+                )
+
+                # Compare the server's HTML with the rendered DOM
+                try:
+                    raw_html = await response.text()
+                    raw_length = visible_text_length(raw_html)
+                    self.last_fetch['render_required'] = final_length > raw_length * 1.5 + 200
+                    if not self.last_fetch.get('charset'):
+                        self.last_fetch['charset'] = detect_charset(raw_html[:4096].encode('utf-8', errors='ignore'))
+                except Exception:
+                    pass
+
+            HostBackoff.record_success(url)
             final_url = page.url
+            self.last_fetch['latency_ms'] = (time.monotonic() - started) * 1000
             
             # Truncate if too large
             html_content = truncate_html(html_content, self.max_html_size_mb)
@@ -121,12 +183,13 @@ class WebScraper:
         finally:
             await page.close()
     
-    def extract_text(self, html: str) -> List[Dict[str, Any]]:
+    def extract_text(self, html: str, options: Optional[ExtractionOptions] = None) -> List[Dict[str, Any]]:
         """
         Extract comprehensive visible text from HTML
 
         Args:
             html (str): HTML content
+            options (Optional[ExtractionOptions]): Stop once this many items are found
 
         Returns:
             List[Dict[str, Any]]: List of text elements with metadata
@@ -137,113 +200,78 @@ class WebScraper:
         for element in soup(["script", "style", "meta", "link", "nav", "header", "footer", "aside", "noscript"]):
             element.decompose()
 
-        text_elements = []
-
-        # Extract headings with hierarchy
-        for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            text = clean_text(heading.get_text())
-            if text:
-                text_elements.append({
-                    'text': text,
-                    'type': 'heading',
-                    'tag': heading.name,
-                    'level': int(heading.name[1])
-                })
-
-        # Extract paragraphs
-        for para in soup.find_all('p'):
-            text = clean_text(para.get_text())
-            if text and len(text) > 5:
-                text_elements.append({
-                    'text': text,
-                    'type': 'paragraph'
-                })
-
-        # Extract list items
-        for li in soup.find_all('li'):
-            text = clean_text(li.get_text())
-            if text:
-                text_elements.append({
-                    'text': text,
-                    'type': 'list_item'
-                })
-
-        # Extract div content (main content areas)
-        for div in soup.find_all('div'):
+        # Duplicates are dropped as found, keyed on the first 100 chars
+        text_elements = ItemCollector(options, key=lambda element: element['text'][:100])
+
+        def collect(elements, make_item):
+            # Returns False once enough items have been found
+            for element in elements:
+                item = make_item(element)
+                if item and not text_elements.add(item):
+                    return False
+            return True
+
+        def heading(tag):
+            text = clean_text(tag.get_text())
+            return {'text': text, 'type': 'heading', 'tag': tag.name, 'level': int(tag.name[1])} if text else None
+
+        def block(item_type, min_length):
+            def make_item(tag):
+                text = clean_text(tag.get_text())
+                return {'text': text, 'type': item_type} if text and len(text) > min_length else None
+            return make_item
+
+        def leaf_div(tag):
             # Skip divs that contain other block elements
-            if not div.find(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'div']):
-                text = clean_text(div.get_text())
-                if text and len(text) > 10:
-                    text_elements.append({
-                        'text': text,
-                        'type': 'content'
-                    })
-
-        # Extract article content
-        for article in soup.find_all('article'):
-            text = clean_text(article.get_text())
-            if text and len(text) > 20:
-                text_elements.append({
-                    'text': text,
-                    'type': 'article'
-                })
-
-        # Extract section content
-        for section in soup.find_all('section'):
-            text = clean_text(section.get_text())
-            if text and len(text) > 15:
-                text_elements.append({
-                    'text': text,
-                    'type': 'section'
-                })
-
-        # Extract table content
-        for table in soup.find_all('table'):
-            for row in table.find_all('tr'):
-                row_text = clean_text(row.get_text())
-                if row_text:
-                    text_elements.append({
-                        'text': row_text,
-                        'type': 'table_row'
-                    })
+            if tag.find(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'div']):
+                return None
+            return block('content', 10)(tag)
+
+        table_rows = (row for table in soup.find_all('table') for row in table.find_all('tr'))
+
+        # Headings with hierarchy, paragraphs, list items, main content areas,
+        # articles, sections, then table rows
+        complete = (
+            collect(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']), heading)
+            and collect(soup.find_all('p'), block('paragraph', 5))
+            and collect(soup.find_all('li'), block('list_item', 0))
+            and collect(soup.find_all('div'), leaf_div)
+            and collect(soup.find_all('article'), block('article', 20))
+            and collect(soup.find_all('section'), block('section', 15))
+            and collect(table_rows, block('table_row', 0))
+        )
 
         # If we still don't have much content, extract all visible text
-        if len(text_elements) < 5:
+        if complete and text_elements.offered < 5:
             all_text = clean_text(soup.get_text())
             if all_text and len(all_text) > 50:
                 # Split into sentences for better structure
                 sentences = [s.strip() for s in all_text.split('.') if s.strip() and len(s.strip()) > 10]
                 for i, sentence in enumerate(sentences[:20]):
-                    text_elements.append({
+                    if not text_elements.add({
                         'text': sentence + '.',
                         'type': 'sentence',
                         'order': i + 1
-                    })
-
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_elements = []
-        for element in text_elements:
-            text_key = element['text'][:100]  # Use first 100 chars as key
-            if text_key not in seen:
-                seen.add(text_key)
-                unique_elements.append(element)
-
-        return unique_elements
+                    }):
+                        break
+
+        return text_elements.items
     
-    def extract_images(self, html: str, base_url: str) -> List[Dict[str, Any]]:
+    def extract_images(self, html: str, base_url: str, options: Optional[ExtractionOptions] = None) -> List[Dict[str, Any]]:
         """
         Extract image URLs from HTML
         
         Args:
             html (str): HTML content
             base_url (str): Base URL for resolving relative URLs
+            options (Optional[ExtractionOptions]): Stop once this many items are found
             
         Returns:
             List[Dict[str, Any]]: List of image data with metadata
         """
         soup = BeautifulSoup(html, 'html.parser')
-        images = []
+        # Duplicate URLs are dropped as found
+        images = ItemCollector(options, key=lambda image: image['url'])
         
         # Find all img tags
         for img in soup.find_all('img'):
@@ -254,13 +282,14 @@ class WebScraper:
                 
                 # Validate image URL
                 if is_valid_image_url(full_url):
-                    images.append({
+                    if not images.add({
                         'url': full_url,
                         'alt': img.get('alt', ''),
                         'title': img.get('title', ''),
                         'width': img.get('width', ''),
                         'height': img.get('height', '')
-                    })
+                    }):
+                        return images.items
         
         # Also check for background images in style attributes
         for element in soup.find_all(attrs={'style': True}):
@@ -269,37 +298,33 @@ class WebScraper:
             if bg_match:
                 bg_url = normalize_url(bg_match.group(1), base_url)
                 if is_valid_image_url(bg_url):
-                    images.append({
+                    if not images.add({
                         'url': bg_url,
                         'alt': 'Background image',
                         'title': '',
                         'width': '',
                         'height': ''
-                    })
-        
-        # Remove duplicates
-        seen_urls = set()
-        unique_images = []
-        for img in images:
-            if img['url'] not in seen_urls:
-                seen_urls.add(img['url'])
-                unique_images.append(img)
+                    }):
+                        break
         
-        return unique_images
+        return images.items
     
-    def extract_links(self, html: str, base_url: str) -> List[Dict[str, Any]]:
+    def extract_links(self, html: str, base_url: str, options: Optional[ExtractionOptions] = None) -> List[Dict[str, Any]]:
         """
         Extract links from HTML
         
         Args:
             html (str): HTML content
             base_url (str): Base URL for resolving relative URLs
+            options (Optional[ExtractionOptions]): Stop once this many items are found; skip unrequested fields
             
         Returns:
             List[Dict[str, Any]]: List of link data with metadata
         """
+        options = options or ExtractionOptions()
         soup = BeautifulSoup(html, 'html.parser')
-        links = []
+        # Duplicate URLs are dropped as found
+        links = ItemCollector(options, key=lambda link: link['url'])
         
         for link in soup.find_all('a', href=True):
             href = link.get('href')
@@ -309,29 +334,24 @@ class WebScraper:
                 
                 # Skip javascript: and mailto: links for regular links
                 if not full_url.startswith(('javascript:', 'mailto:', 'tel:')):
-                    links.append({
+                    if not links.add({
                         'url': full_url,
-                        'text': clean_text(link.get_text(strip=True)),
+                        # Anchor text is the costly part of a link; only when asked for
+                        'text': clean_text(link.get_text(strip=True)) if options.wants('text') else '',
                         'title': link.get('title', ''),
                         'target': link.get('target', '')
-                    })
-        
-        # Remove duplicates
-        seen_urls = set()
-        unique_links = []
-        for link in links:
-            if link['url'] not in seen_urls:
-                seen_urls.add(link['url'])
-                unique_links.append(link)
+                    }):
+                        break
         
-        return unique_links
+        return links.items
     
-    def extract_emails_from_html(self, html: str) -> List[Dict[str, Any]]:
+    def extract_emails_from_html(self, html: str, options: Optional[ExtractionOptions] = None) -> List[Dict[str, Any]]:
         """
         Extract email addresses from HTML
         
         Args:
             html (str): HTML content
+            options (Optional[ExtractionOptions]): Stop once this many items are found
             
         Returns:
             List[Dict[str, Any]]: List of email data
@@ -354,28 +374,40 @@ class WebScraper:
                     emails.append(email)
         
         # Format as list of dictionaries
-        email_data = []
+        email_data = ItemCollector(options)
         for email in emails:
-            email_data.append({
+            if not email_data.add({
                 'email': email,
                 'domain': email.split('@')[1] if '@' in email else ''
-            })
+            }):
+                break
         
-        return email_data
+        return email_data.items
     
-    def extract_phone_numbers(self, html_content: str, resolve_owner: bool = False) -> List[Dict[str, Any]]:
+    def extract_phone_numbers(
+        self,
+        html_content: str,
+        resolve_owner: bool = False,
+        options: Optional[ExtractionOptions] = None
+    ) -> List[Dict[str, Any]]:
         """
         Extract phone numbers from HTML content
 
+        Owner lookup, the element selector and the context snippet are only
+        computed when those fields are requested.
+
         Args:
             html_content (str): HTML content to extract from
             resolve_owner (bool): Whether to attempt owner resolution
+            options (Optional[ExtractionOptions]): Stop once this many items are found; skip unrequested fields
 
         Returns:
             List[Dict[str, Any]]: List of phone number records
         """
+        options = options or ExtractionOptions()
         soup = BeautifulSoup(html_content, 'html.parser')
-        phone_numbers = []
+        phone_numbers = ItemCollector(options)
+        wants_owner = any(options.wants(field) for field in ('owner', 'owner_type', 'confidence'))
 
         # Phone number regex patterns
         patterns = [
@@ -408,24 +440,30 @@ class WebScraper:
                     owner_type = 'Unknown'
                     confidence = 50
 
-                    if resolve_owner:
+                    if resolve_owner and wants_owner:
                         owner, owner_type, confidence = self._resolve_phone_owner(phone, context, soup)
-                    else:
+                    elif wants_owner:
                         # Try to extract owner from adjacent text
                         owner = self._extract_owner_from_context(context)
 
-                    phone_numbers.append({
+                    record = {
                         'phone': phone,
                         'normalized': normalized,
                         'owner': owner or 'Unknown',
                         'owner_type': owner_type,
-                        'confidence': confidence,
-                        'source': self._find_phone_selector(soup, phone),
-                        'context_snippet': self._extract_context_snippet(context, phone),
-                        'data_source': 'enriched_lookup' if resolve_owner else 'extracted_from_page'
-                    })
+                        'confidence': confidence
+                    }
+                    # Searching the tree for the number's element is the slowest step
+                    if options.wants('source'):
+                        record['source'] = self._find_phone_selector(soup, phone)
+                    if options.wants('context_snippet'):
+                        record['context_snippet'] = self._extract_context_snippet(context, phone)
+                    record['data_source'] = 'enriched_lookup' if resolve_owner else 'extracted_from_page'
+
+                    if not phone_numbers.add(record):
+                        return phone_numbers.items
 
-        return phone_numbers
+        return phone_numbers.items
 
     def _resolve_phone_owner(self, phone: str, context: str, soup: BeautifulSoup) -> tuple:
         """Attempt to resolve phone owner information"""
@@ -498,7 +536,52 @@ class WebScraper:
 
         return ' '.join(words[:6])
 
-    async def scrape(self, url: str, data_type: str, check_robots: bool = True, resolve_owner: bool = False) -> Dict[str, Any]:
+    def extract_data(
+        self,
+        html_content: str,
+        base_url: str,
+        data_type: str,
+        resolve_owner: bool = False,
+        options: Optional[ExtractionOptions] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run the extractor for a data type on an already fetched document
+
+        Args:
+            html_content (str): HTML content
+            base_url (str): URL the document was loaded from, for resolving relative URLs
+            data_type (str): Type of data to extract (text, images, links, emails, phone_numbers)
+            resolve_owner (bool): Whether to resolve phone owner information
+            options (Optional[ExtractionOptions]): Items and fields needed
+
+        Returns:
+            List[Dict[str, Any]]: Extracted items
+
+        Raises:
+            ValueError: If the data type is not supported
+        """
+        if data_type == 'text':
+            return self.extract_text(html_content, options)
+        if data_type == 'images':
+            return self.extract_images(html_content, base_url, options)
+        if data_type == 'links':
+            return self.extract_links(html_content, base_url, options)
+        if data_type == 'emails':
+            return self.extract_emails_from_html(html_content, options)
+        if data_type == 'phone_numbers':
+            return self.extract_phone_numbers(html_content, resolve_owner, options)
+        raise ValueError(f"Unsupported data type: {data_type}")
+
+    async def scrape(
+        self,
+        url: str,
+        data_type: str,
+        check_robots: bool = True,
+        resolve_owner: bool = False,
+        wait_strategy: Optional[str] = None,
+        keep_document: bool = False,
+        options: Optional[ExtractionOptions] = None
+    ) -> Dict[str, Any]:
         """
         Main scraping method
 
@@ -507,6 +590,9 @@ class WebScraper:
             data_type (str): Type of data to extract (text, images, links, emails, phone_numbers)
             check_robots (bool): Whether to check robots.txt
             resolve_owner (bool): Whether to resolve phone owner information
+            wait_strategy (Optional[str]): Known-good wait mode for this domain
+            keep_document (bool): Include the rendered HTML as 'html_content' for later stages
+            options (Optional[ExtractionOptions]): Items and fields needed; extraction stops at the page's end
 
         Returns:
             Dict[str, Any]: Scraping results
@@ -521,27 +607,18 @@ class WebScraper:
                 raise ValueError("Scraping not allowed by robots.txt")
 
             # Fetch page content
-            html_content, final_url = await self.fetch_page_content(url)
+            html_content, final_url = await self.fetch_page_content(url, wait_strategy)
 
             # Extract data based on type
-            if data_type == 'text':
-                data = self.extract_text(html_content)
-            elif data_type == 'images':
-                data = self.extract_images(html_content, final_url)
-            elif data_type == 'links':
-                data = self.extract_links(html_content, final_url)
-            elif data_type == 'emails':
-                data = self.extract_emails_from_html(html_content)
-            elif data_type == 'phone_numbers':
-                data = self.extract_phone_numbers(html_content, resolve_owner)
-            else:
-                raise ValueError(f"Unsupported data type: {data_type}")
+            data = self.extract_data(html_content, final_url, data_type, resolve_owner, options)
             
             # Format result
             result = format_scrape_result(data, data_type)
             result['timestamp'] = datetime.now().isoformat()
             result['url'] = final_url
             result['original_url'] = url
+            if keep_document:
+                result['html_content'] = html_content
             
             logger.info(f"Successfully scraped {len(data)} {data_type} items from {url}")
             return result
@@ -0,0 +1,250 @@
+"""
+Sitemap and feed enumeration for DataZen
+Lists a site's pages from its sitemaps (found via robots.txt or /sitemap.xml),
+sitemap indexes and RSS/Atom feeds, parsing each file as it downloads, so
+large sites are enumerated in a few requests instead of a crawl
+"""
+
+import os
+import zlib
+import logging
+import requests
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Deque, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urljoin, urlparse
+
+from .dns_cache import mount_shared_adapter
+from .utils import fetch_robots_parser
+
+logger = logging.getLogger(__name__)
+
+# Limits per enumeration; the sitemap protocol caps one file at 50,000 URLs / 50 MB uncompressed
+SITEMAP_MAX_URLS = int(os.getenv("SITEMAP_MAX_URLS", 100000))
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", 200))
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", 50 * 1024 * 1024))
+SITEMAP_TIMEOUT_SECONDS = float(os.getenv("SITEMAP_TIMEOUT_SECONDS", 30))
+
+_CHUNK_SIZE = 64 * 1024
+_GZIP_MAGIC = b'\x1f\x8b'
+# Elements holding one page (urlset, RSS, Atom) or one child sitemap (index)
+_PAGE_TAGS = {'url', 'item', 'entry'}
+_SITEMAP_TAG = 'sitemap'
+_FEED_SUFFIXES = ('.xml', '.xml.gz', '.gz', '.rss', '.atom')
+
+# Session sharing the fetch layer's DNS cache
+_session = requests.Session()
+mount_shared_adapter(_session)
+
+@dataclass
+class SitemapEntry:
+    """One page listed by a sitemap or feed"""
+    url: str
+    lastmod: Optional[datetime]
+    sitemap: str
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a sitemap <lastmod> (W3C datetime) or feed date (RFC 822 or ISO 8601)
+
+    Args:
+        value (Optional[str]): Date text
+
+    Returns:
+        Optional[datetime]: Naive UTC datetime, or None if missing or unparseable
+    """
+    if not value or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _local_name(tag: str) -> str:
+    # "{http://www.sitemaps.org/schemas/sitemap/0.9}url" -> "url"
+    return tag.rsplit('}', 1)[-1].lower()
+
+def _record(element: ET.Element, base_url: str) -> Tuple[Optional[str], Optional[datetime]]:
+    loc = None
+    lastmod = None
+    for child in element:
+        name = _local_name(child.tag)
+        text = (child.text or '').strip()
+        if name == 'loc' and text:
+            loc = text
+        elif name == 'link':
+            # RSS carries the URL as text, Atom as href (prefer rel="alternate")
+            href = child.get('href')
+            if href and child.get('rel', 'alternate') == 'alternate':
+                loc = href
+            elif text and not loc:
+                loc = text
+        elif name in ('lastmod', 'updated', 'pubdate', 'published', 'date') and lastmod is None:
+            lastmod = parse_lastmod(text)
+    return (urljoin(base_url, loc) if loc else None), lastmod
+
+class SitemapReader:
+    """
+    Enumerates pages from sitemaps and feeds
+
+    Sitemap indexes are followed breadth-first. With modified_since, pages
+    (and whole child sitemaps) whose lastmod is not newer are skipped; pages
+    without a lastmod are always listed.
+    """
+
+    def __init__(
+        self,
+        modified_since: Optional[datetime] = None,
+        max_urls: int = SITEMAP_MAX_URLS,
+        max_files: int = SITEMAP_MAX_FILES
+    ):
+        if modified_since is not None and modified_since.tzinfo is not None:
+            modified_since = modified_since.astimezone(timezone.utc).replace(tzinfo=None)
+        self.modified_since = modified_since
+        self.max_urls = max(1, min(max_urls, SITEMAP_MAX_URLS))
+        self.max_files = max(1, min(max_files, SITEMAP_MAX_FILES))
+
+        self.files_fetched = 0
+        self.urls_listed = 0
+        self.skipped_unchanged = 0
+        self.sitemaps_skipped_unchanged = 0
+        self.errors: List[str] = []
+
+    @staticmethod
+    def discover(url: str) -> List[str]:
+        """
+        Find the sitemaps of a site
+
+        A URL that already points at a sitemap or feed is used as-is. Otherwise
+        robots.txt Sitemap: lines are used, falling back to /sitemap.xml.
+
+        Args:
+            url (str): Any URL on the site, or a sitemap/feed URL
+
+        Returns:
+            List[str]: Sitemap URLs to read
+        """
+        parsed = urlparse(url)
+        path = parsed.path.lower()
+        if path.endswith(_FEED_SUFFIXES) or 'sitemap' in path or path.rstrip('/').endswith('/feed'):
+            return [url]
+
+        try:
+            sitemaps = fetch_robots_parser(url).site_maps() or []
+        except Exception as e:
+            logger.warning(f"Could not read robots.txt sitemaps for {parsed.netloc}: {e}")
+            sitemaps = []
+        return sitemaps or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+
+    def _is_unchanged(self, lastmod: Optional[datetime]) -> bool:
+        return bool(self.modified_since and lastmod and lastmod <= self.modified_since)
+
+    def _iter_chunks(self, sitemap_url: str) -> Iterator[bytes]:
+        # Decompressed body, chunk by chunk; .gz files arrive without Content-Encoding
+        with _session.get(sitemap_url, stream=True, timeout=SITEMAP_TIMEOUT_SECONDS) as response:
+            response.raise_for_status()
+            decompressor = None
+            total = 0
+            for chunk in response.iter_content(chunk_size=_CHUNK_SIZE):
+                if not chunk:
+                    continue
+                if decompressor is None and total == 0 and chunk.startswith(_GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk, SITEMAP_MAX_BYTES - total + 1)
+                total += len(chunk)
+                if total > SITEMAP_MAX_BYTES:
+                    raise ValueError(f"Sitemap exceeds {SITEMAP_MAX_BYTES} bytes")
+                yield chunk
+            if decompressor is not None:
+                yield decompressor.flush()
+
+    def _iter_file(self, sitemap_url: str) -> Iterator[Tuple[str, str, Optional[datetime]]]:
+        # ("page" | "sitemap", url, lastmod) for each record, as soon as its element closes
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        parents: List[ET.Element] = []
+
+        def records():
+            for event, element in parser.read_events():
+                if event == 'start':
+                    parents.append(element)
+                    continue
+                parents.pop()
+                name = _local_name(element.tag)
+                if name in _PAGE_TAGS or name == _SITEMAP_TAG:
+                    loc, lastmod = _record(element, sitemap_url)
+                    # Drop finished records so memory stays flat on 50k-URL files
+                    if parents:
+                        parents[-1].remove(element)
+                    if loc:
+                        yield ('sitemap' if name == _SITEMAP_TAG else 'page'), loc, lastmod
+
+        for chunk in self._iter_chunks(sitemap_url):
+            parser.feed(chunk)
+            yield from records()
+        parser.close()
+        yield from records()
+
+    def entries(self, url: str) -> Iterator[SitemapEntry]:
+        """
+        List the pages of a site or sitemap, as each file is parsed
+
+        Args:
+            url (str): Site URL (sitemaps are discovered) or a sitemap/feed URL
+
+        Yields:
+            SitemapEntry: Pages changed since modified_since (or all), unique, up to max_urls
+        """
+        queue: Deque[str] = deque(self.discover(url))
+        visited: Set[str] = set()
+        seen_urls: Set[str] = set()
+
+        while queue and self.files_fetched < self.max_files:
+            sitemap_url = queue.popleft()
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            self.files_fetched += 1
+
+            try:
+                for kind, loc, lastmod in self._iter_file(sitemap_url):
+                    if kind == 'sitemap':
+                        if self._is_unchanged(lastmod):
+                            self.sitemaps_skipped_unchanged += 1
+                        elif loc not in visited:
+                            queue.append(loc)
+                        continue
+                    if loc in seen_urls:
+                        continue
+                    seen_urls.add(loc)
+                    if self._is_unchanged(lastmod):
+                        self.skipped_unchanged += 1
+                        continue
+                    self.urls_listed += 1
+                    yield SitemapEntry(url=loc, lastmod=lastmod, sitemap=sitemap_url)
+                    if self.urls_listed >= self.max_urls:
+                        return
+            except Exception as e:
+                # One broken file (404, bad XML) shouldn't lose the rest of the index
+                logger.warning(f"Could not read sitemap {sitemap_url}: {e}")
+                self.errors.append(f"{sitemap_url}: {e}")
+
+    def summary(self) -> dict:
+        """Counters for the end of an enumeration"""
+        return {
+            "urls_listed": self.urls_listed,
+            "files_fetched": self.files_fetched,
+            "skipped_unchanged": self.skipped_unchanged,
+            "sitemaps_skipped_unchanged": self.sitemaps_skipped_unchanged,
+            "errors": self.errors,
+        }
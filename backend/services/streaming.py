@@ -0,0 +1,60 @@
+"""
+Streaming response helpers for DataZen
+NDJSON for record streams and Server-Sent Events for progress, so clients can
+render as results arrive and the server never holds a whole response
+"""
+
+import os
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Union
+
+from fastapi.responses import StreamingResponse
+
+from .fast_json import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Idle SSE streams send a comment this often so proxies don't drop them
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+SSE_HEARTBEAT = b": keep-alive\n\n"
+
+# Ask reverse proxies not to buffer (or cache) streamed responses
+STREAM_HEADERS = {"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+
+def ndjson_line(payload: Dict[str, Any]) -> bytes:
+    """Encode one NDJSON line"""
+    return dumps(payload) + b"\n"
+
+def sse_event(data: Any, event: Optional[str] = None, event_id: Optional[Any] = None) -> bytes:
+    """
+    Encode one Server-Sent Event
+
+    Args:
+        data (Any): JSON-serializable payload
+        event (Optional[str]): Event name; clients listen with addEventListener(event)
+        event_id (Optional[Any]): Event ID, echoed back by clients as Last-Event-ID
+
+    Returns:
+        bytes: The encoded event, terminated by a blank line
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+def accepts(accept_header: Optional[str], media_type: str) -> bool:
+    """Check if an Accept header asks for a media type"""
+    if not accept_header:
+        return False
+    return any(part.split(';')[0].strip() == media_type for part in accept_header.split(','))
+
+def ndjson_response(lines: Union[AsyncIterator[bytes], Iterator[bytes]]) -> StreamingResponse:
+    """Stream NDJSON lines (a blocking iterator runs in a worker thread)"""
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE, headers=STREAM_HEADERS)
+
+def sse_response(events: AsyncIterator[bytes]) -> StreamingResponse:
+    """Stream Server-Sent Events"""
+    return StreamingResponse(events, media_type=SSE_MEDIA_TYPE, headers=STREAM_HEADERS)
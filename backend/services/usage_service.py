@@ -3,14 +3,16 @@ Usage tracking service for DataZen SaaS
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 from sqlalchemy.orm import Session
 
 from models.user import User
 from models.usage_log import UsageLog
 from models.subscription import Subscription, SubscriptionStatus
-from models.plan import Plan
 from services.auth_service import AuthService
+from services.user_cache import UserCache
+from services.plan_catalog import PlanCatalog
 
 class UsageService:
     """Service for tracking and managing user usage"""
@@ -25,12 +27,13 @@ class UsageService:
         source: str = "api",
         success: bool = True,
         error_message: Optional[str] = None,
-        processing_time_seconds: Optional[int] = None
+        processing_time_seconds: Optional[int] = None,
+        ai_usage: Optional[Dict[str, Any]] = None
     ) -> UsageLog:
-        """Log a scraping usage event"""
+        """Log a scraping usage event, with AI cost if the request used AI (see AIUsage.to_dict)"""
         
         # Check if quota reset is needed
-        user = AuthService.get_user_by_id(db, user_id)
+        user = UserCache.get_user(db, user_id)
         if user and AuthService.check_quota_reset_needed(user):
             AuthService.reset_monthly_quota(db, user_id)
         
@@ -45,18 +48,133 @@ class UsageService:
             error_message=error_message,
             processing_time_seconds=processing_time_seconds
         )
+        if ai_usage:
+            UsageService._apply_ai_usage(usage_log, ai_usage)
         
         db.add(usage_log)
         
-        # Update user quota
+        # Update user quota atomically so concurrent scrapes don't lose increments
         if success and user:
-            user.quota_used += pages_scraped
+            db.query(User).filter(User.id == user_id).update(
+                {User.quota_used: User.quota_used + pages_scraped},
+                synchronize_session=False
+            )
         
         db.commit()
         db.refresh(usage_log)
         
+        if success and user:
+            UserCache.add_quota_used(user_id, pages_scraped)
+        
         return usage_log
     
+    @staticmethod
+    def log_usage_batch(
+        db: Session,
+        user_id: str,
+        entries: List[Dict[str, Any]],
+        source: str = "api"
+    ) -> List[UsageLog]:
+        """
+        Log many scraping usage events in one transaction
+
+        Args:
+            db (Session): Database session
+            user_id (str): User the events belong to
+            entries (List[Dict[str, Any]]): One dict per page with url, data_type and
+                optionally pages_scraped, success, error_message, processing_time_seconds, ai_usage
+            source (str): Source of the requests
+
+        Returns:
+            List[UsageLog]: Created usage logs
+        """
+        usage_logs, pages_charged = UsageService.stage_usage_batch(db, user_id, entries, source)
+        db.commit()
+
+        if pages_charged:
+            UserCache.add_quota_used(user_id, pages_charged)
+
+        return usage_logs
+
+    @staticmethod
+    def stage_usage_batch(
+        db: Session,
+        user_id: str,
+        entries: List[Dict[str, Any]],
+        source: str = "api"
+    ) -> Tuple[List[UsageLog], int]:
+        """
+        Add usage events and their quota charge to the session without committing
+
+        Lets callers charge usage in the same transaction as their own changes.
+        Once committed, pass the charged pages to UserCache.add_quota_used.
+
+        Args:
+            db (Session): Database session
+            user_id (str): User the events belong to
+            entries (List[Dict[str, Any]]): Usage entries, as for log_usage_batch
+            source (str): Source of the requests
+
+        Returns:
+            Tuple[List[UsageLog], int]: Created usage logs and the pages charged to the quota
+        """
+        user = UserCache.get_user(db, user_id)
+        if user and AuthService.check_quota_reset_needed(user):
+            AuthService.reset_monthly_quota(db, user_id)
+
+        usage_logs = []
+        pages_charged = 0
+        for entry in entries:
+            success = entry.get("success", True)
+            pages_scraped = entry.get("pages_scraped", 1)
+            usage_log = UsageLog(
+                user_id=user_id,
+                url=entry["url"],
+                data_type=entry["data_type"],
+                pages_scraped=pages_scraped,
+                source=source,
+                success=success,
+                error_message=entry.get("error_message"),
+                processing_time_seconds=entry.get("processing_time_seconds")
+            )
+            if entry.get("ai_usage"):
+                UsageService._apply_ai_usage(usage_log, entry["ai_usage"])
+            usage_logs.append(usage_log)
+            if success:
+                pages_charged += pages_scraped
+
+        db.add_all(usage_logs)
+
+        if not user:
+            return usage_logs, 0
+
+        # One quota update for the whole batch
+        if pages_charged:
+            db.query(User).filter(User.id == user_id).update(
+                {User.quota_used: User.quota_used + pages_charged},
+                synchronize_session=False
+            )
+
+        return usage_logs, pages_charged
+
+    @staticmethod
+    def _apply_ai_usage(usage_log: UsageLog, ai_usage: Dict[str, Any]) -> None:
+        """Copy AI accounting onto a usage log"""
+        usage_log.ai_tokens_in = ai_usage.get("tokens_in", 0)
+        usage_log.ai_tokens_out = ai_usage.get("tokens_out", 0)
+        usage_log.ai_latency_ms = ai_usage.get("latency_ms")
+        usage_log.ai_cache_hit = bool(ai_usage.get("cache_hit"))
+        usage_log.ai_chunks = ai_usage.get("chunks")
+    
+    @staticmethod
+    def record_ai_usage(db: Session, usage_log_id: str, ai_usage: Dict[str, Any]) -> None:
+        """Attach AI accounting to an already logged request (streamed responses finish after logging)"""
+        usage_log = db.query(UsageLog).filter(UsageLog.id == usage_log_id).first()
+        if not usage_log:
+            return
+        UsageService._apply_ai_usage(usage_log, ai_usage)
+        db.commit()
+    
     @staticmethod
     def check_quota(
         db: Session,
@@ -65,20 +183,20 @@ class UsageService:
     ) -> Tuple[bool, Optional[str]]:
         """Check if user has quota available"""
         
-        user = AuthService.get_user_by_id(db, user_id)
+        user = UserCache.get_user(db, user_id)
         if not user:
             return False, "User not found"
         
         # Check if quota reset is needed
         if AuthService.check_quota_reset_needed(user):
             AuthService.reset_monthly_quota(db, user_id)
-            user = AuthService.get_user_by_id(db, user_id)
+            user = UserCache.get_user(db, user_id)
         
         # Get user's plan
         if not user.plan_id:
             return False, "No active plan"
         
-        plan = db.query(Plan).filter(Plan.id == user.plan_id).first()
+        plan = PlanCatalog.get_by_id(user.plan_id)
         if not plan:
             return False, "Plan not found"
         
@@ -89,6 +207,22 @@ class UsageService:
         
         return True, None
     
+    @staticmethod
+    def get_remaining_quota(db: Session, user_id: str) -> int:
+        """Pages the user can still scrape this period (0 without a user or plan)"""
+        
+        user = UserCache.get_user(db, user_id)
+        if not user or not user.plan_id:
+            return 0
+        if AuthService.check_quota_reset_needed(user):
+            AuthService.reset_monthly_quota(db, user_id)
+            user = UserCache.get_user(db, user_id)
+        
+        plan = PlanCatalog.get_by_id(user.plan_id)
+        if not plan:
+            return 0
+        return max(plan.monthly_quota - user.quota_used, 0)
+    
     @staticmethod
     def get_usage_stats(
         db: Session,
@@ -97,12 +231,12 @@ class UsageService:
     ) -> dict:
         """Get usage statistics for a user"""
         
-        user = AuthService.get_user_by_id(db, user_id)
+        user = UserCache.get_user(db, user_id)
         if not user:
             return {}
         
         # Get plan
-        plan = db.query(Plan).filter(Plan.id == user.plan_id).first() if user.plan_id else None
+        plan = PlanCatalog.get_by_id(user.plan_id)
         
         # Get usage logs for the period
         start_date = datetime.utcnow() - timedelta(days=days)
@@ -135,6 +269,36 @@ class UsageService:
                 type_breakdown[log.data_type] = 0
             type_breakdown[log.data_type] += log.pages_scraped
         
+        # AI cost, and which pages drive it
+        ai_logs = [log for log in usage_logs if log.ai_tokens_in is not None]
+        ai_tokens_by_domain = {}
+        ai_tokens_by_url = {}
+        for log in ai_logs:
+            tokens = (log.ai_tokens_in or 0) + (log.ai_tokens_out or 0)
+            domain = urlparse(log.url).netloc or log.url
+            ai_tokens_by_domain[domain] = ai_tokens_by_domain.get(domain, 0) + tokens
+            ai_tokens_by_url[log.url] = ai_tokens_by_url.get(log.url, 0) + tokens
+        ai_latencies = [log.ai_latency_ms for log in ai_logs if log.ai_latency_ms is not None]
+        ai_chunks = [log.ai_chunks for log in ai_logs if log.ai_chunks]
+        ai_cache_hits = len([log for log in ai_logs if log.ai_cache_hit])
+        ai_stats = {
+            "requests": len(ai_logs),
+            "tokens_in": sum(log.ai_tokens_in or 0 for log in ai_logs),
+            "tokens_out": sum(log.ai_tokens_out or 0 for log in ai_logs),
+            "avg_latency_ms": round(sum(ai_latencies) / len(ai_latencies)) if ai_latencies else 0,
+            "cache_hits": ai_cache_hits,
+            "cache_hit_rate": round(ai_cache_hits / len(ai_logs), 3) if ai_logs else 0,
+            "avg_chunks": round(sum(ai_chunks) / len(ai_chunks), 2) if ai_chunks else 0,
+            "top_domains_by_tokens": [
+                {"domain": domain, "tokens": tokens}
+                for domain, tokens in sorted(ai_tokens_by_domain.items(), key=lambda entry: entry[1], reverse=True)[:10]
+            ],
+            "top_urls_by_tokens": [
+                {"url": url, "tokens": tokens}
+                for url, tokens in sorted(ai_tokens_by_url.items(), key=lambda entry: entry[1], reverse=True)[:10]
+            ]
+        }
+        
         return {
             "user_id": user_id,
             "plan": plan.to_dict() if plan else None,
@@ -148,6 +312,7 @@ class UsageService:
             "avg_processing_time_seconds": round(avg_processing_time, 2),
             "source_breakdown": source_breakdown,
             "type_breakdown": type_breakdown,
+            "ai_usage": ai_stats,
             "period_days": days
         }
     
@@ -0,0 +1,123 @@
+"""
+Authenticated-user cache for DataZen SaaS
+Keeps a short-lived snapshot of user rows so auth, quota and usage code
+don't hit the database for the same user several times per request
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple, Any
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from sqlalchemy.orm.util import identity_key
+
+from models.user import User
+
+# Snapshot lifetime. Other workers may see a stale quota for at most this long.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+
+class UserCache:
+    """Process-wide short-TTL cache of user snapshots keyed by user_id"""
+
+    _entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+    _lock = threading.Lock()
+    # Bumped by every invalidation; a load that overlapped one isn't cached
+    _generation = 0
+
+    @staticmethod
+    def _snapshot(user: User) -> Dict[str, Any]:
+        """Copy the column values of a loaded user"""
+        return {
+            column.key: getattr(user, column.key)
+            for column in User.__table__.columns
+        }
+
+    @classmethod
+    def get_user(cls, db: Session, user_id: str) -> Optional[User]:
+        """
+        Get a user attached to the given session, using the cache when possible
+
+        Args:
+            db (Session): Database session the user should be attached to
+            user_id (str): User ID
+
+        Returns:
+            Optional[User]: User or None if not found
+        """
+        if not user_id:
+            return None
+
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(user_id)
+            if entry and entry[0] <= now:
+                del cls._entries[user_id]
+                entry = None
+
+        if entry:
+            # Prefer an instance this session already holds
+            existing = db.identity_map.get(identity_key(User, user_id))
+            if existing is not None:
+                return existing
+
+            # Rebuild a detached instance and merge it without emitting SQL
+            cached_user = User(**entry[1])
+            make_transient_to_detached(cached_user)
+            return db.merge(cached_user, load=False)
+
+        generation = cls._generation
+        user = db.query(User).filter(User.id == user_id).first()
+        if user:
+            with cls._lock:
+                # The row may predate a write committed while it was read
+                if cls._generation == generation:
+                    cls._entries[user_id] = (now + USER_CACHE_TTL_SECONDS, cls._snapshot(user))
+        return user
+
+    @classmethod
+    def add_quota_used(cls, user_id: str, pages: int) -> None:
+        """Keep the cached quota counter in step with an atomic DB increment"""
+        with cls._lock:
+            entry = cls._entries.get(user_id)
+            if entry:
+                entry[1]["quota_used"] = (entry[1].get("quota_used") or 0) + pages
+
+    @classmethod
+    def invalidate(cls, user_id: str) -> None:
+        """Drop the cached snapshot for a user"""
+        with cls._lock:
+            cls._generation += 1
+            cls._entries.pop(user_id, None)
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop all cached snapshots"""
+        with cls._lock:
+            cls._entries.clear()
+
+# Any ORM write to a user row (plan change, quota reset, API key
+# regeneration, deactivation) invalidates that user's snapshot. Writes are
+# flushed before they commit, so the snapshot is dropped once the commit
+# lands; dropping it at flush would let a concurrent read cache the old row.
+_DIRTY_USERS = "user_cache_dirty"
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_written_user(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        UserCache.invalidate(target.id)
+    else:
+        session.info.setdefault(_DIRTY_USERS, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_users_on_commit(session):
+    for user_id in session.info.pop(_DIRTY_USERS, ()):
+        UserCache.invalidate(user_id)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_users_on_rollback(session, previous_transaction):
+    # Rolled-back writes never reached the database
+    if not session.in_transaction():
+        session.info.pop(_DIRTY_USERS, None)
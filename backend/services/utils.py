@@ -9,10 +9,16 @@ from urllib.robotparser import RobotFileParser
 import logging
 from typing import List, Optional, Dict, Any
 
+from .dns_cache import mount_shared_adapter
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Session for auxiliary fetches (robots.txt) sharing the fetch layer's DNS cache
+_aux_session = requests.Session()
+mount_shared_adapter(_aux_session)
+
 def validate_url(url: str) -> bool:
     """
     Validate if the URL is properly formatted
@@ -29,6 +35,35 @@ def validate_url(url: str) -> bool:
     except Exception:
         return False
 
+def fetch_robots_parser(url: str) -> RobotFileParser:
+    """
+    Fetch and parse the robots.txt governing a URL's host
+
+    Args:
+        url (str): Any URL on the host
+
+    Returns:
+        RobotFileParser: Parsed rules; 401/403 disallow everything, other 4xx allow everything
+
+    Raises:
+        requests.RequestException: If robots.txt could not be fetched
+    """
+    parsed_url = urlparse(url)
+    robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+
+    rp = RobotFileParser()
+    rp.set_url(robots_url)
+
+    # Same semantics as RobotFileParser.read(), but over the shared session
+    response = _aux_session.get(robots_url, timeout=10)
+    if response.status_code in (401, 403):
+        rp.disallow_all = True
+    elif 400 <= response.status_code < 500:
+        rp.allow_all = True
+    else:
+        rp.parse(response.text.splitlines())
+    return rp
+
 def check_robots_txt(url: str, user_agent: str = "*") -> bool:
     """
     Check if scraping is allowed according to robots.txt
@@ -41,14 +76,7 @@ def check_robots_txt(url: str, user_agent: str = "*") -> bool:
         bool: True if allowed, False if disallowed
     """
     try:
-        parsed_url = urlparse(url)
-        robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-        
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        
-        return rp.can_fetch(user_agent, url)
+        return fetch_robots_parser(url).can_fetch(user_agent, url)
     except Exception as e:
         logger.warning(f"Could not check robots.txt for {url}: {e}")
         # If we can't check robots.txt, allow scraping
@@ -195,3 +223,41 @@ def truncate_html(html: str, max_size_mb: float = 2.0) -> str:
             return ""  # Fallback if all fails
     
     return html
+
+def visible_text_length(html: str) -> int:
+    """
+    Cheaply estimate the amount of visible text in HTML
+    
+    Args:
+        html (str): HTML content
+        
+    Returns:
+        int: Number of non-whitespace characters outside tags, scripts and styles
+    """
+    if not html:
+        return 0
+    text = re.sub(r'<(script|style|noscript)\b[^>]*>.*?</\1\s*>', ' ', html, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<[^>]+>', ' ', text)
+    return len(re.sub(r'\s+', '', text))
+
+def detect_charset(content: bytes, content_type: str = "") -> Optional[str]:
+    """
+    Detect a document's character set from headers or <meta> tags
+    
+    Args:
+        content (bytes): Raw document bytes
+        content_type (str): Content-Type header value
+        
+    Returns:
+        Optional[str]: Character set name or None if not declared
+    """
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type or "", re.IGNORECASE)
+    if match:
+        return match.group(1).lower()
+    
+    head = content[:4096].decode('ascii', errors='ignore')
+    match = re.search(r'<meta[^>]+charset=["\']?([\w.:-]+)', head, re.IGNORECASE)
+    if match:
+        return match.group(1).lower()
+    
+    return None
@@ -0,0 +1,71 @@
+"""
+Webhook delivery for DataZen
+Posts signed events to user-configured webhook URLs through the shared
+fetch adapter, so deliveries reuse its DNS cache and keep-alive pools
+"""
+
+import os
+import hmac
+import json
+import asyncio
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import requests
+
+from .dns_cache import mount_shared_adapter
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", 10))
+
+# Never closed; closing would close the shared adapter's pools
+_session = requests.Session()
+_session.headers.update({"User-Agent": "DataZen-Webhooks/1.0"})
+mount_shared_adapter(_session)
+
+def sign_payload(secret: str, body: bytes) -> str:
+    """HMAC-SHA256 of a request body, as sent in X-DataZen-Signature"""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+class WebhookDelivery:
+    """Sends webhook events"""
+
+    @staticmethod
+    def deliver(url: str, secret: str, event: str, data: Dict[str, Any]) -> Optional[int]:
+        """
+        POST one event to a webhook URL
+
+        Args:
+            url (str): Webhook URL
+            secret (str): Webhook secret the body is signed with
+            event (str): Event name
+            data (Dict[str, Any]): Event payload
+
+        Returns:
+            Optional[int]: Response status code, or None if the request failed
+        """
+        body = json.dumps({
+            "event": event,
+            "data": data,
+            "timestamp": datetime.utcnow().isoformat()
+        }).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "X-DataZen-Event": event,
+            "X-DataZen-Signature": sign_payload(secret, body)
+        }
+        try:
+            response = _session.post(url, data=body, headers=headers, timeout=WEBHOOK_TIMEOUT_SECONDS)
+        except requests.RequestException as e:
+            logger.warning(f"Webhook delivery of {event} to {url} failed: {e}")
+            return None
+        logger.info(f"Delivered {event} to {url}: HTTP {response.status_code}")
+        return response.status_code
+
+    @staticmethod
+    async def deliver_async(url: str, secret: str, event: str, data: Dict[str, Any]) -> Optional[int]:
+        """deliver() on a worker thread, for use from async routes and tasks"""
+        return await asyncio.to_thread(WebhookDelivery.deliver, url, secret, event, data)
@@ -0,0 +1,101 @@
+"""
+Test script for the DataZen crawl scheduler
+Runs SiteCrawler against an in-memory site, without network access
+"""
+
+import asyncio
+import sys
+import os
+from unittest import mock
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import crawler
+from services.crawler import SiteCrawler
+
+SEED = "https://example.com/"
+
+def site_fetcher(pages, delay=0.0):
+    """Fetch coroutine serving pages (path -> list of linked paths) from memory"""
+    async def fetch_page(url):
+        await asyncio.sleep(delay)
+        path = url[len(SEED) - 1:]
+        links = ''.join(f'<a href="{link}">{link}</a>' for link in pages.get(path, []))
+        return {'success': True, 'url': url, 'data_type': 'links', 'data': [], 'count': 0}, f"<html><body>{links}</body></html>"
+    return fetch_page
+
+async def count_idle_wakeups(crawl, stopped, should_continue=None):
+    """
+    Run a crawl and count asyncio.wait calls that returned without a finished
+    page while stopped() said no new page could start
+    """
+    real_wait = asyncio.wait
+    idle_wakeups = 0
+
+    async def counting_wait(tasks, **kwargs):
+        nonlocal idle_wakeups
+        was_stopped = stopped()
+        done, pending = await real_wait(tasks, **kwargs)
+        if not done and was_stopped:
+            idle_wakeups += 1
+        return done, pending
+
+    events = []
+    with mock.patch.object(crawler.asyncio, 'wait', counting_wait):
+        async for event in crawl.crawl(should_continue=should_continue):
+            events.append(event)
+    return events, idle_wakeups
+
+async def test_page_limit_does_not_spin():
+    """Once max_pages have started, the scheduler sleeps until a page finishes"""
+    print("\n1. Page limit reached while pages are in flight...")
+    pages = {'/': [f'/p{i}' for i in range(20)]}
+    crawl = SiteCrawler(SEED, site_fetcher(pages, delay=0.3), max_depth=1, max_pages=3, check_robots=False, host_delay=0.01)
+    events, idle_wakeups = await count_idle_wakeups(crawl, lambda: crawl.pages_started >= crawl.max_pages)
+
+    summary = events[-1]
+    assert summary['stopped_reason'] == "page limit reached", summary
+    assert summary['pages_crawled'] == 3, summary
+    assert idle_wakeups == 0, f"scheduler woke {idle_wakeups} times with nothing to do"
+    print(f"   ✅ {summary['pages_crawled']} pages, no idle wake-ups")
+
+async def test_quota_stop_does_not_spin():
+    """After should_continue() says stop, in-flight pages finish without polling"""
+    print("\n2. Quota exhausted while pages are in flight...")
+    pages = {'/': [f'/p{i}' for i in range(20)]}
+    started = 0
+
+    def should_continue():
+        nonlocal started
+        started += 1
+        return started <= 3
+
+    crawl = SiteCrawler(SEED, site_fetcher(pages, delay=0.3), max_depth=1, max_pages=20, check_robots=False, host_delay=0.01)
+    events, idle_wakeups = await count_idle_wakeups(crawl, lambda: started > 3, should_continue)
+
+    summary = events[-1]
+    assert summary['stopped_reason'] == "quota exhausted", summary
+    assert idle_wakeups == 0, f"scheduler woke {idle_wakeups} times with nothing to do"
+    print(f"   ✅ stopped after {summary['pages_crawled']} pages, no idle wake-ups")
+
+async def test_host_delay_still_schedules():
+    """With room for more pages, a waiting host is still picked up when ready"""
+    print("\n3. Host delay with free slots...")
+    pages = {'/': ['/a', '/b', '/c']}
+    crawl = SiteCrawler(SEED, site_fetcher(pages, delay=0.5), max_depth=1, max_pages=4, check_robots=False, host_delay=0.05)
+    events = [event async for event in crawl.crawl()]
+
+    summary = events[-1]
+    assert summary['pages_crawled'] == 4, summary
+    print(f"   ✅ {summary['pages_crawled']} pages crawled")
+
+async def main():
+    print("🧪 Testing crawl scheduler...")
+    await test_page_limit_does_not_spin()
+    await test_quota_stop_does_not_spin()
+    await test_host_delay_still_schedules()
+    print("\n✨ Crawler tests completed!")
+
+if __name__ == "__main__":
+    asyncio.run(main())
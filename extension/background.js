@@ -13,7 +13,7 @@ chrome.runtime.onInstalled.addListener(() => {
 // Listen for messages from popup or content scripts
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     if (request.action === 'getSettings') {
-        chrome.storage.sync.get(['apiUrl', 'theme', 'autoExtract'], (items) => {
+        chrome.storage.sync.get(['apiUrl', 'apiToken', 'theme', 'autoExtract'], (items) => {
             sendResponse(items);
         });
         return true; // Will respond asynchronously
@@ -4,8 +4,35 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
         const data = extractPageData(request.options);
         sendResponse(data);
     }
+
+    if (request.action === 'captureDocument') {
+        sendResponse(captureDocument());
+    }
 });
 
+// Largest serialized page sent to the backend (it rejects bigger ones)
+const MAX_DOCUMENT_CHARS = 8 * 1024 * 1024;
+
+// Serialize the rendered page for server-side extraction, so the backend
+// never has to fetch it again (and pages behind a login work)
+function captureDocument() {
+    const root = document.documentElement.cloneNode(true);
+
+    // Scripts and styles are never extracted; leave them out of the upload
+    root.querySelectorAll('script, style, noscript, template, link[rel="stylesheet"]').forEach(el => el.remove());
+
+    const html = '<!DOCTYPE html>\n' + root.outerHTML;
+    if (html.length > MAX_DOCUMENT_CHARS) {
+        return { error: 'This page is too large to send to DataZen' };
+    }
+
+    return {
+        url: window.location.href,
+        title: document.title,
+        html: html
+    };
+}
+
 function extractPageData(options) {
     const result = {
         url: window.location.href,
@@ -4,6 +4,7 @@ const CURRENT_DOMAIN = 'https://versan.in';
 
 // DOM Elements
 const urlInput = document.getElementById('url');
+const apiTokenInput = document.getElementById('api-token');
 const scrapeBtn = document.getElementById('scrape-btn');
 const scrapeUrlBtn = document.getElementById('scrape-url-btn');
 const resultDiv = document.getElementById('result');
@@ -25,6 +26,26 @@ const aiMode = document.getElementById('ai-mode');
 
 let lastScrapedData = null;
 
+// Item field shown for each data type when extraction runs on the backend
+const ITEM_FIELDS = {
+    text: 'text',
+    links: 'url',
+    images: 'url',
+    emails: 'email'
+};
+
+// Largest compressed page upload the backend accepts
+const MAX_UPLOAD_BYTES = 2 * 1024 * 1024;
+
+// Saved API token; with one, the current page is extracted on the backend
+chrome.storage.sync.get(['apiToken'], (items) => {
+    apiTokenInput.value = items.apiToken || '';
+});
+
+apiTokenInput.addEventListener('change', () => {
+    chrome.storage.sync.set({ apiToken: apiTokenInput.value.trim() });
+});
+
 // Get current tab URL
 chrome.tabs.query({ active: true, currentWindow: true }, (tabs) => {
     if (tabs[0]) {
@@ -68,7 +89,13 @@ async function scrapeData(url, useCurrentTab = false) {
 
         let data;
 
-        if (useCurrentTab) {
+        const apiToken = apiTokenInput.value.trim();
+
+        if (useCurrentTab && apiToken) {
+            // Send the page as rendered here; the backend extracts without fetching it again
+            const [tab] = await chrome.tabs.query({ active: true, currentWindow: true });
+            data = await scrapeDocument(tab, extractOptions, apiToken);
+        } else if (useCurrentTab) {
             // Use content script to extract from current page
             const [tab] = await chrome.tabs.query({ active: true, currentWindow: true });
             data = await chrome.tabs.sendMessage(tab.id, {
@@ -105,6 +132,69 @@ async function scrapeData(url, useCurrentTab = false) {
     }
 }
 
+// Gzip a JSON payload for upload
+async function gzipJson(payload) {
+    const stream = new Blob([JSON.stringify(payload)]).stream().pipeThrough(new CompressionStream('gzip'));
+    return await new Response(stream).arrayBuffer();
+}
+
+// Extract from the current tab's rendered page on the backend, uploading it once for every data type
+async function scrapeDocument(tab, extractOptions, apiToken) {
+    const page = await chrome.tabs.sendMessage(tab.id, { action: 'captureDocument' });
+    if (!page || page.error) {
+        throw new Error(page?.error || 'Could not read this page');
+    }
+
+    const data = {
+        url: page.url,
+        title: page.title,
+        text: [],
+        links: [],
+        images: [],
+        emails: []
+    };
+    const types = Object.keys(extractOptions).filter(k => extractOptions[k]);
+    if (types.length === 0) {
+        return data;
+    }
+
+    const body = await gzipJson({
+        url: page.url,
+        data_type: types[0],
+        data_types: types.slice(1),
+        html: page.html,
+        ai_mode: aiMode.checked,
+        // Only the fields shown are computed and sent back (AI results keep theirs)
+        fields: aiMode.checked ? null : [...new Set(types.map(type => ITEM_FIELDS[type]))]
+    });
+    if (body.byteLength > MAX_UPLOAD_BYTES) {
+        throw new Error('This page is too large to send to DataZen');
+    }
+
+    const response = await fetch(`${API_URL}/api/scrape/document`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Authorization': `Bearer ${apiToken}`
+        },
+        body: body
+    });
+
+    if (!response.ok) {
+        throw new Error(`API Error: ${response.statusText}`);
+    }
+
+    const result = await response.json();
+    const results = { ...(result.results || {}), [types[0]]: result };
+    for (const type of types) {
+        const field = ITEM_FIELDS[type];
+        data[type] = (results[type]?.data || []).map(item => item[field] ?? JSON.stringify(item));
+    }
+
+    return data;
+}
+
 // Display results
 function displayResults(data) {
     let content = '';
@@ -84,6 +84,29 @@ export interface ScrapeResponse {
   website_type?: string;
 }
 
+export type ScrapeStreamEvent =
+  | { type: 'start'; url: string; data_type: string; ai_route?: string; timestamp: string }
+  | { type: 'item'; data: any }
+  | {
+      type: 'done';
+      success: boolean;
+      count: number;
+      ai_processed: boolean;
+      ai_processing_error?: string | null;
+      processing_time_seconds: number;
+    };
+
+export interface BatchItemEvent {
+  index: number;
+  url: string;
+  success: boolean;
+  status_code: number;
+  result?: ScrapeResponse | null;
+  error?: string | null;
+  completed: number;
+  total: number;
+}
+
 export interface HealthResponse {
   status: string;
   timestamp: string;
@@ -107,6 +130,54 @@ export interface SupportedTypesResponse {
   };
 }
 
+function authHeaders(): Record<string, string> {
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+  if (typeof window !== 'undefined') {
+    const token = localStorage.getItem('authToken');
+    if (token) {
+      headers.Authorization = `Bearer ${token}`;
+    }
+  }
+  return headers;
+}
+
+/**
+ * POST and hand each line of the streamed response body to onLine as it arrives
+ */
+async function postAndReadLines(path: string, body: any, onLine: (line: string) => void): Promise<void> {
+  // axios buffers whole responses in the browser, so streams use fetch
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: 'POST',
+    headers: authHeaders(),
+    body: JSON.stringify(body),
+  });
+  if (!response.ok || !response.body) {
+    let detail = `Request failed with status ${response.status}`;
+    try {
+      const data = await response.json();
+      detail = data.detail || data.message || data.error || detail;
+    } catch {
+      // Not JSON; keep the status message
+    }
+    throw new Error(typeof detail === 'string' ? detail : JSON.stringify(detail));
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      onLine(buffer.slice(0, newline).replace(/\r$/, ''));
+      buffer = buffer.slice(newline + 1);
+    }
+  }
+  if (buffer) onLine(buffer);
+}
+
 // API functions
 export const apiService = {
   /**
@@ -137,6 +208,43 @@ export const apiService = {
     }
   },
 
+  /**
+   * Scrape a website, receiving items as NDJSON while they are produced
+   */
+  async scrapeWebsiteStream(request: ScrapeRequest, onEvent: (event: ScrapeStreamEvent) => void): Promise<void> {
+    await postAndReadLines('/api/scrape/stream', request, (line) => {
+      if (line.trim()) onEvent(JSON.parse(line));
+    });
+  },
+
+  /**
+   * Scrape many websites, receiving each item's outcome as a Server-Sent Event when it finishes
+   */
+  async scrapeBatchStream(
+    requests: ScrapeRequest[],
+    onItem: (event: BatchItemEvent) => void,
+    onDone?: (summary: { success: boolean; total: number; succeeded: number; failed: number }) => void
+  ): Promise<void> {
+    let eventName = 'message';
+    let data = '';
+    await postAndReadLines('/api/scrape/batch/stream', { items: requests }, (line) => {
+      if (line.startsWith('event:')) {
+        eventName = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        data += line.slice(5).trim();
+      } else if (line === '') {
+        // A blank line ends an event; comment-only heartbeats carry no data
+        if (data) {
+          const payload = JSON.parse(data);
+          if (eventName === 'item') onItem(payload);
+          if (eventName === 'done' && onDone) onDone(payload);
+        }
+        eventName = 'message';
+        data = '';
+      }
+    });
+  },
+
   /**
    * Enhanced scrape a website with LinkedIn and social media support
    */